@@ -0,0 +1,260 @@
+"""Size-bounded, content-addressed cache for downloaded clips.
+
+Files live under ``<root>/objects/<sha256[:2]>/<sha256>.<ext>`` and an
+``index.json`` maps clip keys (video ids or section stems) to hashes, so
+identical downloads are stored once. When the total size exceeds the budget
+the least recently used objects are evicted first (lower ``priority`` goes
+before higher), together with the links ``materialize`` made to them, except
+objects pinned by a pending edit. Downloads pin their clips under
+``pending_edit(clips_dir)`` in the index; the edit that renders them unpins.
+"""
+from __future__ import annotations
+import argparse, logging, json, os, shutil, hashlib, time
+from typing import Dict, Any, List, Optional, Iterable, Set
+from common import setup_logging, config
+
+log = logging.getLogger("clip_cache")
+
+CHUNK = 1 << 20
+
+
+def pending_edit(clips_dir: str) -> str:
+    """Pin id for the edit that will be made from ``clips_dir``."""
+    return "pending:" + os.path.abspath(clips_dir)
+
+
+def file_sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(CHUNK), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+class ClipCache:
+    def __init__(self, root: str = None, max_bytes: int = None):
+        self.root = root or config.CACHE_DIR
+        self.max_bytes = max_bytes if max_bytes is not None else int(config.CLIP_CACHE_MAX_GB * 1024 ** 3)
+        self.index_path = os.path.join(self.root, "index.json")
+        os.makedirs(os.path.join(self.root, "objects"), exist_ok=True)
+        self._load()
+
+    # -- persistence -------------------------------------------------------
+    def _load(self) -> None:
+        data: Dict[str, Any] = {}
+        if os.path.exists(self.index_path):
+            with open(self.index_path) as f:
+                data = json.load(f)
+        self.keys: Dict[str, str] = data.get("keys", {})
+        self.objects: Dict[str, Dict[str, Any]] = data.get("objects", {})
+        self.pins: Dict[str, List[str]] = data.get("pins", {})
+        self.stats: Dict[str, int] = {"hits": 0, "misses": 0, "bytes_saved": 0, "bytes_deduplicated": 0,
+                                      "evictions": 0}
+        self.stats.update(data.get("stats", {}))
+
+    def save(self) -> None:
+        tmp = self.index_path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump({"keys": self.keys, "objects": self.objects, "pins": self.pins, "stats": self.stats},
+                      f, indent=2)
+        os.replace(tmp, self.index_path)
+
+    def _object_path(self, digest: str) -> str:
+        ext = self.objects[digest]["ext"]
+        return os.path.join(self.root, "objects", digest[:2], f"{digest}{ext}")
+
+    # -- lookups -----------------------------------------------------------
+    def _lookup(self, key: str) -> Optional[str]:
+        digest = self.keys.get(key)
+        if digest and digest in self.objects and os.path.exists(self._object_path(digest)):
+            self.objects[digest]["last_used"] = time.time()
+            return self._object_path(digest)
+        if digest:
+            # Object vanished underneath us; forget the stale mapping
+            self.keys.pop(key, None)
+        return None
+
+    def contains(self, key: str) -> bool:
+        """Whether ``key`` is cached, without touching stats or recency."""
+        digest = self.keys.get(key)
+        return bool(digest and digest in self.objects and os.path.exists(self._object_path(digest)))
+
+    def get_all(self, keys: List[str]) -> Optional[List[str]]:
+        """Paths for every key, or None if any is missing; hits count only when all are present."""
+        missing = [k for k in keys if not self.contains(k)]
+        if missing:
+            self.stats["misses"] += len(missing)
+            self.save()
+            return None
+        paths = [self._get(k) for k in keys]
+        self.save()
+        return paths
+
+    def _get(self, key: str) -> Optional[str]:
+        path = self._lookup(key)
+        if path:
+            self.stats["hits"] += 1
+            self.stats["bytes_saved"] += self.objects[self.keys[key]]["size"]
+        else:
+            self.stats["misses"] += 1
+        return path
+
+    def get(self, key: str) -> Optional[str]:
+        """Path of the cached clip for ``key``, or None on a miss."""
+        path = self._get(key)
+        self.save()
+        return path
+
+    def put(self, key: str, path: str, priority: int = 0) -> str:
+        """Move ``path`` into the cache under ``key`` and return the object path.
+
+        If an identical file is already cached the new copy is discarded. A file larger than the whole
+        budget is not cached: it stays at ``path``, which is returned, and ``key`` no longer maps to
+        whatever was cached under it before.
+        """
+        size = os.path.getsize(path)
+        if size > self.max_bytes:
+            log.warning("Not caching %s: %d bytes exceeds the %d byte budget", key, size, self.max_bytes)
+            if self.keys.pop(key, None):
+                self.save()
+            return path
+        digest = file_sha256(path)
+        ext = os.path.splitext(path)[1]
+        now = time.time()
+        if digest in self.objects and os.path.exists(self._object_path(digest)):
+            obj = self.objects[digest]
+            obj["last_used"] = now
+            obj["priority"] = max(obj.get("priority", 0), priority)
+            self.stats["bytes_deduplicated"] += size
+            os.remove(path)
+            log.info("Deduplicated %s against %s", key, digest[:12])
+        else:
+            self.objects[digest] = {"size": size, "ext": ext, "last_used": now, "priority": priority}
+            dest = self._object_path(digest)
+            os.makedirs(os.path.dirname(dest), exist_ok=True)
+            shutil.move(path, dest)
+        self.keys[key] = digest
+        self.evict(keep=digest)
+        self.save()
+        return self._object_path(digest)
+
+    def materialize(self, key: str, dest_dir: str) -> Optional[str]:
+        """Hard-link (or copy) the cached clip into ``dest_dir`` as ``<key><ext>``.
+
+        The link is recorded on the object so that evicting it frees the disk space too.
+        """
+        src = self._lookup(key)
+        if src is None:
+            return None
+        os.makedirs(dest_dir, exist_ok=True)
+        dest = os.path.join(dest_dir, key + os.path.splitext(src)[1])
+        if os.path.exists(dest):
+            os.remove(dest)
+        try:
+            os.link(src, dest)
+        except OSError:
+            shutil.copy2(src, dest)
+        links = self.objects[self.keys[key]].setdefault("links", [])
+        if os.path.abspath(dest) not in links:
+            links.append(os.path.abspath(dest))
+        self.save()
+        return dest
+
+    def _remove_links(self, digest: str) -> None:
+        """Delete the links (or copies) ``materialize`` made of ``digest`` that still hold its content."""
+        obj = self.objects[digest]
+        path = self._object_path(digest)
+        for link in obj.get("links", []):
+            if not os.path.exists(link):
+                continue
+            if (os.path.exists(path) and os.path.samefile(link, path)) or os.path.getsize(link) == obj["size"]:
+                os.remove(link)
+
+    def discard(self, key: str) -> None:
+        """Forget ``key`` and its pins; its object and links go too unless another key maps to it."""
+        digest = self.keys.pop(key, None)
+        for edit_id in [e for e, keys in self.pins.items() if key in keys]:
+            self.pins[edit_id] = [k for k in self.pins[edit_id] if k != key]
+        if digest in self.objects and digest not in self.keys.values():
+            self._remove_links(digest)
+            path = self._object_path(digest)
+            if os.path.exists(path):
+                os.remove(path)
+            del self.objects[digest]
+        self.save()
+
+    # -- pinning & eviction ------------------------------------------------
+    def pin(self, edit_id: str, keys: Iterable[str]) -> None:
+        """Protect ``keys`` from eviction until ``edit_id`` is unpinned (adds to its earlier pins)."""
+        self.pins[edit_id] = sorted(set(self.pins.get(edit_id, [])) | set(keys))
+        self.save()
+
+    def unpin(self, edit_id: str) -> None:
+        """Release an edit's pins once it has consumed its clips, and enforce the budget again."""
+        self.pins.pop(edit_id, None)
+        self.evict()
+        self.save()
+
+    def pinned_digests(self) -> Set[str]:
+        return {self.keys[k] for keys in self.pins.values() for k in keys if k in self.keys}
+
+    def total_bytes(self) -> int:
+        return sum(obj["size"] for obj in self.objects.values())
+
+    def evict(self, keep: Optional[str] = None) -> int:
+        """Drop unpinned objects (never ``keep``) until the cache fits its budget; returns bytes freed."""
+        total = self.total_bytes()
+        if total <= self.max_bytes:
+            return 0
+        pinned = self.pinned_digests() | ({keep} if keep else set())
+        candidates = sorted((d for d in self.objects if d not in pinned),
+                            key=lambda d: (self.objects[d].get("priority", 0), self.objects[d]["last_used"]))
+        freed = 0
+        for digest in candidates:
+            if total - freed <= self.max_bytes:
+                break
+            self._remove_links(digest)
+            path = self._object_path(digest)
+            if os.path.exists(path):
+                os.remove(path)
+            freed += self.objects.pop(digest)["size"]
+            self.stats["evictions"] += 1
+        self.keys = {k: d for k, d in self.keys.items() if d in self.objects}
+        if total - freed > self.max_bytes:
+            log.warning("Clip cache still over budget (%d bytes) after evicting everything unpinned", total - freed)
+        log.info("Evicted %d bytes from clip cache", freed)
+        return freed
+
+    def metrics(self) -> Dict[str, Any]:
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return dict(self.stats,
+                    hit_rate=round(self.stats["hits"] / lookups, 3) if lookups else 0.0,
+                    objects=len(self.objects),
+                    keys=len(self.keys),
+                    total_bytes=self.total_bytes(),
+                    max_bytes=self.max_bytes)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--cache-dir", default=config.CACHE_DIR)
+    parser.add_argument("--pin", nargs="+", metavar=("EDIT_ID", "KEY"), help="Pin clip keys for a pending edit")
+    parser.add_argument("--unpin", metavar="EDIT_ID")
+    parser.add_argument("--evict", action="store_true", help="Enforce the size budget now")
+    parser.add_argument("--log-level", default=None)
+    args = parser.parse_args()
+    setup_logging(args.log_level)
+
+    cache = ClipCache(args.cache_dir)
+    if args.pin:
+        cache.pin(args.pin[0], args.pin[1:])
+    if args.unpin:
+        cache.unpin(args.unpin)
+    if args.evict:
+        cache.evict()
+        cache.save()
+    log.info("Clip cache: %s", json.dumps(cache.metrics()))
+
+
+if __name__ == "__main__":
+    main()
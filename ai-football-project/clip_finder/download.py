@@ -1,12 +1,22 @@
 """Download Creative Commons candidates with yt-dlp, limit duration, and save to out/clips."""
 from __future__ import annotations
-import argparse, logging, json, os, subprocess, sys, re
-from typing import Dict, Any, List
+import argparse, logging, json, os, subprocess, sys, re, time
+from typing import Dict, Any, List, Optional, Sequence, Tuple
 from common import setup_logging, config
+from common.media import media_index
+from clip_finder.clip_cache import ClipCache, pending_edit
+from video_editing.fingerprint import FingerprintIndex, check_and_register
 
 log = logging.getLogger("download")
 
 YOUTUBE_URL = "https://www.youtube.com/watch?v={id}"
+FORMAT = "bv*+ba/b"
+# Exports never exceed 1080p, so section downloads do not fetch anything larger.
+DEFAULT_MAX_HEIGHT = 1080
+# Section files are named <id>_<start>-<end>.mp4; full downloads stay <id>.mp4.
+OUT_TEMPLATE = "%(id)s%(section_start&_{:.0f}|)s%(section_end&-{:.0f}|)s.%(ext)s"
+
+Section = Tuple[float, float]
 
 
 def iso8601_to_seconds(iso: str) -> int:
@@ -22,14 +32,172 @@ def iso8601_to_seconds(iso: str) -> int:
     return hours * 3600 + minutes * 60 + seconds
 
 
-def download_video(video_id: str, out_dir: str) -> str:
+def capped_format(max_height: Optional[int]) -> str:
+    """yt-dlp format selector for best video+audio no taller than ``max_height``."""
+    if not max_height:
+        return FORMAT
+    return f"bv*[height<={max_height}]+ba/b[height<={max_height}]/b"
+
+
+def candidate_sections(item: Dict[str, Any], window: float) -> List[Section]:
+    """Time ranges worth downloading for a candidate.
+
+    Uses ``key_moments`` (``[[start, end], ...]`` in seconds) when the candidate
+    carries them, otherwise the first ``window`` seconds of the video.
+    """
+    sections = []
+    for moment in item.get("key_moments") or []:
+        start, end = float(moment[0]), float(moment[1])
+        if end > start >= 0:
+            sections.append((start, end))
+    return sections or [(0.0, float(window))]
+
+
+def section_key(video_id: str, start: float, end: float) -> str:
+    """File stem yt-dlp gives a section download (see ``OUT_TEMPLATE``)."""
+    return f"{video_id}_{start:.0f}-{end:.0f}"
+
+
+def _fetch_cached(cache: ClipCache, keys: List[str], out_dir: str) -> List[str]:
+    """Materialize every key from the cache into ``out_dir`` (pinned for its edit); empty if any is missing."""
+    if cache.get_all(keys) is None:
+        return []
+    cache.pin(pending_edit(out_dir), keys)
+    paths = [cache.materialize(k, out_dir) for k in keys]
+    return paths if all(paths) else []
+
+
+def _store(cache: ClipCache, paths: List[str], out_dir: str) -> List[str]:
+    stored = []
+    for path in paths:
+        key = os.path.splitext(os.path.basename(path))[0]
+        if cache.put(key, path) == path:
+            # Too large to cache: the download was left where it is
+            stored.append(path)
+            continue
+        # Held for the edit made from out_dir, so later downloads in the batch cannot evict it
+        cache.pin(pending_edit(out_dir), [key])
+        dest = cache.materialize(key, out_dir)
+        if dest is None:
+            log.warning("Lost %s while storing it in the clip cache", key)
+            continue
+        stored.append(dest)
+    return stored
+
+
+def _drop_duplicates(index: FingerprintIndex, paths: List[str], cache: Optional[ClipCache] = None) -> List[str]:
+    """Remove clips whose footage is already in the library (re-uploads), also from ``cache``; return the rest."""
+    kept = []
+    for path in paths:
+        key = os.path.splitext(os.path.basename(path))[0]
+        try:
+            dup = check_and_register(index, key, path)
+        except (subprocess.CalledProcessError, OSError) as e:
+            log.warning("Could not fingerprint %s: %s", path, e)
+            dup = None
+        if dup:
+            log.info("Skipping %s: same footage as %s", key, dup)
+            if cache is not None:
+                cache.discard(key)
+            if os.path.exists(path):
+                os.remove(path)
+        else:
+            kept.append(path)
+    return kept
+
+
+class YtDlpEngine:
+    """In-process yt-dlp backend that reuses one ``YoutubeDL`` across a batch.
+
+    Importing yt-dlp and loading its extractors happens once, and cookies and
+    pooled HTTP connections are shared between videos instead of being rebuilt
+    by a fresh interpreter per download.
+    """
+
+    def __init__(self, out_dir: str, cookiefile: Optional[str] = None, max_height: Optional[int] = None):
+        from yt_dlp import YoutubeDL
+
+        os.makedirs(out_dir, exist_ok=True)
+        # Per-video ranges for the next download; read back by _ranges() because
+        # YoutubeDL options are fixed once the instance is built.
+        self._sections: Dict[str, Sequence[Section]] = {}
+        opts: Dict[str, Any] = {
+            "format": capped_format(max_height),
+            "outtmpl": os.path.join(out_dir, OUT_TEMPLATE),
+            "download_ranges": self._ranges,
+            "merge_output_format": "mp4",
+            "quiet": True,
+            "no_warnings": True,
+            "noprogress": True,
+        }
+        if cookiefile:
+            opts["cookiefile"] = cookiefile
+        self.out_dir = out_dir
+        self._ydl = YoutubeDL(opts)
+
+    def _ranges(self, info: Dict[str, Any], ydl: Any) -> List[Dict[str, float]]:
+        sections = self._sections.get(info.get("id"))
+        if not sections:
+            return [{}]  # whole video
+        return [{"start_time": start, "end_time": end} for start, end in sections]
+
+    def _set_out_dir(self, out_dir: str) -> None:
+        """Point the output template at ``out_dir`` for the following downloads."""
+        outtmpl = os.path.join(out_dir, OUT_TEMPLATE)
+        current = self._ydl.params.get("outtmpl")
+        # yt-dlp normalizes the template into a per-type dict when the instance is built
+        self._ydl.params["outtmpl"] = dict(current, default=outtmpl) if isinstance(current, dict) else outtmpl
+        self.out_dir = out_dir
+
+    def download(self, video_id: str, sections: Optional[Sequence[Section]] = None,
+                 out_dir: Optional[str] = None) -> List[str]:
+        """Download one video (or only ``sections`` of it) and return the file paths yt-dlp wrote.
+
+        ``out_dir`` redirects this and later downloads; by default files go where the last one went.
+        """
+        if out_dir is not None and os.path.abspath(out_dir) != os.path.abspath(self.out_dir):
+            self._set_out_dir(out_dir)
+        self._sections[video_id] = sections or []
+        try:
+            info = self._ydl.extract_info(YOUTUBE_URL.format(id=video_id), download=True)
+        finally:
+            self._sections.pop(video_id, None)
+        paths = [req["filepath"] for req in info.get("requested_downloads") or [] if req.get("filepath")]
+        return paths or [self._ydl.prepare_filename(info)]
+
+    def close(self) -> None:
+        self._ydl.close()
+
+    def __enter__(self) -> "YtDlpEngine":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def _download_subprocess_sections(video_id: str, out_dir: str, sections: Sequence[Section],
+                                  max_height: Optional[int]) -> List[str]:
+    cmd = [
+        sys.executable, "-m", "yt_dlp",
+        "-f", capped_format(max_height),
+        "-o", os.path.join(out_dir, OUT_TEMPLATE),
+        "--merge-output-format", "mp4",
+        "--no-simulate", "--print", "after_move:filepath",
+    ]
+    for start, end in sections:
+        cmd += ["--download-sections", f"*{start}-{end}"]
+    cmd.append(YOUTUBE_URL.format(id=video_id))
+    res = subprocess.run(cmd, check=True, capture_output=True, text=True)
+    return [line.strip() for line in res.stdout.splitlines() if line.strip()]
+
+
+def _download_subprocess(video_id: str, out_dir: str) -> str:
     url = YOUTUBE_URL.format(id=video_id)
-    os.makedirs(out_dir, exist_ok=True)
     # Use yt-dlp to download best video+audio merged mp4
     out_tmpl = os.path.join(out_dir, f"{video_id}.%(ext)s")
     cmd = [
         sys.executable, "-m", "yt_dlp",
-        "-f", "bv*+ba/b",
+        "-f", FORMAT,
         "-o", out_tmpl,
         "--merge-output-format", "mp4",
         url,
@@ -42,36 +210,128 @@ def download_video(video_id: str, out_dir: str) -> str:
             if f.startswith(video_id + "."):
                 path = os.path.join(out_dir, f)
                 break
-    log.info("Downloaded %s", path)
     return path
 
 
+def download_video(video_id: str, out_dir: str, engine: Optional[YtDlpEngine] = None) -> str:
+    """Download ``video_id`` into ``out_dir``.
+
+    With an ``engine`` the download runs in-process (into ``out_dir``, whatever
+    directory the engine was built for) and the resolved path comes straight
+    from yt-dlp; without one it falls back to ``python -m yt_dlp``.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    start = time.perf_counter()
+    if engine is not None:
+        path = engine.download(video_id, out_dir=out_dir)[0]
+    else:
+        path = _download_subprocess(video_id, out_dir)
+    log.info("Downloaded %s in %.2fs", path, time.perf_counter() - start)
+    return path
+
+
+def download_sections(video_id: str, out_dir: str, sections: Sequence[Section],
+                      engine: Optional[YtDlpEngine] = None,
+                      max_height: Optional[int] = DEFAULT_MAX_HEIGHT) -> List[str]:
+    """Fetch only ``sections`` of ``video_id``, one file per section.
+
+    ``max_height`` only applies to the subprocess fallback; an engine carries
+    its own cap from construction.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    start = time.perf_counter()
+    if engine is not None:
+        paths = engine.download(video_id, sections, out_dir)
+    else:
+        paths = _download_subprocess_sections(video_id, out_dir, sections, max_height)
+    log.info("Downloaded %d section(s) of %s in %.2fs: %s", len(paths), video_id,
+             time.perf_counter() - start, ", ".join(paths))
+    return paths
+
+
 def main() -> None:
     parser = argparse.ArgumentParser()
     parser.add_argument("--candidates", default=os.path.join(config.DATA_DIR, "clip_candidates.json"))
     parser.add_argument("--out-dir", default=os.path.join(config.OUTPUT_DIR, "clips"))
     parser.add_argument("--max-duration", type=int, default=120, help="Skip clips longer than this (seconds)")
     parser.add_argument("--limit", type=int, default=5, help="Maximum number of downloads")
+    parser.add_argument("--engine", choices=["inprocess", "subprocess"], default="inprocess",
+                        help="Run yt-dlp in-process (shared session) or spawn one interpreter per video")
+    parser.add_argument("--cookies", default=None, help="Netscape cookie file shared across the batch")
+    parser.add_argument("--sections", action="store_true",
+                        help="Download only key moments (or the first --section-seconds) instead of whole videos")
+    parser.add_argument("--section-seconds", type=float, default=30,
+                        help="Default window when a candidate has no key_moments")
+    parser.add_argument("--max-height", type=int, default=DEFAULT_MAX_HEIGHT,
+                        help="Resolution cap for section downloads")
+    parser.add_argument("--cache-dir", default=config.CACHE_DIR, help="Content-addressed clip cache")
+    parser.add_argument("--no-cache", action="store_true", help="Always download, bypassing the clip cache")
+    parser.add_argument("--no-dedup", action="store_true", help="Keep re-uploads of footage already in the library")
     parser.add_argument("--log-level", default=None)
     args = parser.parse_args()
     setup_logging(args.log_level)
 
     items: List[Dict[str, Any]] = json.load(open(args.candidates)) if os.path.exists(args.candidates) else []
     os.makedirs(args.out_dir, exist_ok=True)
+    cache = None if args.no_cache else ClipCache(args.cache_dir)
+    fingerprints = None if args.no_dedup else FingerprintIndex()
+    max_height = args.max_height if args.sections else None
+    engine = None
+    download_errors: Tuple[type, ...] = (subprocess.CalledProcessError,)
+    if args.engine == "inprocess":
+        from yt_dlp.utils import DownloadError
+        engine = YtDlpEngine(args.out_dir, cookiefile=args.cookies, max_height=max_height)
+        download_errors += (DownloadError,)
     downloaded = 0
-    for it in items:
-        if downloaded >= args.limit:
-            break
-        vid = it.get("video_id")
-        dur = iso8601_to_seconds(it.get("duration_iso8601"))
-        if dur == 0 or dur > args.max_duration:
-            continue
-        try:
-            download_video(vid, args.out_dir)
-            downloaded += 1
-        except subprocess.CalledProcessError as e:
-            log.warning("yt-dlp failed for %s: %s", vid, e)
+    fetched = 0  # actual network downloads, for the per-video average
+    elapsed = 0.0
+    try:
+        for it in items:
+            if downloaded >= args.limit:
+                break
+            vid = it.get("video_id")
+            dur = iso8601_to_seconds(it.get("duration_iso8601"))
+            # Long videos are fine when only their sections are fetched
+            if dur == 0 or (dur > args.max_duration and not args.sections):
+                continue
+            sections = candidate_sections(it, args.section_seconds) if args.sections else []
+            keys = [section_key(vid, a, b) for a, b in sections] if sections else [vid]
+            if fingerprints is not None and all(k in fingerprints.duplicates for k in keys):
+                log.info("Skipping %s: known re-upload of %s", vid, fingerprints.duplicates[keys[0]])
+                continue
+            cached = _fetch_cached(cache, keys, args.out_dir) if cache is not None else []
+            if cached:
+                log.info("Clip cache hit for %s", vid)
+                media_index().add(cached)
+                downloaded += 1
+                continue
+            start = time.perf_counter()
+            try:
+                if sections:
+                    paths = download_sections(vid, args.out_dir, sections, engine, max_height)
+                else:
+                    paths = [download_video(vid, args.out_dir, engine)]
+                elapsed += time.perf_counter() - start
+                fetched += 1
+                if cache is not None:
+                    paths = _store(cache, paths, args.out_dir)
+                if fingerprints is not None:
+                    paths = _drop_duplicates(fingerprints, paths, cache)
+                    if not paths:
+                        continue
+                downloaded += 1
+                # Probe once here so later stages never open the file just for metadata
+                media_index().add(paths)
+            except download_errors as e:
+                log.warning("yt-dlp failed for %s: %s", vid, e)
+    finally:
+        if engine is not None:
+            engine.close()
     log.info("Downloaded %d videos into %s", downloaded, args.out_dir)
+    if fetched:
+        log.info("Engine %s: %.2fs per video on average", args.engine, elapsed / fetched)
+    if cache is not None:
+        log.info("Clip cache: %s", json.dumps(cache.metrics()))
 
 
 if __name__ == "__main__":
@@ -38,6 +38,8 @@ def _load_dotenv():
 class Config:
     DATA_DIR: str = os.getenv("DATA_DIR", "data")
     OUTPUT_DIR: str = os.getenv("OUTPUT_DIR", "out")
+    CACHE_DIR: str = os.getenv("CACHE_DIR", "cache")
+    CLIP_CACHE_MAX_GB: float = float(os.getenv("CLIP_CACHE_MAX_GB", "20"))
     YT_API_KEY: str = os.getenv("YT_API_KEY", "")
     OPENAI_API_KEY: str = os.getenv("OPENAI_API_KEY", "")
 
@@ -47,6 +49,8 @@ class Config:
         return cls(
             DATA_DIR=os.getenv("DATA_DIR", "data"),
             OUTPUT_DIR=os.getenv("OUTPUT_DIR", "out"),
+            CACHE_DIR=os.getenv("CACHE_DIR", "cache"),
+            CLIP_CACHE_MAX_GB=float(os.getenv("CLIP_CACHE_MAX_GB", "20")),
             YT_API_KEY=os.getenv("YT_API_KEY", ""),
             OPENAI_API_KEY=os.getenv("OPENAI_API_KEY", ""),
         )
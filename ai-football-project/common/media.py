@@ -0,0 +1,313 @@
+"""Header-only media probing and a persistent media index.
+
+Stages that only need duration, size, fps or audio presence look files up in
+the index instead of opening a ``VideoFileClip`` (which starts an ffmpeg
+reader per file). Entries are keyed by absolute path and invalidated when the
+file's size or mtime changes. Analysis results (scene cuts, fingerprints...)
+can be attached to an entry with ``annotate`` and are dropped with it.
+
+Several processes (batch workers, parallel renders) may share one index file,
+so ``save`` merges with what is on disk instead of overwriting it.
+"""
+from __future__ import annotations
+import json, logging, os, re, shutil, subprocess, threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+from common import config
+
+try:
+    import fcntl
+except ImportError:  # Windows: saves still merge, but are not serialized between processes
+    fcntl = None
+
+log = logging.getLogger("media")
+
+# Probes are subprocesses waiting on I/O, so many can run per core
+PROBE_WORKERS = min(32, (os.cpu_count() or 1) * 4)
+# Packets read when estimating the keyframe interval; demux only, no decode.
+KEYFRAME_SCAN_SECONDS = 60
+
+
+def ffmpeg_exe() -> str:
+    """ffmpeg binary: system one if present, else the one bundled with imageio-ffmpeg."""
+    exe = shutil.which("ffmpeg")
+    if exe:
+        return exe
+    try:
+        import imageio_ffmpeg
+        return imageio_ffmpeg.get_ffmpeg_exe()
+    except ImportError:
+        return "ffmpeg"
+
+
+def ffprobe_exe() -> Optional[str]:
+    return shutil.which("ffprobe")
+
+
+def _ratio(value: Optional[str]) -> float:
+    if not value or value in ("0/0", "N/A"):
+        return 0.0
+    num, _, den = value.partition("/")
+    return float(num) / float(den or 1) if float(den or 1) else 0.0
+
+
+def _keyframe_times(path: str) -> List[float]:
+    """Presentation times of the video keyframes in the first ``KEYFRAME_SCAN_SECONDS``."""
+    exe = ffprobe_exe()
+    times = []
+    if exe:
+        cmd = [exe, "-v", "error", "-select_streams", "v:0", "-read_intervals", f"%+{KEYFRAME_SCAN_SECONDS}",
+               "-show_entries", "packet=pts_time,flags", "-of", "csv=p=0", path]
+        res = subprocess.run(cmd, capture_output=True, text=True)
+        for line in res.stdout.splitlines():
+            pts, _, flags = line.partition(",")
+            if "K" in flags and pts not in ("", "N/A"):
+                times.append(float(pts))
+        return times
+    # Packet checksums of a stream copy: framecrc prints F= only when the flags are not just "key"
+    cmd = [ffmpeg_exe(), "-v", "error", "-t", str(KEYFRAME_SCAN_SECONDS), "-i", path, "-map", "0:v:0",
+           "-c", "copy", "-f", "framecrc", "-"]
+    res = subprocess.run(cmd, capture_output=True, text=True)
+    m = re.search(r"^#tb 0: (\d+)/(\d+)", res.stdout, re.M)
+    if not m:
+        return times
+    tb = int(m.group(1)) / int(m.group(2))
+    for line in res.stdout.splitlines():
+        if line.startswith("#"):
+            continue
+        fields = [f.strip() for f in line.split(",")]
+        flags = int(fields[6][2:], 16) if len(fields) > 6 and fields[6].startswith("F=") else 1
+        if len(fields) >= 6 and flags & 1:
+            times.append(int(fields[2]) * tb)
+    return sorted(times)
+
+
+def _keyframe_interval(path: str) -> Optional[float]:
+    """Median spacing of video keyframes (seconds) over the first minute."""
+    times = _keyframe_times(path)
+    if len(times) < 2:
+        return None
+    gaps = sorted(b - a for a, b in zip(times, times[1:]))
+    return round(gaps[len(gaps) // 2], 3)
+
+
+def _scan_keyframes(path: str) -> List[float]:
+    exe = ffprobe_exe()
+    if exe:
+        cmd = [exe, "-v", "error", "-select_streams", "v:0", "-show_entries", "packet=pts_time,flags",
+               "-of", "csv=p=0", path]
+        out = subprocess.run(cmd, capture_output=True, text=True).stdout
+        times = [float(pts) for pts, _, flags in (l.partition(",") for l in out.splitlines())
+                 if "K" in flags and pts not in ("", "N/A")]
+    else:
+        # Decode keyframes only and read their timestamps from showinfo
+        cmd = [ffmpeg_exe(), "-hide_banner", "-skip_frame", "nokey", "-i", path, "-an",
+               "-vf", "showinfo", "-f", "null", "-"]
+        err = subprocess.run(cmd, capture_output=True, text=True).stderr
+        times = [float(t) for t in re.findall(r"pts_time:([\d.]+)", err)]
+    return sorted(set(round(t, 3) for t in times))
+
+
+def _probe_ffprobe(path: str, exe: str) -> Dict[str, Any]:
+    cmd = [exe, "-v", "error", "-show_format", "-show_streams", "-of", "json", path]
+    res = subprocess.run(cmd, capture_output=True, text=True, check=True)
+    data = json.loads(res.stdout or "{}")
+    fmt = data.get("format", {})
+    streams = data.get("streams", [])
+    video = next((s for s in streams if s.get("codec_type") == "video"), None)
+    audio = [s for s in streams if s.get("codec_type") == "audio"]
+    info: Dict[str, Any] = {
+        "duration": float(fmt.get("duration") or (video or {}).get("duration") or 0),
+        "bitrate": int(fmt.get("bit_rate") or 0),
+        "container": fmt.get("format_name"),
+        "has_video": video is not None,
+        "width": int((video or {}).get("width") or 0),
+        "height": int((video or {}).get("height") or 0),
+        "fps": round(_ratio((video or {}).get("avg_frame_rate") or (video or {}).get("r_frame_rate")), 3),
+        "video_codec": (video or {}).get("codec_name"),
+        "pix_fmt": (video or {}).get("pix_fmt"),
+        "video_bitrate": int((video or {}).get("bit_rate") or 0),
+        "audio_streams": [{"codec": a.get("codec_name"),
+                           "sample_rate": int(a.get("sample_rate") or 0),
+                           "channels": int(a.get("channels") or 0),
+                           "duration": float(a.get("duration") or 0)} for a in audio],
+    }
+    info["keyframe_interval"] = _keyframe_interval(path) if video else None
+    return info
+
+
+_CHANNELS = {"mono": 1, "stereo": 2, "5.1": 6, "5.1(side)": 6, "7.1": 8}
+
+
+def _probe_header(path: str) -> Dict[str, Any]:
+    # No ffprobe on PATH: parse the stream summary ``ffmpeg -i`` prints (still header-only)
+    res = subprocess.run([ffmpeg_exe(), "-hide_banner", "-i", path], capture_output=True, text=True)
+    text = res.stderr
+    if "Invalid data" in text or "No such file" in text:
+        raise ValueError(f"ffmpeg cannot read {path}")
+    info: Dict[str, Any] = {"duration": 0.0, "bitrate": 0, "container": None, "has_video": False,
+                            "width": 0, "height": 0, "fps": 0.0, "video_codec": None, "pix_fmt": None,
+                            "video_bitrate": 0, "audio_streams": []}
+    m = re.search(r"Input #0, (.+?), from", text)
+    if m:
+        info["container"] = m.group(1)
+    m = re.search(r"Duration: (\d+):(\d+):([\d.]+)", text)
+    if m:
+        info["duration"] = int(m.group(1)) * 3600 + int(m.group(2)) * 60 + float(m.group(3))
+    m = re.search(r"bitrate: (\d+) kb/s", text)
+    if m:
+        info["bitrate"] = int(m.group(1)) * 1000
+    for line in text.splitlines():
+        if "Stream #" not in line:
+            continue
+        if "Video:" in line and not info["has_video"]:
+            desc = line.split("Video:", 1)[1]
+            info["has_video"] = True
+            info["video_codec"] = desc.split()[0].strip(",")
+            m = re.search(r", (\w+)(?:\(|,)", desc)
+            info["pix_fmt"] = m.group(1) if m else None
+            m = re.search(r" (\d{2,5})x(\d{2,5})", desc)
+            if m:
+                info["width"], info["height"] = int(m.group(1)), int(m.group(2))
+            m = re.search(r"([\d.]+) fps", desc)
+            if m:
+                info["fps"] = float(m.group(1))
+            m = re.search(r"(\d+) kb/s", desc)
+            if m:
+                info["video_bitrate"] = int(m.group(1)) * 1000
+        elif "Audio:" in line:
+            desc = line.split("Audio:", 1)[1]
+            rate = re.search(r"(\d+) Hz", desc)
+            layout = re.search(r"Hz, ([^,]+)", desc)
+            info["audio_streams"].append({
+                "codec": desc.split()[0].strip(","),
+                "sample_rate": int(rate.group(1)) if rate else 0,
+                "channels": _CHANNELS.get(layout.group(1).strip(), 0) if layout else 0,
+                "duration": info["duration"],
+            })
+    info["keyframe_interval"] = _keyframe_interval(path) if info["has_video"] else None
+    return info
+
+
+def probe(path: str) -> Dict[str, Any]:
+    """Read container/stream headers of ``path`` without decoding any frames."""
+    exe = ffprobe_exe()
+    info = _probe_ffprobe(path, exe) if exe else _probe_header(path)
+    info["has_audio"] = bool(info["audio_streams"])
+    return info
+
+
+@contextmanager
+def _locked(path: str) -> Iterator[None]:
+    """Hold an exclusive lock on ``path`` (created if missing) across processes."""
+    with open(path, "a") as f:
+        if fcntl:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        yield
+
+
+class MediaIndex:
+    """JSON-backed cache of ``probe`` results keyed by (path, size, mtime)."""
+
+    def __init__(self, path: str = None):
+        # Absolute, so a later chdir does not move the index
+        self.path = os.path.abspath(path or os.path.join(config.CACHE_DIR, "media_index.json"))
+        self._lock = threading.Lock()
+        self.entries: Dict[str, Dict[str, Any]] = self._read()
+
+    def _read(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def save(self) -> None:
+        """Merge with the file on disk, then replace it.
+
+        Entries only another process has are adopted. For an entry both have with the same size/mtime,
+        the other process's annotations are added to this one's (this process wins on a conflict).
+        """
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with _locked(f"{self.path}.lock"):
+            for key, theirs in self._read().items():
+                mine = self.entries.get(key)
+                if mine is None:
+                    self.entries[key] = theirs
+                elif (mine["size"], mine["mtime"]) == (theirs["size"], theirs["mtime"]):
+                    for name, value in theirs["extra"].items():
+                        mine["extra"].setdefault(name, value)
+            tmp = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp, "w") as f:
+                json.dump(self.entries, f, indent=2)
+            os.replace(tmp, self.path)
+
+    def _entry(self, media_path: str, persist: bool = True) -> Dict[str, Any]:
+        key = os.path.abspath(media_path)
+        st = os.stat(key)
+        entry = self.entries.get(key)
+        if entry and entry["size"] == st.st_size and entry["mtime"] == st.st_mtime:
+            return entry
+        info = probe(key)
+        entry = {"size": st.st_size, "mtime": st.st_mtime, "info": info, "extra": {}}
+        with self._lock:
+            self.entries[key] = entry
+            if persist:
+                self.save()
+        log.debug("Probed %s", key)
+        return entry
+
+    def get(self, media_path: str) -> Dict[str, Any]:
+        """Probe info for ``media_path``, probing only if the file is new or changed."""
+        return self._entry(media_path)["info"]
+
+    def add(self, paths: List[str], workers: int = PROBE_WORKERS) -> Dict[str, str]:
+        """Index freshly downloaded/ingested files on a thread pool with a single save.
+
+        Returns ``{path: error}`` for files that could not be probed.
+        """
+        def probe_one(p: str) -> Optional[str]:
+            try:
+                self._entry(p, persist=False)
+            except (OSError, subprocess.CalledProcessError, ValueError) as e:
+                return str(e)
+            return None
+
+        paths = [str(p) for p in paths]
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            errors = {p: e for p, e in zip(paths, pool.map(probe_one, paths)) if e}
+        for p, e in errors.items():
+            log.warning("Could not probe %s: %s", p, e)
+        with self._lock:
+            self.save()
+        return errors
+
+    def annotate(self, media_path: str, name: str, value: Any) -> None:
+        """Attach an analysis result to the file's entry (invalidated with it)."""
+        entry = self._entry(media_path)
+        with self._lock:
+            entry["extra"][name] = value
+            self.save()
+
+    def extra(self, media_path: str, name: str) -> Any:
+        return self._entry(media_path)["extra"].get(name)
+
+    def keyframes(self, media_path: str) -> List[float]:
+        """Timestamps of every video keyframe, scanned once and cached on the entry."""
+        times = self.extra(media_path, "keyframes")
+        if times is None:
+            times = _scan_keyframes(media_path)
+            self.annotate(media_path, "keyframes", times)
+        return times
+
+
+_default: Optional[MediaIndex] = None
+
+
+def media_index() -> MediaIndex:
+    """Process-wide index stored under ``CACHE_DIR``."""
+    global _default
+    if _default is None:
+        _default = MediaIndex()
+    return _default
@@ -1,12 +1,26 @@
 """Concatenate downloaded clips up to ~60 seconds with simple title card, then auto-open the output folder."""
 from __future__ import annotations
-import argparse, logging, os, glob, subprocess, sys
-from typing import List
-from moviepy.editor import VideoFileClip, concatenate_videoclips, TextClip, CompositeVideoClip
+import argparse, logging, os, glob, subprocess, sys, time
+from moviepy.editor import concatenate_videoclips, ImageClip
 from common import setup_logging, config
+from common.media import media_index
+from video_editing.highlights import find_highlight
+from video_editing.scene_detect import scene_cuts, snap_to_cuts
+from video_editing import edl, fast_concat, frame_pipeline, overlay_cache, telemetry
+from video_editing.reader_pool import DEFAULT_MAX_OPEN, LazySource, ReaderPool
+from video_editing.render_profile import DRAFT, FINAL
+from clip_finder.clip_cache import ClipCache, pending_edit
 
 log = logging.getLogger("edit_video")
 
+TITLE_TEXT = "Top Football Highlights"
+TITLE_SECONDS = 2
+
+
+def draft_path(out_path: str) -> str:
+    root, ext = os.path.splitext(out_path)
+    return f"{root}_draft{ext}"
+
 
 def _open_folder(path: str) -> None:
     folder = os.path.abspath(os.path.dirname(path))
@@ -22,37 +36,90 @@ def _open_folder(path: str) -> None:
         log.warning("Could not open folder automatically: %s", e)
 
 
-def assemble(clips_dir: str, out_path: str, target_seconds: int = 60) -> str:
+def assemble(clips_dir: str, out_path: str, target_seconds: int = 60, highlights: bool = True,
+             shot_align: bool = True, stream_copy: bool = True, workers: int = 1,
+             max_open_readers: int = DEFAULT_MAX_OPEN, draft: bool = False, renderer: str = "segments") -> str:
     os.makedirs(os.path.dirname(out_path), exist_ok=True)
     files = sorted(glob.glob(os.path.join(clips_dir, "*.mp4")))
     if not files:
         raise SystemExit("No clips found. Run clip_finder/download.py first.")
 
-    chosen: List[VideoFileClip] = []
+    # Plan the edit from indexed metadata; only the clips actually used get opened
+    index = media_index()
+    plan = []
     total = 0
     for f in files:
-        clip = VideoFileClip(f)
-        take = min(clip.duration, 12)  # take up to 12s per clip
-        sub = clip.subclip(0, take)
-        chosen.append(sub)
-        total += take
+        info = index.get(f)
+        if not info["has_video"] or info["duration"] <= 0:
+            log.warning("Skipping %s: no usable video stream", f)
+            continue
+        take = min(info["duration"], 12)  # take up to 12s per clip
+        # Loudest span (crowd/commentary peak) rather than the build-up at the start
+        start, end = find_highlight(f, take) if highlights else (0, take)
+        if shot_align:
+            start, end = snap_to_cuts(start, end, scene_cuts(f), info["duration"])
+        plan.append((f, start, end))
+        total += end - start
         if total >= target_seconds:
             break
+    if not plan:
+        raise SystemExit("No usable clips found in %s" % clips_dir)
 
-    body = concatenate_videoclips(chosen, method="compose")
+    first = index.get(plan[0][0])
+    edit = edl.make_edl(plan, first["width"], first["height"], TITLE_TEXT, TITLE_SECONDS)
+    log.info("Edit decision list: %s", edl.save(edit, os.path.splitext(out_path)[0] + ".edl.json"))
+    started = time.perf_counter()
+    if draft:
+        reason = "draft"
+    else:
+        reason = fast_concat.incompatibility(plan) if stream_copy else "stream copy disabled"
+    if reason is None:
+        fast_concat.assemble_copy(plan, out_path, TITLE_TEXT, TITLE_SECONDS)
+        elapsed = time.perf_counter() - started
+        telemetry.record("stream_copy", total + TITLE_SECONDS, elapsed)
+        rate = telemetry.seconds_per_output_second("full_render")
+        saved = "%.1fs" % (rate * (total + TITLE_SECONDS) - elapsed) if rate else "unknown (no cold full render yet)"
+        log.info("Created edited video at %s via stream copy in %.1fs; time saved vs cold full render: %s",
+                 out_path, elapsed, saved)
+        return out_path
+    log.info("Full render path: %s", reason)
+
+    if renderer in ("segments", "pipeline") or draft:
+        profile = DRAFT if draft else FINAL
+        if draft:
+            # Same plan, read from cached proxies where they are big enough (timestamps are identical)
+            edit = edl.with_proxies(edit, profile.size(edit["width"], edit["height"])[1])
+            log.info("Draft: %d/%d clips read from proxies",
+                     sum(e["source"] != os.path.abspath(f) for e, (f, _, _) in zip(edit["entries"][1:], plan)),
+                     len(plan))
+        if renderer == "pipeline":
+            # One streaming decode -> transform -> encode pass over preallocated frame buffers
+            stats = frame_pipeline.render_edl(edit, out_path, profile)
+        else:
+            # Per-entry segments from the segment cache (encoding only what changed), joined losslessly
+            renderer = "segments"
+            stats = edl.render_edl(edit, out_path, workers, profile)
+        elapsed = time.perf_counter() - started
+        # Renders that reused cached segments are logged apart so they don't skew the cold-render baseline
+        path_taken = "draft" if draft else "cached_render" if stats.get("reused") else "full_render"
+        telemetry.record(path_taken, total + TITLE_SECONDS, elapsed, renderer=renderer, workers=workers, **stats)
+        log.info("Created edited video at %s via %s %s render (%d workers) in %.1fs", out_path, profile.name,
+                 renderer, workers, elapsed)
+        return out_path
 
-    # Simple title card
-    title = TextClip("Top Football Highlights", fontsize=70, color="white").set_duration(2)
-    title = title.on_color(size=(body.w, body.h), color=(0, 0, 0), pos="center", col_opacity=0.7)
-    final = concatenate_videoclips([title, body], method="compose")
-    final.write_videofile(out_path, codec="libx264", audio_codec="aac", fps=30, threads=4, verbose=False, logger=None)
+    # Sources are opened only when the render reaches them, at most max_open_readers at a time
+    with ReaderPool(max_open_readers) as pool:
+        body = concatenate_videoclips([LazySource(pool, f, start, end) for f, start, end in plan], method="compose")
 
-    # Close clips to release resources
-    for c in chosen:
-        c.close()
-    body.close()
-    final.close()
-    log.info("Created edited video at %s", out_path)
+        # Simple title card, pre-rendered once per text and size
+        title = ImageClip(overlay_cache.card_frame([{"text": TITLE_TEXT}], body.w, body.h)).set_duration(TITLE_SECONDS)
+        final = concatenate_videoclips([title, body], method="compose")
+        final.write_videofile(out_path, codec="libx264", audio_codec="aac", fps=30, threads=4, verbose=False,
+                              logger=None)
+        final.close()
+    elapsed = time.perf_counter() - started
+    telemetry.record("full_render", total + TITLE_SECONDS, elapsed, renderer="moviepy")
+    log.info("Created edited video at %s via MoviePy render in %.1fs", out_path, elapsed)
     return out_path
 
 
@@ -61,12 +128,37 @@ def main():
     parser.add_argument("--clips-dir", default=os.path.join(config.OUTPUT_DIR, "clips"))
     parser.add_argument("--out", default=os.path.join(config.OUTPUT_DIR, "edits", "edit_master.mp4"))
     parser.add_argument("--target-seconds", type=int, default=60)
+    parser.add_argument("--no-highlights", dest="highlights", action="store_false",
+                        help="Take each clip from its start instead of its loudest moment")
+    parser.add_argument("--no-shot-align", dest="shot_align", action="store_false",
+                        help="Do not move cut points onto detected shot boundaries")
+    parser.add_argument("--no-stream-copy", dest="stream_copy", action="store_false",
+                        help="Always re-encode, even when the clips could be joined losslessly")
+    parser.add_argument("--renderer", choices=["segments", "pipeline", "moviepy"], default="segments",
+                        help="Re-encode path: cached per-entry ffmpeg segments (default), the streaming frame "
+                             "pipeline, or one MoviePy timeline")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Encode segments in this many parallel processes (0 = one per CPU core)")
+    parser.add_argument("--max-open-readers", type=int, default=DEFAULT_MAX_OPEN,
+                        help="Cap on source decoders open at once during a full render")
+    parser.add_argument("--draft", action="store_true",
+                        help="Fast low-res preview (1/3 size, 15 fps, ultrafast) of the same edit, written to *_draft.mp4")
     parser.add_argument("--open", dest="open_folder", action="store_true", default=True, help="Open output folder when done (default)")
     parser.add_argument("--no-open", dest="open_folder", action="store_false", help="Do not open folder")
     parser.add_argument("--log-level", default=None)
     args = parser.parse_args()
     setup_logging(args.log_level)
-    out_path = assemble(args.clips_dir, args.out, args.target_seconds)
+    # download.py pinned the clips for this edit; also cover any added to the folder by hand
+    cache = ClipCache()
+    edit_id = pending_edit(args.clips_dir)
+    stems = [os.path.splitext(os.path.basename(f))[0] for f in glob.glob(os.path.join(args.clips_dir, "*.mp4"))]
+    cache.pin(edit_id, stems)
+    out_path = assemble(args.clips_dir, draft_path(args.out) if args.draft else args.out, args.target_seconds,
+                        args.highlights, args.shot_align, args.stream_copy, args.workers or os.cpu_count() or 1,
+                        args.max_open_readers, args.draft, args.renderer)
+    if not args.draft:
+        # The final edit has consumed its clips; they may be evicted (with their links) from now on
+        cache.unpin(edit_id)
     if args.open_folder:
         _open_folder(out_path)
 
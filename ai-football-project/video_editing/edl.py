@@ -0,0 +1,255 @@
+"""Edit decision lists and a segment-cached renderer.
+
+An EDL is the serializable plan behind an edit: the timeline size plus one
+entry per segment, each with its source and in/out points, transforms and
+overlays. Overlays are ``overlay_cache`` templates (title, lower third,
+watermark, end card), drawn once per text, size and font and then reused.
+Cards have a ``None`` source and are rendered over black. Example::
+
+    {"version": 1, "width": 1280, "height": 720, "entries": [
+      {"source": null, "in": 0, "out": 2, "transforms": {}, "overlays": [{"text": "Top Football Highlights"}]},
+      {"source": "out/clips/abc.mp4", "in": 31.2, "out": 43.2, "transforms": {"fit": "pad"}, "overlays": []}]}
+
+Each entry is encoded video-only into ``CACHE_DIR/segments/<hash>.mp4``. The
+hash covers the entry, the source file's identity (size and mtime), the
+output size and the render profile. Re-rendering an edited EDL therefore
+re-encodes only the entries that changed. Long entries are split at the
+first source keyframe after every ``SPLIT_SECONDS`` of source time into parts
+encoded in parallel; the cut points depend only on the source, so a part's
+segment is reused whatever the worker count or the entry's other end. The
+cached segments are then joined losslessly with the audio track, which is
+re-mixed every time because that is cheap.
+"""
+from __future__ import annotations
+import argparse, bisect, copy, dataclasses, hashlib, json, logging, os, shutil, subprocess, tempfile, time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+from common import setup_logging, config
+from common.media import ffmpeg_exe, media_index
+from video_editing import overlay_cache, parallel_render, smart_crop
+from video_editing.render_profile import DRAFT, FINAL, RenderProfile
+
+log = logging.getLogger("edl")
+
+EDL_VERSION = 1
+SPLIT_SECONDS = 10.0     # source-time grid long entries are split on (at the next keyframe)
+MIN_SPLIT_SECONDS = 1.0  # shortest part a split may leave
+OVERLAY_DEFAULTS = {"fontsize": 70, "color": "white", "box_opacity": 0.7}
+# (out_path, width, height, fit override)
+Target = Tuple[str, int, int, Optional[str]]
+
+
+def make_edl(plan: List[Tuple[str, float, float]], width: int, height: int, title_text: Optional[str] = None,
+             title_seconds: float = 2) -> Dict[str, Any]:
+    entries = []
+    if title_text:
+        entries.append(card(title_text, title_seconds))
+    for src, start, end in plan:
+        # Absolute, so a saved EDL renders the same from any working directory
+        entries.append({"source": os.path.abspath(src), "in": round(start, 3), "out": round(end, 3), "transforms": {"fit": "pad"},
+                        "overlays": []})
+    return {"version": EDL_VERSION, "width": width, "height": height, "entries": entries}
+
+
+def card(text: str, seconds: float, template: str = "title") -> Dict[str, Any]:
+    """A text card over black; ``template`` is an ``overlay_cache.TEMPLATES`` name, e.g. ``"end_card"``."""
+    overlay = dict(OVERLAY_DEFAULTS, text=text) if template == "title" else {"text": text, "template": template}
+    return {"source": None, "in": 0.0, "out": float(seconds), "transforms": {}, "overlays": [overlay]}
+
+
+def save(edl: Dict[str, Any], path: str) -> str:
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(edl, f, indent=2)
+    return path
+
+
+def load(path: str) -> Dict[str, Any]:
+    with open(path) as f:
+        edl = json.load(f)
+    if edl.get("version") != EDL_VERSION:
+        raise ValueError(f"Unsupported EDL version in {path}: {edl.get('version')}")
+    return edl
+
+
+def entry_key(entry: Dict[str, Any], width: int, height: int, profile: RenderProfile) -> str:
+    source_id = None
+    if entry["source"]:
+        st = os.stat(entry["source"])
+        source_id = [os.path.abspath(entry["source"]), st.st_size, st.st_mtime_ns]
+    blob = json.dumps({"entry": entry, "source": source_id, "size": [width, height],
+                       "profile": dataclasses.asdict(profile)}, sort_keys=True)
+    return hashlib.sha256(blob.encode()).hexdigest()
+
+
+def _fit(entry: Dict[str, Any], fit: Optional[str], width: int, height: int) -> Dict[str, Any]:
+    """``entry`` as rendered for an output that overrides its fit mode (part of the segment key).
+
+    ``"track"`` crops follow the action; their crop path is stored on the entry as ``crop_x``.
+    """
+    if not fit or not entry["source"] or entry["transforms"].get("fit") == fit:
+        return entry
+    transforms = dict(entry["transforms"], fit=fit)
+    if fit == "track":
+        transforms["crop_x"] = smart_crop.span_path(entry["source"], entry["in"], entry["out"], width / height)
+    return dict(entry, transforms=transforms)
+
+
+def encode_entry(job: Dict[str, Any]) -> Tuple[List[str], float]:
+    """Worker: encode one EDL entry video-only into one or more cached segments.
+
+    ``job["outputs"]`` lists ``{"width", "height", "fit", "crop_x", "out"}``. A source is decoded once and split
+    into one crop/scale branch and encoder per output.
+    """
+    started = time.perf_counter()
+    entry, profile, outputs = job["entry"], job["profile"], job["outputs"]
+    duration = entry["out"] - entry["in"]
+    work = tempfile.mkdtemp(prefix="edl_", dir=os.path.dirname(outputs[0]["out"]))
+    try:
+        cmd = [ffmpeg_exe(), "-v", "error", "-y"]
+        chain, n_inputs = [], 0
+        if entry["source"]:
+            cmd += ["-ss", f"{entry['in']:.3f}", "-t", f"{duration:.3f}", "-i", entry["source"]]
+            n_inputs = 1
+            chain.append(f"[0:v]split={len(outputs)}" + "".join(f"[s{k}]" for k in range(len(outputs))))
+        for k, o in enumerate(outputs):
+            if entry["source"]:
+                if o["fit"] == "track":
+                    vf = smart_crop.track_filter(o["crop_x"], o["width"], o["height"], profile.fps,
+                                                 os.path.join(work, f"crop_{k}.cmd"))
+                else:
+                    vf = parallel_render.FIT_FILTERS[o["fit"] or "pad"](o["width"], o["height"])
+                chain.append(f"[s{k}]{vf}[o{k}v0]")
+            else:
+                cmd += ["-f", "lavfi", "-i", f"color=c=black:s={o['width']}x{o['height']}:r={profile.fps}:d={duration:.3f}"]
+                chain.append(f"[{n_inputs}:v]setsar=1[o{k}v0]")
+                n_inputs += 1
+            for i, overlay in enumerate(entry["overlays"], start=1):
+                png = overlay_cache.overlay_png(overlay, o["width"], o["height"], profile.scale)
+                cmd += ["-loop", "1", "-i", png]
+                chain.append(f"[o{k}v{i - 1}][{n_inputs}:v]overlay=0:0:shortest=1[o{k}v{i}]")
+                n_inputs += 1
+        cmd += ["-filter_complex", ";".join(chain)]
+        tmps = []
+        for k, o in enumerate(outputs):
+            tmps.append(os.path.join(work, f"segment_{k}.mp4"))
+            cmd += ["-map", f"[o{k}v{len(entry['overlays'])}]", "-an", "-t", f"{duration:.3f}"]
+            cmd += parallel_render.x264_args(profile, job["threads"]) + [tmps[-1]]
+        subprocess.run(cmd, check=True)
+        for tmp, o in zip(tmps, outputs):
+            os.replace(tmp, o["out"])
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+    return [o["out"] for o in outputs], time.perf_counter() - started
+
+
+def split_points(src: Optional[str], start: float, end: float) -> List[float]:
+    """Cut points inside ``[start, end)``: the first keyframe at or after each multiple of ``SPLIT_SECONDS``
+    (the multiple itself if there is none), keeping every part at least ``MIN_SPLIT_SECONDS`` long."""
+    if parallel_render.is_still(src):
+        return []
+    kfs = media_index().keyframes(src)
+    cuts: List[float] = []
+    mark = (int(start // SPLIT_SECONDS) + 1) * SPLIT_SECONDS
+    while mark < end - MIN_SPLIT_SECONDS:
+        i = bisect.bisect_left(kfs, mark)
+        cut = round(kfs[i] if i < len(kfs) else mark, 3)
+        if (cuts[-1] if cuts else start) + MIN_SPLIT_SECONDS <= cut <= end - MIN_SPLIT_SECONDS and cut not in cuts:
+            cuts.append(cut)
+        mark += SPLIT_SECONDS
+    return cuts
+
+
+def split_entries(entries: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Split long source entries at ``split_points`` so that their parts encode in parallel.
+
+    Each part is an entry of its own (and its own cached segment). The cuts depend only on the source, so
+    trimming an entry's in- or out-point, or changing the worker count, leaves its other parts' keys alone.
+    """
+    parts = []
+    for entry in entries:
+        bounds = [entry["in"]] + split_points(entry["source"], entry["in"], entry["out"]) + [entry["out"]]
+        parts += [dict(entry, **{"in": a, "out": b}) for a, b in zip(bounds, bounds[1:])]
+    return parts
+
+
+def render_outputs(edl: Dict[str, Any], targets: List[Target], workers: int = 1,
+                   profile: RenderProfile = FINAL, seg_dir: Optional[str] = None) -> Dict[str, int]:
+    """Render ``edl`` once per target ``(out_path, width, height, fit)``, sharing decodes and the audio mix.
+
+    Sizes are in timeline pixels and get scaled by ``profile``. ``fit`` overrides the entries'
+    own fit mode (``"pad"``/``"crop"``/``"track"``), or ``None`` to keep it. Segments are cached in
+    ``seg_dir`` (``CACHE_DIR/segments`` by default).
+    """
+    seg_dir = seg_dir or os.path.join(config.CACHE_DIR, "segments")
+    os.makedirs(seg_dir, exist_ok=True)
+    sizes = [profile.size(w, h) for _, w, h, _ in targets]
+    segments: List[List[str]] = [[] for _ in targets]
+    jobs, queued = [], set()
+    for entry in split_entries(edl["entries"]):
+        outputs = []
+        for t, (_, _, _, fit) in enumerate(targets):
+            variant = _fit(entry, fit, *sizes[t])
+            seg = os.path.join(seg_dir, entry_key(variant, *sizes[t], profile) + ".mp4")
+            segments[t].append(seg)
+            if not os.path.exists(seg) and seg not in queued:
+                queued.add(seg)
+                outputs.append({"width": sizes[t][0], "height": sizes[t][1], "out": seg,
+                                "fit": variant["transforms"].get("fit"),
+                                "crop_x": variant["transforms"].get("crop_x")})
+        if outputs:
+            jobs.append({"entry": entry, "profile": profile, "outputs": outputs,
+                         "threads": max(1, (os.cpu_count() or 1) // max(1, workers))})
+    encoded = sum(len(j["outputs"]) for j in jobs)
+    if jobs:
+        started = time.perf_counter()
+        with ProcessPoolExecutor(max_workers=max(1, min(workers, len(jobs)))) as pool:
+            list(pool.map(encode_entry, jobs))
+        log.info("Encoded %d segment(s) from %d decode(s) in %.1fs", encoded, len(jobs), time.perf_counter() - started)
+    reused = sum(len(segs) for segs in segments) - encoded
+    log.info("Segments: %d encoded, %d reused from cache", encoded, reused)
+    pieces = [(e["source"], e["in"], e["out"]) for e in edl["entries"]]
+    work = tempfile.mkdtemp(prefix="edl_join_", dir=os.path.dirname(os.path.abspath(targets[0][0])))
+    try:
+        audio = parallel_render.render_audio(pieces, os.path.join(work, "audio.m4a"))
+        for (out_path, _, _, _), segs in zip(targets, segments):
+            parallel_render.join_segments(segs, audio, out_path, work)
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+    return {"encoded": encoded, "reused": reused}
+
+
+def render_edl(edl: Dict[str, Any], out_path: str, workers: int = 1, profile: RenderProfile = FINAL,
+               seg_dir: Optional[str] = None) -> Dict[str, int]:
+    """Render ``edl`` to ``out_path``, encoding only entries missing from the segment cache."""
+    return render_outputs(edl, [(out_path, edl["width"], edl["height"], None)], workers, profile, seg_dir)
+
+
+def with_proxies(edl: Dict[str, Any], min_height: int) -> Dict[str, Any]:
+    """Copy of ``edl`` reading each source from a cached proxy where one is big enough."""
+    from video_editing.proxies import find_proxy
+    edl = copy.deepcopy(edl)
+    for entry in edl["entries"]:
+        if entry["source"]:
+            entry["source"] = find_proxy(entry["source"], min_height) or entry["source"]
+    return edl
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render an edit decision list")
+    parser.add_argument("edl")
+    parser.add_argument("--out", required=True)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--draft", action="store_true")
+    parser.add_argument("--log-level", default=None)
+    args = parser.parse_args()
+    setup_logging(args.log_level)
+    edl = load(args.edl)
+    profile = DRAFT if args.draft else FINAL
+    if args.draft:
+        edl = with_proxies(edl, profile.size(edl["width"], edl["height"])[1])
+    render_edl(edl, args.out, args.workers or os.cpu_count() or 1, profile)
+
+
+if __name__ == "__main__":
+    main()
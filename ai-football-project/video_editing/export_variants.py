@@ -1,25 +1,100 @@
-"""Export 9:16, 1:1, 16:9 variants with ffmpeg (stub)."""
+"""Export 9:16, 1:1, 16:9 variants with ffmpeg.
+
+Variants are rendered straight from the edit plan (``<master>.edl.json``) when it exists. Each source is
+decoded once and fanned out through a split filtergraph to one crop/scale branch and encoder per aspect
+ratio, so there is no extra encode/decode generation of the master. Without an EDL the master file
+itself is decoded once and split the same way.
+"""
 from __future__ import annotations
-import argparse, logging, os, shutil
+import argparse, logging, os, subprocess, time
+from typing import Dict
 from common import setup_logging, config
+from common.media import ffmpeg_exe, media_index
+from video_editing import edl, smart_crop
+from video_editing.parallel_render import crop_filter
+from video_editing.proxies import find_proxy
+from video_editing.render_profile import DRAFT, FINAL, RenderProfile
 
 log = logging.getLogger("export_variants")
 
-def export_variants(input_path: str, out_dir: str) -> None:
+# tag -> (width, height) of the final render
+VARIANTS = {"9x16": (1080, 1920), "1x1": (1080, 1080), "16x9": (1920, 1080)}
+# Narrow crops of wide footage follow the action instead of the frame centre
+FITS = {"9x16": "track", "1x1": "track", "16x9": "crop"}
+
+
+def _out_paths(out_dir: str, profile: RenderProfile) -> Dict[str, str]:
+    suffix = "_draft" if profile is DRAFT else ""
+    return {tag: os.path.join(out_dir, f"video_{tag}{suffix}.mp4") for tag in VARIANTS}
+
+
+def export_variants(input_path: str, out_dir: str, profile: RenderProfile = FINAL) -> None:
+    """Decode ``input_path`` once and encode every variant from a split filtergraph."""
     os.makedirs(out_dir, exist_ok=True)
-    for tag in ["9x16","1x1","16x9"]:
-        out = os.path.join(out_dir, f"video_{tag}.mp4")
-        open(out, "wb").write(b"")  # placeholder
+    source = input_path
+    if profile is DRAFT:
+        source = find_proxy(input_path, min(profile.size(*size)[1] for size in VARIANTS.values())) or input_path
+    info = media_index().get(source)
+    outs = _out_paths(out_dir, profile)
+    chain = [f"[0:v]split={len(VARIANTS)}" + "".join(f"[s{k}]" for k in range(len(VARIANTS)))]
+    cmd = [ffmpeg_exe(), "-v", "error", "-y", "-i", source]
+    for k, (tag, size) in enumerate(VARIANTS.items()):
+        width, height = profile.size(*size)
+        if FITS[tag] == "track":
+            points = smart_crop.span_path(source, 0.0, info["duration"], width / height)
+            vf = smart_crop.track_filter(points, width, height, profile.fps, os.path.join(out_dir, f".crop_{tag}.cmd"))
+        else:
+            vf = crop_filter(width, height)
+        chain.append(f"[s{k}]{vf}[v{k}]")
+    cmd += ["-filter_complex", ";".join(chain)]
+    for k, tag in enumerate(VARIANTS):
+        cmd += ["-map", f"[v{k}]"] + profile.x264_args()
+        if info["has_audio"]:
+            audio_copy = info["audio_streams"][0]["codec"] == "aac"
+            cmd += ["-map", "0:a:0"] + (["-c:a", "copy"] if audio_copy else ["-c:a", "aac", "-b:a", "160k"])
+        cmd += ["-movflags", "+faststart", outs[tag]]
+    try:
+        subprocess.run(cmd, check=True)
+    finally:
+        for tag in VARIANTS:
+            cmd_path = os.path.join(out_dir, f".crop_{tag}.cmd")
+            if os.path.exists(cmd_path):
+                os.remove(cmd_path)
+    for out in outs.values():
         log.info("Exported %s", out)
 
+
+def export_variants_from_edl(edl_path: str, out_dir: str, profile: RenderProfile = FINAL, workers: int = 1) -> None:
+    """Render every variant directly from the edit plan, sharing source decodes and the audio mix."""
+    os.makedirs(out_dir, exist_ok=True)
+    edit = edl.load(edl_path)
+    if profile is DRAFT:
+        edit = edl.with_proxies(edit, min(profile.size(*size)[1] for size in VARIANTS.values()))
+    outs = _out_paths(out_dir, profile)
+    targets = [(outs[tag], width, height, FITS[tag]) for tag, (width, height) in VARIANTS.items()]
+    edl.render_outputs(edit, targets, workers, profile)
+    for out in outs.values():
+        log.info("Exported %s", out)
+
+
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument("--input", default=os.path.join(config.OUTPUT_DIR, "edits", "edit_master.mp4"))
+    parser.add_argument("--edl", default=None, help="Edit plan to render from (default: <input>.edl.json if present)")
     parser.add_argument("--out-dir", default=os.path.join(config.OUTPUT_DIR, "variants"))
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--draft", action="store_true", help="Fast low-res previews (*_draft.mp4)")
     parser.add_argument("--log-level", default=None)
     args = parser.parse_args()
     setup_logging(args.log_level)
-    export_variants(args.input, args.out_dir)
+    profile = DRAFT if args.draft else FINAL
+    edl_path = args.edl or os.path.splitext(args.input)[0] + ".edl.json"
+    started = time.perf_counter()
+    if os.path.exists(edl_path):
+        export_variants_from_edl(edl_path, args.out_dir, profile, args.workers or os.cpu_count() or 1)
+    else:
+        export_variants(args.input, args.out_dir, profile)
+    log.info("Exported %d variants in %.1fs", len(VARIANTS), time.perf_counter() - started)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,65 @@
+"""Stream-copy assembly of an edit when its sources are already compatible.
+
+If every planned clip shares codec, resolution, frame rate, pixel format,
+and B-frame delay, the video is stream-copied out of the sources
+and joined with ffmpeg's concat demuxer (``-c copy``). Only the title card
+(once, then reused from ``overlay_cache``) and the partial GOPs at each cut
+are encoded (see ``smart_cut``). The audio track is rendered once for the
+whole timeline and muxed in.
+"""
+from __future__ import annotations
+import logging, os, shutil, tempfile
+from typing import Any, Dict, List, Optional, Tuple
+from common.media import media_index
+from video_editing import overlay_cache, parallel_render, smart_cut
+
+log = logging.getLogger("fast_concat")
+
+# (path, start, end) as planned by edit_video.assemble
+Segment = Tuple[str, float, float]
+
+COPYABLE_CODECS = {"h264"}
+
+
+def _signature(info: Dict[str, Any]) -> Tuple:
+    return info["video_codec"], info["width"], info["height"], round(info["fps"], 2), info["pix_fmt"]
+
+
+def incompatibility(plan: List[Segment]) -> Optional[str]:
+    """Why ``plan`` cannot be stream-copied, or None if it can."""
+    index = media_index()
+    infos = [index.get(f) for f, _, _ in plan]
+    first = infos[0]
+    if first["video_codec"] not in COPYABLE_CODECS:
+        return f"codec {first['video_codec']} not stream-copyable"
+    delays = {smart_cut.reorder_delay(f) for f, _, _ in plan}
+    if len(delays) > 1 or max(delays) > max(smart_cut.X264_DELAY_ARGS):
+        return f"B-frame delays {sorted(delays)} cannot be joined"
+    for (f, _, _), info in zip(plan, infos):
+        if _signature(info) != _signature(first):
+            return f"{os.path.basename(f)} differs in codec/resolution/fps/pixel format"
+    return None
+
+
+def render_title_card(text: str, info: Dict[str, Any], seconds: float = 2) -> str:
+    """The title card's video encoded with the same parameters as the sources (from the overlay cache).
+
+    Its B-frame delay is x264's largest, so the DTS of the first clip never starts before the card's ends.
+    """
+    return overlay_cache.card_segment([{"text": text}], info["width"], info["height"], seconds, info["fps"],
+                                      info["pix_fmt"] or "yuv420p")
+
+
+def assemble_copy(plan: List[Segment], out_path: str, title_text: str, title_seconds: float = 2) -> str:
+    """Join ``plan`` behind the title card, re-encoding only the partial GOPs at each cut."""
+    info = media_index().get(plan[0][0])
+    work = tempfile.mkdtemp(prefix="concat_", dir=os.path.dirname(out_path) or ".")
+    try:
+        pieces = [render_title_card(title_text, info, title_seconds)]
+        for src, start, end in plan:
+            pieces += smart_cut.plan_pieces(src, start, end, work)
+        audio = parallel_render.render_audio([(None, 0.0, title_seconds)] + plan, os.path.join(work, "audio.m4a"))
+        parallel_render.join_segments(pieces, audio, out_path, work)
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+    return out_path
@@ -0,0 +1,202 @@
+"""Perceptual fingerprints to spot re-uploads of the same footage.
+
+Each clip is reduced to 64-bit DCT hashes of its keyframes (decoded at 32x32
+grayscale from the central region, so side crops and corner watermarks barely
+move the bits). Hashes go into a multi-index hash table over Hamming
+distance; a new clip is a duplicate when enough of its frames land near
+frames of one library clip.
+"""
+from __future__ import annotations
+import argparse, logging, json, os, glob
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from common import setup_logging, config
+from video_editing import frame_sampler
+
+log = logging.getLogger("fingerprint")
+
+HASH_SIZE = 32          # decoded frame edge (pixels)
+LOW_FREQ = 8            # 8x8 DCT block -> 64-bit hash
+MAX_FRAMES = 48
+CENTER = 0.8            # fraction of width/height kept before hashing
+# Re-uploads shift keyframes by up to a GOP, so frames only need to be close and
+# a minority of them matching is already strong evidence (unrelated clips sit ~28+ bits apart).
+MAX_DISTANCE = 12
+MIN_MATCH = 0.25
+
+
+def sample_keyframes(path: str, max_frames: int = MAX_FRAMES) -> np.ndarray:
+    """Decode only keyframes, centre-cropped and scaled to HASH_SIZE grayscale: (N, H, W) uint8."""
+    # Full-quality decode: hashes already in the index must stay comparable
+    return frame_sampler.sample(path, HASH_SIZE, HASH_SIZE, keyframes=True, fast=False, gray=True, crop=CENTER,
+                                flags="area", max_frames=max_frames, batch=max_frames, check=True)
+
+
+def _dct_matrix(n: int) -> np.ndarray:
+    k = np.arange(n)[:, None]
+    i = np.arange(n)[None, :]
+    m = np.cos(np.pi * (2 * i + 1) * k / (2 * n)) * np.sqrt(2.0 / n)
+    m[0] /= np.sqrt(2.0)
+    return m
+
+
+_DCT = _dct_matrix(HASH_SIZE)
+
+
+def phash_frames(frames: np.ndarray) -> List[int]:
+    """64-bit perceptual hash per frame, computed for the whole batch at once."""
+    if len(frames) == 0:
+        return []
+    x = frames.astype(np.float32)
+    coeffs = _DCT @ x @ _DCT.T                      # batched 2-D DCT, (N, 32, 32)
+    low = coeffs[:, :LOW_FREQ, :LOW_FREQ].reshape(len(frames), -1)
+    med = np.median(low[:, 1:], axis=1, keepdims=True)  # skip DC term
+    bits = np.packbits(low > med, axis=1)           # (N, 8) bytes
+    return [int.from_bytes(row.tobytes(), "big") for row in bits]
+
+
+CHUNKS = 4                       # 64-bit hash -> four 16-bit substrings
+CHUNK_BITS = 64 // CHUNKS
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def _flip_masks(bits: int, radius: int) -> np.ndarray:
+    """Every ``bits``-wide value with at most ``radius`` bits set."""
+    vals = np.arange(1 << bits, dtype=np.uint32)
+    pop = _POPCOUNT[vals & 0xFF] + _POPCOUNT[vals >> 8]
+    return vals[pop <= radius]
+
+
+class MultiIndexHash:
+    """Multi-index hashing over 64-bit hashes (Norouzi et al.).
+
+    Two hashes within distance ``r`` share at least one 16-bit chunk within
+    ``r // 4`` bits, so candidates come from a handful of exact bucket
+    lookups per chunk and are then verified with a vectorized popcount.
+    """
+
+    def __init__(self):
+        self.hashes: List[int] = []
+        self.keys: List[str] = []
+        self.tables: List[Dict[int, List[int]]] = [{} for _ in range(CHUNKS)]
+        self._array: Optional[np.ndarray] = None
+        self._masks: Dict[int, np.ndarray] = {}
+
+    def __len__(self) -> int:
+        return len(self.hashes)
+
+    def add(self, h: int, key: str) -> None:
+        row = len(self.hashes)
+        self.hashes.append(h)
+        self.keys.append(key)
+        for j, table in enumerate(self.tables):
+            table.setdefault((h >> (CHUNK_BITS * j)) & 0xFFFF, []).append(row)
+        self._array = None
+
+    def search(self, h: int, radius: int) -> List[Tuple[int, str]]:
+        """All (distance, key) pairs within ``radius`` of ``h``."""
+        if not self.hashes:
+            return []
+        sub_radius = radius // CHUNKS
+        masks = self._masks.get(sub_radius)
+        if masks is None:
+            masks = self._masks[sub_radius] = _flip_masks(CHUNK_BITS, sub_radius)
+        rows = set()
+        for j, table in enumerate(self.tables):
+            chunk = (h >> (CHUNK_BITS * j)) & 0xFFFF
+            for probe_val in (masks ^ chunk).tolist():
+                hit = table.get(probe_val)
+                if hit:
+                    rows.update(hit)
+        if not rows:
+            return []
+        if self._array is None:
+            self._array = np.array(self.hashes, dtype=np.uint64)
+        idx = np.fromiter(rows, dtype=np.int64, count=len(rows))
+        xor = self._array[idx] ^ np.uint64(h)
+        dist = _POPCOUNT[xor.view(np.uint8).reshape(-1, 8)].sum(axis=1)
+        ok = dist <= radius
+        return [(int(d), self.keys[r]) for d, r in zip(dist[ok], idx[ok])]
+
+
+class FingerprintIndex:
+    """Library of clip fingerprints persisted as JSON, searched through multi-index hashing."""
+
+    def __init__(self, path: str = None):
+        self.path = path or os.path.join(config.CACHE_DIR, "fingerprints.json")
+        data: Dict[str, Dict] = {}
+        if os.path.exists(self.path):
+            with open(self.path) as f:
+                data = json.load(f)
+        self.clips: Dict[str, List[str]] = data.get("clips", {})
+        # Keys already found to be re-uploads -> the library clip they duplicate
+        self.duplicates: Dict[str, str] = data.get("duplicates", {})
+        self.mih = MultiIndexHash()
+        for key, hashes in self.clips.items():
+            for h in hashes:
+                self.mih.add(int(h, 16), key)
+
+    def save(self) -> None:
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump({"clips": self.clips, "duplicates": self.duplicates}, f)
+        os.replace(tmp, self.path)
+
+    def add(self, key: str, hashes: List[int]) -> None:
+        self.clips[key] = [f"{h:016x}" for h in hashes]
+        for h in hashes:
+            self.mih.add(h, key)
+        self.save()
+
+    def find_duplicate(self, hashes: List[int], max_distance: int = MAX_DISTANCE,
+                       min_match: float = MIN_MATCH, exclude: str = None) -> Optional[str]:
+        """Library clip matching at least ``min_match`` of ``hashes``, if any."""
+        if not hashes:
+            return None
+        votes: Counter = Counter()
+        for h in hashes:
+            keys = {k for _, k in self.mih.search(h, max_distance) if k != exclude}
+            votes.update(keys)
+        if not votes:
+            return None
+        key, count = votes.most_common(1)[0]
+        return key if count / len(hashes) >= min_match else None
+
+
+def fingerprint(path: str) -> List[int]:
+    return phash_frames(sample_keyframes(path))
+
+
+def check_and_register(index: FingerprintIndex, key: str, path: str) -> Optional[str]:
+    """Fingerprint ``path``; return the library key it duplicates, else register it and return None."""
+    if key in index.duplicates:
+        return index.duplicates[key]
+    hashes = fingerprint(path)
+    dup = index.find_duplicate(hashes, exclude=key)
+    if dup is None:
+        index.add(key, hashes)
+    else:
+        index.duplicates[key] = dup
+        index.save()
+    return dup
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clips-dir", default=os.path.join(config.OUTPUT_DIR, "clips"))
+    parser.add_argument("--log-level", default=None)
+    args = parser.parse_args()
+    setup_logging(args.log_level)
+    index = FingerprintIndex()
+    for f in sorted(glob.glob(os.path.join(args.clips_dir, "*.mp4"))):
+        key = os.path.splitext(os.path.basename(f))[0]
+        dup = check_and_register(index, key, f)
+        if dup:
+            log.info("%s duplicates %s", key, dup)
+    log.info("Fingerprint library holds %d clips", len(index.clips))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,309 @@
+"""Streaming frame pipeline over ffmpeg pipes.
+
+MoviePy allocates a new array for every frame at every transform step. This
+renderer instead reads each frame from an ffmpeg rawvideo pipe straight into
+one of a fixed pool of preallocated buffers (``readinto``). Transforms run
+on that memory: overlays and colour in place, the tracking crop into a
+second preallocated pool. The encoder pipe is then written from the same
+buffer. Decode, transform and encode each run on their own thread, linked
+by bounded queues. The pools therefore bound memory, and a slow stage
+applies back-pressure instead of queueing frames.
+
+Work that ffmpeg does better stays in the decoder: scaling, padding and
+static crops. Overlays come pre-rendered from ``overlay_cache``. Cards
+(``source`` None) are composed once, and the same buffer is then sent for
+every frame of the card.
+
+Entry transforms may include ``"color": {"gain": 1.1, "lift": 0.0,
+"gamma": 0.9}``, which is applied as an in-place lookup table.
+
+``audio`` replaces the entries' own sound with a finished track (e.g. a
+voiceover) muxed as is.
+"""
+from __future__ import annotations
+import argparse, logging, os, queue, shutil, subprocess, tempfile, threading, time
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+from common import setup_logging
+from common.media import ffmpeg_exe, media_index
+from video_editing import edl as edl_io, overlay_cache, parallel_render
+from video_editing.render_profile import DRAFT, FINAL, RenderProfile
+
+log = logging.getLogger("frame_pipeline")
+
+QUEUE_DEPTH = 8  # frames in flight between two stages
+_POLL = 0.1
+
+
+class _Stopped(Exception):
+    """Another stage failed; unwind this one."""
+
+
+def _get(q: "queue.Queue", stop: threading.Event) -> Any:
+    while True:
+        try:
+            return q.get(timeout=_POLL)
+        except queue.Empty:
+            if stop.is_set():
+                raise _Stopped()
+
+
+def _put(q: "queue.Queue", item: Any, stop: threading.Event) -> None:
+    while True:
+        try:
+            return q.put(item, timeout=_POLL)
+        except queue.Full:
+            if stop.is_set():
+                raise _Stopped()
+
+
+class FramePool:
+    """``count`` preallocated frame buffers of up to ``nbytes`` each, lent out by index."""
+
+    def __init__(self, count: int, nbytes: int):
+        self.buffers = [np.empty(nbytes, np.uint8) for _ in range(count)]
+        self.free: "queue.Queue[int]" = queue.Queue()
+        for i in range(count):
+            self.free.put(i)
+
+    def acquire(self, stop: threading.Event) -> int:
+        return _get(self.free, stop)
+
+    def release(self, i: int) -> None:
+        self.free.put(i)
+
+    def frame(self, i: int, width: int, height: int) -> np.ndarray:
+        """View of buffer ``i`` as a ``height`` x ``width`` RGB frame (no copy)."""
+        return self.buffers[i][:width * height * 3].reshape(height, width, 3)
+
+
+class Overlay:
+    """RGBA layer alpha-blended in place, only over the box where it is not transparent."""
+
+    def __init__(self, rgba: np.ndarray):
+        ys, xs = np.nonzero(rgba[..., 3])
+        self.box = None
+        if len(ys):
+            self.box = (slice(ys.min(), ys.max() + 1), slice(xs.min(), xs.max() + 1))
+            layer = rgba[self.box]
+            alpha = layer[..., 3:].astype(np.float32) / 255.0
+            self.premultiplied = layer[..., :3].astype(np.float32) * alpha
+            self.inverse = 1.0 - alpha
+            self.scratch = np.empty(self.premultiplied.shape, np.float32)
+
+    def apply(self, frame: np.ndarray) -> None:
+        if self.box is None:
+            return
+        region = frame[self.box]
+        np.multiply(region, self.inverse, out=self.scratch)
+        self.scratch += self.premultiplied
+        np.copyto(region, self.scratch, casting="unsafe")
+
+
+def color_lut(gain: float = 1.0, lift: float = 0.0, gamma: float = 1.0) -> np.ndarray:
+    """256-entry lookup table for ``(lift + gain * v) ** gamma`` on 0..1 values."""
+    v = np.arange(256, dtype=np.float64) / 255.0
+    out = np.clip(lift + gain * v, 0.0, 1.0) ** gamma
+    return np.round(out * 255.0).astype(np.uint8)
+
+
+def _read_exact(stream, buf: np.ndarray) -> bool:
+    """Fill ``buf`` from a raw pipe; False at end of stream."""
+    view, filled = memoryview(buf), 0
+    while filled < len(view):
+        n = stream.readinto(view[filled:])
+        if not n:
+            if filled:
+                raise RuntimeError("Decoder ended mid-frame")
+            return False
+        filled += n
+    return True
+
+
+def _load_overlay(overlay: Dict[str, Any], width: int, height: int, scale: float) -> Overlay:
+    return Overlay(overlay_cache.overlay_rgba(overlay, width, height, scale))
+
+
+def plan_entry(entry: Dict[str, Any], width: int, height: int, profile: RenderProfile) -> Dict[str, Any]:
+    """Decoder command, decoded size, per-frame crop offsets and in-place transforms for one entry."""
+    frames = max(1, int(round((entry["out"] - entry["in"]) * profile.fps)))
+    transforms = entry["transforms"]
+    plan: Dict[str, Any] = {"frames": frames, "cmd": None, "size": (width, height), "crop": None,
+                            "overlays": [_load_overlay(o, width, height, profile.scale) for o in entry["overlays"]],
+                            "lut": color_lut(**transforms["color"]) if transforms.get("color") else None}
+    if not entry["source"]:
+        return plan
+    fit = transforms.get("fit") or "pad"
+    if fit == "track":
+        # Decode at the smallest size that covers the output, then follow the action in Python
+        info = media_index().get(entry["source"])
+        s = max(width / info["width"], height / info["height"])
+        dw = max(width, int(round(info["width"] * s / 2)) * 2)
+        dh = max(height, int(round(info["height"] * s / 2)) * 2)
+        points = transforms.get("crop_x") or [[0.0, 0.5]]
+        centres = np.interp(np.arange(frames) / profile.fps, [p[0] for p in points], [p[1] for p in points])
+        plan["crop"] = (np.clip(np.round(centres * dw - width / 2), 0, dw - width).astype(int), (dh - height) // 2)
+        plan["size"] = (dw, dh)
+        vf = f"scale={dw}:{dh},setsar=1"
+    else:
+        vf = parallel_render.FIT_FILTERS[fit](width, height)
+    # fps pins the frame rate; tpad + -frames:v make the frame count exact even if the source runs short
+    vf += f",fps={profile.fps},tpad=stop=-1:stop_mode=clone"
+    plan["cmd"] = [ffmpeg_exe(), "-v", "error", "-ss", f"{entry['in']:.3f}", "-t", f"{entry['out'] - entry['in']:.3f}",
+                   "-i", entry["source"], "-vf", vf, "-frames:v", str(frames), "-f", "rawvideo", "-pix_fmt", "rgb24", "-"]
+    return plan
+
+
+def _card_frame(plan: Dict[str, Any], width: int, height: int) -> np.ndarray:
+    frame = np.zeros((height, width, 3), np.uint8)
+    for overlay in plan["overlays"]:
+        overlay.apply(frame)
+    if plan["lut"] is not None:
+        np.take(plan["lut"], frame, out=frame, mode="clip")
+    return frame
+
+
+def render_edl(edl: Dict[str, Any], out_path: str, profile: RenderProfile = FINAL,
+               queue_depth: int = QUEUE_DEPTH, audio: Optional[str] = None) -> Dict[str, float]:
+    """Render ``edl`` to ``out_path`` through the decode -> transform -> encode thread pipeline.
+
+    ``audio`` is a finished track (copied, not re-encoded) to use instead of mixing the entries' own.
+    """
+    width, height = profile.size(edl["width"], edl["height"])
+    work = tempfile.mkdtemp(prefix="pipeline_", dir=os.path.dirname(os.path.abspath(out_path)))
+    stop = threading.Event()
+    errors: List[BaseException] = []
+    try:
+        plans = [plan_entry(e, width, height, profile) for e in edl["entries"]]
+        cards = {n: _card_frame(p, width, height) for n, p in enumerate(plans) if p["cmd"] is None}
+        decoded_bytes = max(p["size"][0] * p["size"][1] * 3 for p in plans)
+        # queue_depth frames per queue, plus one held by each stage
+        in_pool = FramePool(queue_depth * 2 + 2, decoded_bytes)
+        out_pool = FramePool(queue_depth + 2, width * height * 3)
+        decoded: "queue.Queue[Optional[Tuple[int, int, int]]]" = queue.Queue(queue_depth)
+        # (pool, buffer index), or (None, entry number) for a card's shared frame
+        ready: "queue.Queue[Optional[Tuple[Optional[FramePool], int]]]" = queue.Queue(queue_depth)
+        if audio is None:
+            audio = parallel_render.render_audio([(e["source"], e["in"], e["out"]) for e in edl["entries"]],
+                                                 os.path.join(work, "audio.m4a"))
+        enc_cmd = [ffmpeg_exe(), "-v", "error", "-y", "-f", "rawvideo", "-pix_fmt", "rgb24", "-s", f"{width}x{height}",
+                   "-r", str(profile.fps), "-i", "-"]
+        if audio:
+            enc_cmd += ["-i", audio, "-map", "0:v", "-map", "1:a", "-c:a", "copy", "-shortest"]
+        enc_cmd += profile.x264_args() + ["-movflags", "+faststart", out_path]
+        encoder = subprocess.Popen(enc_cmd, stdin=subprocess.PIPE)
+
+        def stage(fn):
+            def run():
+                try:
+                    fn()
+                except _Stopped:
+                    pass
+                except BaseException as e:  # surface on the calling thread
+                    errors.append(e)
+                    stop.set()
+            return threading.Thread(target=run, name=fn.__name__, daemon=True)
+
+        def decode():
+            for n, plan in enumerate(plans):
+                if plan["cmd"] is None:
+                    for k in range(plan["frames"]):
+                        _put(decoded, (n, k, -1), stop)
+                    continue
+                dw, dh = plan["size"]
+                proc = subprocess.Popen(plan["cmd"], stdout=subprocess.PIPE, bufsize=0)
+                try:
+                    for k in range(plan["frames"]):
+                        i = in_pool.acquire(stop)
+                        if not _read_exact(proc.stdout, in_pool.buffers[i][:dw * dh * 3]):
+                            in_pool.release(i)
+                            raise RuntimeError(f"{edl['entries'][n]['source']} ended after {k} frames")
+                        _put(decoded, (n, k, i), stop)
+                finally:
+                    proc.stdout.close()
+                    proc.kill()
+                    proc.wait()
+            _put(decoded, None, stop)
+
+        def transform():
+            while True:
+                item = _get(decoded, stop)
+                if item is None:
+                    _put(ready, None, stop)
+                    return
+                n, k, i = item
+                plan = plans[n]
+                if i < 0:
+                    _put(ready, (None, n), stop)
+                    continue
+                frame = in_pool.frame(i, *plan["size"])
+                pool = in_pool
+                if plan["crop"] is not None:
+                    xs, y = plan["crop"]
+                    o = out_pool.acquire(stop)
+                    out = out_pool.frame(o, width, height)
+                    np.copyto(out, frame[y:y + height, xs[k]:xs[k] + width])
+                    in_pool.release(i)
+                    frame, pool, i = out, out_pool, o
+                for overlay in plan["overlays"]:
+                    overlay.apply(frame)
+                if plan["lut"] is not None:
+                    np.take(plan["lut"], frame, out=frame, mode="clip")
+                _put(ready, (pool, i), stop)
+
+        def encode():
+            while True:
+                item = _get(ready, stop)
+                if item is None:
+                    return
+                pool, i = item
+                if pool is None:
+                    encoder.stdin.write(memoryview(cards[i]))
+                else:
+                    encoder.stdin.write(memoryview(pool.frame(i, width, height)))
+                    pool.release(i)
+
+        started = time.perf_counter()
+        threads = [stage(decode), stage(transform), stage(encode)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        if errors:
+            encoder.kill()  # don't finalize a truncated file
+        try:
+            encoder.stdin.close()
+        except BrokenPipeError:
+            pass
+        if encoder.wait() != 0 and not errors:
+            errors.append(RuntimeError(f"Encoder exited with status {encoder.returncode}"))
+        if errors:
+            raise errors[0]
+        elapsed = time.perf_counter() - started
+        frames = sum(p["frames"] for p in plans)
+        log.info("Pipeline rendered %d frames at %dx%d in %.1fs (%.1f fps)", frames, width, height, elapsed,
+                 frames / elapsed)
+        return {"frames": frames, "seconds": round(elapsed, 2), "fps": round(frames / elapsed, 1)}
+    finally:
+        stop.set()
+        shutil.rmtree(work, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render an edit decision list through the streaming pipeline")
+    parser.add_argument("edl")
+    parser.add_argument("--out", required=True)
+    parser.add_argument("--draft", action="store_true")
+    parser.add_argument("--queue-depth", type=int, default=QUEUE_DEPTH)
+    parser.add_argument("--log-level", default=None)
+    args = parser.parse_args()
+    setup_logging(args.log_level)
+    edl = edl_io.load(args.edl)
+    profile = DRAFT if args.draft else FINAL
+    if args.draft:
+        edl = edl_io.with_proxies(edl, profile.size(edl["width"], edl["height"])[1])
+    render_edl(edl, args.out, profile, args.queue_depth)
+
+
+if __name__ == "__main__":
+    main()
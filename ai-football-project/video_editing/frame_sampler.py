@@ -0,0 +1,168 @@
+"""Frame sampler for analysis: some frames of a clip, small, as one NumPy array.
+
+Thumbnails, QC, fingerprints, scene detection and smart crop all need a
+sample of the picture, not every frame at full quality. This module builds
+the one ffmpeg rawvideo decode they share:
+
+* ``keyframes=True`` has the decoder skip every non-key frame
+  (``-skip_frame nokey``), so only one frame per GOP is decoded at all.
+  With ``fps`` as well, the keyframes are thinned to at most that rate,
+  and when that is sparser than the GOP the surplus keyframe packets are
+  dropped in the demuxer (``noise`` bitstream filter) before they reach the
+  decoder: one frame every 10 s of an hour-long match decodes ~360 frames.
+* ``fps`` alone samples at a fixed rate, e.g. 10 fps for scene
+  detection, and ``fast=True`` skips non-reference frames.
+* ``fast=True`` also skips the deblocking filter, which analysis does not
+  notice.
+* Frames are scaled in the decoder to ``width`` x ``height`` (after an
+  optional centred ``crop`` fraction) and come back as
+  ``(N, height, width, 3)`` RGB, or ``(N, height, width)`` with
+  ``gray=True``.
+
+``sample`` returns everything in one array; ``iter_batches`` yields
+fixed-size batches so long clips are scored in bounded memory.
+"""
+from __future__ import annotations
+import argparse, logging, re, subprocess, time
+from typing import Iterator, List, Optional
+import numpy as np
+from common import setup_logging
+from common.media import ffmpeg_exe, media_index
+
+log = logging.getLogger("frame_sampler")
+
+BATCH_FRAMES = 256
+# Packets demuxed (no decode) when measuring the keyframe interval
+KEYFRAME_SCAN_SECONDS = 60
+# Keyframes kept per sampling period span this many GOPs, so no period comes up empty
+KEYFRAME_WINDOW = 1.5
+
+
+def _scan_interval(path: str) -> Optional[float]:
+    """Median keyframe spacing over the first minute, from keyframe packet timestamps (demux only)."""
+    cmd = [ffmpeg_exe(), "-v", "error", "-discard", "nokey", "-t", str(KEYFRAME_SCAN_SECONDS), "-i", path,
+           "-map", "0:v:0", "-c", "copy", "-f", "framecrc", "-"]
+    out = subprocess.run(cmd, capture_output=True, text=True).stdout
+    tb = re.search(r"^#tb 0: (\d+)/(\d+)", out, re.M)
+    if not tb:
+        return None
+    scale = int(tb.group(1)) / int(tb.group(2))
+    times = sorted(int(line.split(",")[2]) * scale for line in out.splitlines() if line and line[0] != "#")
+    gaps = sorted(b - a for a, b in zip(times, times[1:]) if b > a)
+    return round(gaps[len(gaps) // 2], 3) if gaps else None
+
+
+def keyframe_interval(path: str) -> Optional[float]:
+    """Typical keyframe spacing in seconds: from the probe when it has one, else scanned once and cached."""
+    index = media_index()
+    gap = index.get(path).get("keyframe_interval") or index.extra(path, "keyframe_interval")
+    if gap is None:
+        gap = _scan_interval(path)
+        if gap:
+            index.annotate(path, "keyframe_interval", gap)
+    return gap
+
+
+def sampler_cmd(path: str, width: int, height: int, fps: Optional[float] = None, keyframes: bool = False,
+                fast: bool = True, gray: bool = False, crop: Optional[float] = None, flags: str = "fast_bilinear",
+                max_frames: Optional[int] = None, start: Optional[float] = None,
+                duration: Optional[float] = None) -> List[str]:
+    """ffmpeg command that writes the sampled frames as raw RGB/gray to stdout."""
+    cmd = [ffmpeg_exe(), "-v", "error"]
+    if keyframes:
+        cmd += ["-skip_frame", "nokey"]
+        gap = keyframe_interval(path) if fps else None
+        if gap and KEYFRAME_WINDOW * gap < 1.0 / fps:
+            # Only keyframes early in each sampling period reach the decoder
+            drop = f"not(key)+gte(mod((pts-startpts)*tb\\,{1.0 / fps:.6f})\\,{KEYFRAME_WINDOW * gap:.6f})"
+            cmd += ["-discard", "nokey", "-bsf:v", f"noise=drop={drop}"]
+    elif fast:
+        cmd += ["-skip_frame", "noref"]
+    if fast:
+        cmd += ["-skip_loop_filter", "all", "-flags2", "fast"]
+    if start:
+        cmd += ["-ss", f"{start:.3f}"]
+    if duration:
+        cmd += ["-t", f"{duration:.3f}"]
+    cmd += ["-i", path, "-an"]
+    filters = []
+    if keyframes and fps:
+        # Keep the first keyframe of each 1/fps period
+        period = f"{1.0 / fps:.6f}"
+        filters.append(f"select='isnan(prev_selected_t)"
+                       f"+gt(floor((t-start_t)/{period})\\,floor((prev_selected_t-start_t)/{period}))'")
+    elif fps:
+        filters.append(f"fps={fps}")
+    if crop:
+        filters.append(f"crop=iw*{crop}:ih*{crop}")
+    filters.append(f"scale={width}:{height}:flags={flags}")
+    filters.append("format=gray" if gray else "format=rgb24")
+    cmd += ["-vf", ",".join(filters)]
+    if keyframes:
+        cmd += ["-fps_mode", "vfr"]  # one output frame per decoded keyframe, no duplicates
+    if max_frames:
+        cmd += ["-frames:v", str(max_frames)]
+    return cmd + ["-f", "rawvideo", "-"]
+
+
+def _frame_shape(width: int, height: int, gray: bool):
+    return (height, width) if gray else (height, width, 3)
+
+
+def iter_batches(path: str, width: int, height: int, batch: int = BATCH_FRAMES, check: bool = False,
+                 **options) -> Iterator[np.ndarray]:
+    """Sampled frames in batches of up to ``batch``; options as for ``sampler_cmd``.
+
+    With ``check``, a decode that ends in an ffmpeg error raises ``CalledProcessError``
+    instead of just ending early.
+    """
+    shape = _frame_shape(width, height, options.get("gray", False))
+    frame_bytes = int(np.prod(shape))
+    cmd = sampler_cmd(path, width, height, **options)
+    with subprocess.Popen(cmd, stdout=subprocess.PIPE) as proc:
+        while True:
+            frames = np.empty((batch,) + shape, np.uint8)
+            view, filled = memoryview(frames.reshape(-1)), 0
+            while filled < len(view):
+                n = proc.stdout.readinto(view[filled:])
+                if not n:
+                    break
+                filled += n
+            n = filled // frame_bytes
+            if n:
+                yield frames[:n]
+            if filled < len(view):
+                break
+    if check and proc.returncode:
+        raise subprocess.CalledProcessError(proc.returncode, cmd)
+
+
+def sample(path: str, width: int, height: int, **options) -> np.ndarray:
+    """All sampled frames as one ``(N, H, W[, 3])`` uint8 array."""
+    batches = list(iter_batches(path, width, height, **options))
+    if not batches:
+        return np.zeros((0,) + _frame_shape(width, height, options.get("gray", False)), np.uint8)
+    return batches[0] if len(batches) == 1 else np.concatenate(batches)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sample frames from a clip into a .npy array")
+    parser.add_argument("path")
+    parser.add_argument("--width", type=int, default=160)
+    parser.add_argument("--height", type=int, default=90)
+    parser.add_argument("--fps", type=float, default=None, help="Target sampling rate")
+    parser.add_argument("--keyframes", action="store_true", help="Decode keyframes only")
+    parser.add_argument("--gray", action="store_true")
+    parser.add_argument("--out", default=None, help="Save the (N, H, W[, 3]) array here")
+    parser.add_argument("--log-level", default=None)
+    args = parser.parse_args()
+    setup_logging(args.log_level)
+    started = time.perf_counter()
+    frames = sample(args.path, args.width, args.height, fps=args.fps, keyframes=args.keyframes, gray=args.gray)
+    log.info("Sampled %d frames %s in %.2fs", len(frames), frames.shape[1:], time.perf_counter() - started)
+    if args.out:
+        np.save(args.out, frames)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""Locate the loudest moment of a clip from its audio (crowd roar, commentator peaks).
+
+Audio is decoded by ffmpeg to 8 kHz mono PCM and read in fixed-size chunks,
+so memory stays bounded whatever the clip length. Each chunk is reduced to a
+short-time energy curve in NumPy; an onset curve (rises in log energy) is
+added to it, and the best window is the maximum of a cumulative-sum sliding
+window over the combined score.
+"""
+from __future__ import annotations
+import argparse, logging, os, subprocess
+from typing import Tuple
+import numpy as np
+from common import setup_logging
+from common.media import ffmpeg_exe, media_index
+
+log = logging.getLogger("highlights")
+
+SAMPLE_RATE = 8000
+HOP_SECONDS = 0.1                    # energy resolution
+CHUNK_SECONDS = 30                   # PCM read per iteration
+ONSET_WEIGHT = 0.5
+
+
+def energy_curve(path: str) -> np.ndarray:
+    """Short-time energy (mean square, one value per HOP_SECONDS) of the first audio stream.
+
+    Raises ``CalledProcessError`` if ffmpeg fails to decode it.
+    """
+    hop = int(SAMPLE_RATE * HOP_SECONDS)
+    chunk_bytes = hop * int(CHUNK_SECONDS / HOP_SECONDS) * 2
+    cmd = [ffmpeg_exe(), "-v", "error", "-i", path, "-vn", "-ac", "1", "-ar", str(SAMPLE_RATE),
+           "-f", "s16le", "-"]
+    parts = []
+    with subprocess.Popen(cmd, stdout=subprocess.PIPE) as proc:
+        while True:
+            buf = proc.stdout.read(chunk_bytes)
+            if not buf:
+                break
+            pcm = np.frombuffer(buf[: len(buf) - len(buf) % 2], dtype=np.int16).astype(np.float32)
+            usable = len(pcm) - len(pcm) % hop
+            if usable:
+                frames = pcm[:usable].reshape(-1, hop) / 32768.0
+                parts.append(np.einsum("ij,ij->i", frames, frames) / hop)
+        if proc.wait():
+            raise subprocess.CalledProcessError(proc.returncode, cmd)
+    return np.concatenate(parts) if parts else np.zeros(0, dtype=np.float32)
+
+
+def highlight_score(energy: np.ndarray) -> np.ndarray:
+    """Per-hop excitement: normalised log energy plus weighted positive onsets."""
+    if len(energy) == 0:
+        return energy
+    loud = np.log10(energy + 1e-8)
+    loud = (loud - loud.mean()) / (loud.std() + 1e-8)
+    onset = np.maximum(np.diff(loud, prepend=loud[0]), 0.0)
+    onset = onset / (onset.max() + 1e-8)
+    return loud + ONSET_WEIGHT * onset
+
+
+def best_window(score: np.ndarray, window: float) -> Tuple[float, float]:
+    """Start/end seconds of the window with the highest summed score."""
+    n = int(round(window / HOP_SECONDS))
+    total = len(score) * HOP_SECONDS
+    if len(score) <= n:
+        return 0.0, min(window, total)
+    csum = np.concatenate(([0.0], np.cumsum(score, dtype=np.float64)))
+    sums = csum[n:] - csum[:-n]
+    start = int(np.argmax(sums)) * HOP_SECONDS
+    return round(start, 2), round(start + window, 2)
+
+
+def find_highlight(path: str, window: float = 12.0) -> Tuple[float, float]:
+    """Best ``window``-second span of ``path``; falls back to the opening if it has no (decodable) audio.
+
+    Results are cached on the file's media index entry.
+    """
+    index = media_index()
+    info = index.get(path)
+    opening = 0.0, min(window, info["duration"])
+    if not info["has_audio"]:
+        return opening
+    name = f"highlight_{window:g}"
+    cached = index.extra(path, name)
+    if cached:
+        return tuple(cached)
+    try:
+        energy = energy_curve(path)
+    except subprocess.CalledProcessError as e:
+        log.warning("Could not decode the audio of %s (%s); using its opening", path, e)
+        return opening
+    if len(energy) == 0:
+        return opening
+    span = best_window(highlight_score(energy), window)
+    index.annotate(path, name, list(span))
+    log.debug("Highlight of %s: %.1f-%.1fs", path, *span)
+    return span
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("path")
+    parser.add_argument("--window", type=float, default=12.0)
+    parser.add_argument("--log-level", default=None)
+    args = parser.parse_args()
+    setup_logging(args.log_level)
+    start, end = find_highlight(args.path, args.window)
+    log.info("Best %.0fs window of %s: %.1f-%.1fs", args.window, os.path.basename(args.path), start, end)
+
+
+if __name__ == "__main__":
+    main()
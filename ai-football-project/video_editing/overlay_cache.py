@@ -0,0 +1,208 @@
+"""Pre-rendered overlay assets: title cards, lower thirds, watermarks and end cards.
+
+An overlay is a small dict such as ``{"text": "Top Football Highlights"}``, with an
+optional ``template`` that supplies the rest of its look (``TEMPLATES``). It is drawn
+once with PIL into a full-frame RGBA layer and cached by a content hash of the merged
+overlay, the resolved font file and the frame size:
+
+* in memory, as a read-only ``(H, W, 4)`` uint8 array (``overlay_rgba``), for the
+  frame pipeline and MoviePy to blit;
+* on disk as ``CACHE_DIR/overlays/<hash>.png`` (``overlay_png``), for ffmpeg
+  ``overlay`` filters;
+* as a short encoded video-only card ``CACHE_DIR/overlays/card_<hash>.mp4``
+  (``card_segment``), for stream-copy concatenation.
+
+Render paths therefore only blit or concatenate cached assets; nothing goes through
+ImageMagick or ffmpeg's drawtext.
+"""
+from __future__ import annotations
+import argparse, hashlib, json, logging, os, subprocess, time
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+from PIL import Image, ImageColor, ImageDraw, ImageFont
+from common import setup_logging, config
+from common.media import ffmpeg_exe
+
+log = logging.getLogger("overlay_cache")
+
+CACHE_VERSION = 3
+TEMPLATES: Dict[str, Dict[str, Any]] = {
+    # box: "frame" tints the whole frame, "text" a padded box behind the text, "none" nothing
+    "title": {"fontsize": 70, "color": "white", "box_opacity": 0.7, "box": "frame", "position": "center"},
+    "end_card": {"fontsize": 60, "color": "white", "box_opacity": 1.0, "box": "frame", "position": "center"},
+    "lower_third": {"fontsize": 40, "color": "white", "box_opacity": 0.6, "box": "text", "position": "lower_left"},
+    "watermark": {"fontsize": 28, "color": "white", "box_opacity": 0, "box": "none", "position": "top_right",
+                  "opacity": 0.6},
+}
+# Horizontal/vertical placement of the text block within the frame margins
+ANCHORS = {"center": (0.5, 0.5), "top": (0.5, 0.0), "bottom": (0.5, 1.0), "top_left": (0.0, 0.0),
+           "top_right": (1.0, 0.0), "bottom_left": (0.0, 1.0), "bottom_right": (1.0, 1.0),
+           "lower_left": (0.0, 0.85)}
+FONT_CANDIDATES = ("DejaVuSans-Bold.ttf", "DejaVuSans.ttf", "LiberationSans-Bold.ttf", "Arial Bold.ttf",
+                   "Arial.ttf", "Helvetica.ttc")
+MARGIN = 0.05           # of the shorter frame edge
+PADDING = 0.3           # of the font size, around text boxes
+MEMORY_ENTRIES = 16
+
+_memory: Dict[str, np.ndarray] = {}
+_fonts: Dict[Tuple[Optional[str], int], Tuple[Any, str]] = {}
+
+
+def _cache_dir() -> str:
+    return os.path.join(config.CACHE_DIR, "overlays")
+
+
+def _font(name: Optional[str], size: int) -> Tuple[Any, str]:
+    """(PIL font, identity for the cache key); PIL's bitmap font when no TrueType font is found."""
+    if (name, size) not in _fonts:
+        found = (None, "default")
+        for candidate in ([name] if name else []) + list(FONT_CANDIDATES):
+            try:
+                font = ImageFont.truetype(candidate, size)
+            except OSError:
+                continue
+            found = (font, os.path.abspath(font.path) if isinstance(font.path, str) else candidate)
+            break
+        else:
+            log.warning("No TrueType font found (tried %s); using PIL's bitmap font", name or FONT_CANDIDATES[0])
+        _fonts[(name, size)] = found
+    return _fonts[(name, size)]
+
+
+def resolve(overlay: Dict[str, Any]) -> Dict[str, Any]:
+    """``overlay`` over its template's defaults."""
+    return dict(TEMPLATES[overlay.get("template", "title")], **overlay)
+
+
+def overlay_key(overlay: Dict[str, Any], width: int, height: int, scale: float = 1.0) -> str:
+    o = resolve(overlay)
+    size = max(8, int(o["fontsize"] * scale))
+    blob = json.dumps({"version": CACHE_VERSION, "overlay": o, "font": _font(o.get("font"), size)[1],
+                       "size": [width, height], "scale": scale}, sort_keys=True)
+    return hashlib.sha256(blob.encode()).hexdigest()
+
+
+def _text_layer(text: str, font: Any, size: int, fill: Tuple[int, int, int, int]) -> Image.Image:
+    """The text alone on a transparent layer cropped to its ink."""
+    if font is None:
+        # Bitmap fallback: draw at its native ~11px and scale up to the requested size
+        small = _text_layer(text, ImageFont.load_default(), 0, fill)
+        factor = size / 11.0
+        return small.resize((max(1, int(small.width * factor)), max(1, int(small.height * factor))),
+                            Image.NEAREST)
+    probe = ImageDraw.Draw(Image.new("RGBA", (1, 1)))
+    left, top, right, bottom = (int(round(v)) for v in probe.multiline_textbbox((0, 0), text, font=font,
+                                                                              align="center"))
+    layer = Image.new("RGBA", (max(1, right - left), max(1, bottom - top)), (0, 0, 0, 0))
+    ImageDraw.Draw(layer).multiline_text((-left, -top), text, font=font, fill=fill, align="center")
+    return layer
+
+
+def draw(overlay: Dict[str, Any], width: int, height: int, scale: float = 1.0) -> np.ndarray:
+    """Rasterize one overlay as a full-frame ``(height, width, 4)`` RGBA array (uncached)."""
+    o = resolve(overlay)
+    size = max(8, int(o["fontsize"] * scale))
+    font = _font(o.get("font"), size)[0]
+    r, g, b = ImageColor.getrgb(o["color"])[:3]
+    text = _text_layer(o["text"], font, size, (r, g, b, int(round(255 * o.get("opacity", 1.0)))))
+    margin = int(MARGIN * min(width, height))
+    if isinstance(o["position"], str):
+        fx, fy = ANCHORS[o["position"]]
+        x = margin + int(fx * max(0, width - text.width - 2 * margin))
+        y = margin + int(fy * max(0, height - text.height - 2 * margin))
+    else:
+        x, y = (int(v * scale) for v in o["position"])
+    box_alpha = int(round(255 * (o["box_opacity"] or 0)))
+    frame = Image.new("RGBA", (width, height), (0, 0, 0, box_alpha if o["box"] == "frame" else 0))
+    if o["box"] == "text" and box_alpha:
+        pad = int(PADDING * size)
+        ImageDraw.Draw(frame).rectangle((x - pad, y - pad, x + text.width + pad, y + text.height + pad),
+                                        fill=(0, 0, 0, box_alpha))
+    frame.alpha_composite(text, (max(0, x), max(0, y)))
+    return np.asarray(frame)
+
+
+def overlay_rgba(overlay: Dict[str, Any], width: int, height: int, scale: float = 1.0) -> np.ndarray:
+    """Cached ``draw``: the in-memory array if this process has it, else the PNG on disk, else a fresh render."""
+    key = overlay_key(overlay, width, height, scale)
+    rgba = _memory.get(key)
+    if rgba is None:
+        path = os.path.join(_cache_dir(), f"{key}.png")
+        if os.path.exists(path):
+            rgba = np.asarray(Image.open(path).convert("RGBA"))
+        else:
+            rgba = draw(overlay, width, height, scale)
+            _save_png(rgba, path)
+        rgba.flags.writeable = False
+        if len(_memory) >= MEMORY_ENTRIES:
+            _memory.pop(next(iter(_memory)))
+        _memory[key] = rgba
+    return rgba
+
+
+def _save_png(pixels: np.ndarray, path: str) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp.png"
+    Image.fromarray(pixels).save(tmp_path)
+    os.replace(tmp_path, path)
+
+
+def overlay_png(overlay: Dict[str, Any], width: int, height: int, scale: float = 1.0) -> str:
+    """Path of the overlay's cached full-frame RGBA PNG, rendered on first use."""
+    path = os.path.join(_cache_dir(), f"{overlay_key(overlay, width, height, scale)}.png")
+    if not os.path.exists(path):
+        overlay_rgba(overlay, width, height, scale)
+    return path
+
+
+def card_frame(overlays: List[Dict[str, Any]], width: int, height: int, scale: float = 1.0) -> np.ndarray:
+    """Overlays composited in order over black: an ``(height, width, 3)`` RGB card."""
+    frame = np.zeros((height, width, 3), np.float32)
+    for overlay in overlays:
+        rgba = overlay_rgba(overlay, width, height, scale)
+        alpha = rgba[..., 3:].astype(np.float32) / 255.0
+        frame += (rgba[..., :3] - frame) * alpha
+    return np.round(frame).astype(np.uint8)
+
+
+def card_segment(overlays: List[Dict[str, Any]], width: int, height: int, seconds: float, fps: float,
+                 pix_fmt: str = "yuv420p") -> str:
+    """Cached video-only H.264 card of ``seconds`` at ``fps``, with B-pyramid (a two-frame reorder delay)."""
+    blob = json.dumps({"overlays": [overlay_key(o, width, height) for o in overlays], "seconds": seconds,
+                       "fps": fps, "pix_fmt": pix_fmt}, sort_keys=True)
+    path = os.path.join(_cache_dir(), f"card_{hashlib.sha256(blob.encode()).hexdigest()}.mp4")
+    if os.path.exists(path):
+        return path
+    still = path[:-4] + ".png"
+    _save_png(card_frame(overlays, width, height), still)
+    tmp_path = f"{path}.{os.getpid()}.tmp.mp4"
+    cmd = [ffmpeg_exe(), "-v", "error", "-y", "-loop", "1", "-framerate", str(fps), "-i", still,
+           "-frames:v", str(int(round(seconds * fps))), "-r", str(fps), "-c:v", "libx264", "-tune", "stillimage",
+           "-bf", "3", "-b-pyramid", "normal", "-pix_fmt", pix_fmt, tmp_path]
+    try:
+        subprocess.run(cmd, check=True)
+        os.replace(tmp_path, path)
+    finally:
+        os.remove(still)
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render an overlay template into the asset cache")
+    parser.add_argument("text")
+    parser.add_argument("--template", choices=sorted(TEMPLATES), default="title")
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--log-level", default=None)
+    args = parser.parse_args()
+    setup_logging(args.log_level)
+    overlay = {"text": args.text, "template": args.template}
+    started = time.perf_counter()
+    path = overlay_png(overlay, args.width, args.height)
+    log.info("%s overlay at %s (%.1f ms)", args.template, path, (time.perf_counter() - started) * 1000)
+
+
+if __name__ == "__main__":
+    main()
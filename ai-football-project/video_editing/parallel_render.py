@@ -0,0 +1,129 @@
+"""Shared pieces of segment-parallel rendering, and a worker-scaling benchmark.
+
+Segments (see ``edl.render_outputs``) are encoded video-only by separate
+ffmpeg processes with identical x264 settings and closed GOPs, so they join
+losslessly with the concat demuxer. The audio track is rendered once for the
+whole timeline and muxed in at the end, which avoids AAC priming gaps at
+segment seams.
+"""
+from __future__ import annotations
+import argparse, glob, logging, os, shutil, subprocess, tempfile, time
+from typing import Any, Dict, List, Optional, Tuple
+from common import setup_logging, config
+from common.media import ffmpeg_exe, media_index
+from video_editing import smart_cut
+from video_editing.render_profile import FINAL, RenderProfile
+
+log = logging.getLogger("parallel_render")
+
+AUDIO_RATE = 44100
+# Source span [start, end), or a still image (or black, for None) shown for ``end - start`` seconds
+Piece = Tuple[Optional[str], float, float]
+
+
+def is_still(src: Optional[str]) -> bool:
+    return src is None or src.lower().endswith(".png")
+
+
+def x264_args(profile: RenderProfile, threads: int) -> List[str]:
+    return profile.x264_args() + ["-flags", "+cgop", "-bf", "2", "-threads", str(threads)]
+
+
+def fit_filter(width: int, height: int) -> str:
+    """Letterbox into ``width`` x ``height``."""
+    return (f"scale={width}:{height}:force_original_aspect_ratio=decrease,"
+            f"pad={width}:{height}:(ow-iw)/2:(oh-ih)/2,setsar=1")
+
+
+def crop_filter(width: int, height: int) -> str:
+    """Centre-crop to the ``width``:``height`` aspect ratio, then scale (crop first, so fewer pixels are scaled)."""
+    return (f"crop='min(iw,ih*{width}/{height})':'min(ih,iw*{height}/{width})',"
+            f"scale={width}:{height},setsar=1")
+
+
+FIT_FILTERS = {"pad": fit_filter, "crop": crop_filter}
+
+
+def render_audio(pieces: List[Piece], out_path: str) -> Optional[str]:
+    """One pass over every piece's audio (silence for stills and silent clips) into a single AAC track."""
+    index = media_index()
+    if not any(not is_still(p[0]) and index.get(p[0])["has_audio"] for p in pieces):
+        return None
+    cmd = [ffmpeg_exe(), "-v", "error", "-y"]
+    filters, labels = [], []
+    n_inputs = 0
+    for i, (src, start, end) in enumerate(pieces):
+        dur = end - start
+        if is_still(src) or not index.get(src)["has_audio"]:
+            filters.append(f"anullsrc=r={AUDIO_RATE}:cl=stereo,atrim=0:{dur:.3f}[a{i}]")
+        else:
+            cmd += ["-ss", f"{start:.3f}", "-t", f"{dur:.3f}", "-i", src]
+            filters.append(f"[{n_inputs}:a]aresample={AUDIO_RATE},aformat=channel_layouts=stereo,"
+                           f"apad,atrim=0:{dur:.3f},asetpts=PTS-STARTPTS[a{i}]")
+            n_inputs += 1
+        labels.append(f"[a{i}]")
+    filters.append("".join(labels) + f"concat=n={len(pieces)}:v=0:a=1[aout]")
+    if n_inputs == 0:
+        cmd += ["-f", "lavfi", "-i", "anullsrc"]  # filtergraph needs at least one input
+    cmd += ["-filter_complex", ";".join(filters), "-map", "[aout]", "-c:a", "aac", "-b:a", "160k", out_path]
+    subprocess.run(cmd, check=True)
+    return out_path
+
+
+def join_segments(segments: List[str], audio: Optional[str], out_path: str, work_dir: str) -> str:
+    """Concatenate encoded video ``segments`` losslessly and mux in the ``audio`` track (if any)."""
+    joined = os.path.join(work_dir, "video.mp4")
+    smart_cut.concat_copy(segments, joined, work_dir)
+    cmd = [ffmpeg_exe(), "-v", "error", "-y", "-i", joined]
+    if audio:
+        cmd += ["-i", audio, "-map", "0:v", "-map", "1:a", "-shortest"]
+    subprocess.run(cmd + ["-c", "copy", "-movflags", "+faststart", out_path], check=True)
+    return out_path
+
+
+def benchmark(edit: Dict[str, Any], max_workers: int = None, profile: RenderProfile = FINAL) -> Dict[int, float]:
+    """Render the same EDL with 1, 2, 4 ... ``max_workers`` workers and log the scaling.
+
+    Every run gets an empty segment cache of its own, so each one encodes the whole edit.
+    """
+    from video_editing import edl
+    max_workers = max_workers or os.cpu_count() or 1
+    counts, n = [], 1
+    while n < max_workers:
+        counts.append(n)
+        n *= 2
+    counts.append(max_workers)
+    timings: Dict[int, float] = {}
+    work = tempfile.mkdtemp(prefix="bench_")
+    try:
+        for n in counts:
+            seg_dir = os.path.join(work, f"segments_{n}")
+            started = time.perf_counter()
+            edl.render_edl(edit, os.path.join(work, f"bench_{n}.mp4"), n, profile, seg_dir)
+            timings[n] = time.perf_counter() - started
+            log.info("workers=%-3d %.1fs  speedup x%.2f", n, timings[n], timings[counts[0]] / timings[n])
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clips-dir", default=os.path.join(config.OUTPUT_DIR, "clips"))
+    parser.add_argument("--seconds-per-clip", type=float, default=12)
+    parser.add_argument("--max-workers", type=int, default=None)
+    parser.add_argument("--log-level", default=None)
+    args = parser.parse_args()
+    setup_logging(args.log_level)
+    files = sorted(glob.glob(os.path.join(args.clips_dir, "*.mp4")))
+    if not files:
+        raise SystemExit("No clips found. Run clip_finder/download.py first.")
+    from video_editing import edl
+    index = media_index()
+    plan = [(f, 0.0, min(index.get(f)["duration"], args.seconds_per_clip)) for f in files]
+    first = index.get(files[0])
+    benchmark(edl.make_edl(plan, first["width"], first["height"]), args.max_workers)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""Low-resolution proxy copies of source clips.
+
+Proxies live in ``CACHE_DIR/proxies`` and are keyed by the source's path, size
+and mtime, so an edited or replaced source never picks up a stale proxy. They
+keep the source's timestamps and audio, which means an edit plan made against
+the source plays back identically from its proxies. Draft renders and
+analysis passes use a proxy when a big enough one exists. Run this module to
+build proxies ahead of time.
+"""
+from __future__ import annotations
+import argparse, glob, hashlib, logging, os, subprocess
+from typing import Optional
+from common import setup_logging, config
+from common.media import ffmpeg_exe
+
+log = logging.getLogger("proxies")
+
+PROXY_HEIGHTS = (360, 135)
+
+
+def _proxy_dir() -> str:
+    return os.path.join(config.CACHE_DIR, "proxies")
+
+
+def proxy_path(path: str, height: int) -> str:
+    st = os.stat(path)
+    key = hashlib.sha1(f"{os.path.abspath(path)}|{st.st_size}|{st.st_mtime_ns}".encode()).hexdigest()[:12]
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(_proxy_dir(), f"{stem}_{key}_{height}p.mp4")
+
+
+def find_proxy(path: str, min_height: int) -> Optional[str]:
+    """Smallest existing proxy of ``path`` that is at least ``min_height`` tall."""
+    for height in sorted(PROXY_HEIGHTS):
+        candidate = proxy_path(path, height)
+        if height >= min_height and os.path.exists(candidate):
+            return candidate
+    return None
+
+
+def make_proxy(path: str, height: int = PROXY_HEIGHTS[0]) -> str:
+    out = proxy_path(path, height)
+    if os.path.exists(out):
+        return out
+    os.makedirs(_proxy_dir(), exist_ok=True)
+    tmp = out + ".part.mp4"
+    cmd = [ffmpeg_exe(), "-v", "error", "-y", "-i", path, "-vf", f"scale=-2:{height}",
+           "-c:v", "libx264", "-preset", "ultrafast", "-crf", "28", "-g", "30", "-c:a", "copy", tmp]
+    subprocess.run(cmd, check=True)
+    os.replace(tmp, out)
+    log.info("Proxy %s -> %s", path, out)
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clips-dir", default=os.path.join(config.OUTPUT_DIR, "clips"))
+    parser.add_argument("--height", type=int, choices=PROXY_HEIGHTS, default=PROXY_HEIGHTS[0])
+    parser.add_argument("--log-level", default=None)
+    args = parser.parse_args()
+    setup_logging(args.log_level)
+    for f in sorted(glob.glob(os.path.join(args.clips_dir, "*.mp4"))):
+        make_proxy(f, args.height)
+
+
+if __name__ == "__main__":
+    main()
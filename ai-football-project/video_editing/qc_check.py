@@ -1,26 +1,74 @@
-"""Basic QC checks (stub)."""
+"""Basic QC checks on exported variants: the shared media index plus a few sampled keyframes.
+
+``--decode`` also decodes every video frame and fails files whose decode logs
+errors or whose frame timestamps do not strictly increase (e.g. a bad
+stream-copy join).
+"""
 from __future__ import annotations
-import argparse, logging, os, json
+import argparse, logging, os, json, subprocess
 from typing import Dict
 from common import setup_logging, config
+from common.media import ffmpeg_exe, media_index
+from video_editing import frame_sampler
 
 log = logging.getLogger("qc_check")
 
-def qc(directory: str) -> Dict[str, str]:
+QC_FRAMES = 8       # keyframes sampled across the file
+BLACK_LEVEL = 16    # brightest sampled pixel below this: the picture is black
+
+def decode_problem(path: str) -> str:
+    """Decode all video frames at ``-v error``: "" if clean and every frame's PTS is above the previous one."""
+    cmd = [ffmpeg_exe(), "-v", "error", "-i", path, "-map", "0:v:0", "-fps_mode", "passthrough",
+           "-f", "framecrc", "-"]
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    if result.returncode or result.stderr.strip():
+        return "decode_errors"
+    previous = None
+    for line in result.stdout.splitlines():
+        if line and line[0] != "#":
+            pts = int(line.split(",")[2])
+            if previous is not None and pts <= previous:
+                return "pts_not_increasing"
+            previous = pts
+    return ""
+
+def check_file(path: str, decode: bool = False) -> str:
+    """Return "ok" or a short reason the file fails QC."""
+    if os.path.getsize(path) == 0:
+        return "empty"
+    try:
+        info = media_index().get(path)
+    except Exception as e:
+        log.debug("Probe failed for %s: %s", path, e)
+        return "unreadable"
+    if not info["has_video"] or info["duration"] <= 0:
+        return "no_video"
+    if not info["has_audio"]:
+        return "no_audio"
+    frames = frame_sampler.sample(path, 32, 18, keyframes=True, fps=QC_FRAMES / info["duration"], gray=True,
+                                  max_frames=QC_FRAMES)
+    if not len(frames):
+        return "undecodable"
+    if frames.max() < BLACK_LEVEL:
+        return "black"
+    return (decode and decode_problem(path)) or "ok"
+
+def qc(directory: str, decode: bool = False) -> Dict[str, str]:
     results = {}
     for f in os.listdir(directory):
         if f.endswith(".mp4"):
-            results[f] = "ok"
+            results[f] = check_file(os.path.join(directory, f), decode)
     log.info("QC results: %s", results)
     return results
 
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument("--dir", default=os.path.join(config.OUTPUT_DIR, "variants"))
+    parser.add_argument("--decode", action="store_true", help="Also decode every frame and check timestamps")
     parser.add_argument("--log-level", default=None)
     args = parser.parse_args()
     setup_logging(args.log_level)
-    qc(args.dir)
+    qc(args.dir, args.decode)
 
 if __name__ == "__main__":
     main()
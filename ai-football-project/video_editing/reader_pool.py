@@ -0,0 +1,87 @@
+"""Bounded pool of lazily opened source readers for MoviePy renders.
+
+Every ``VideoFileClip`` is a live ffmpeg decoder (plus one more for its audio)
+with frame buffers. Building a timeline out of them up front keeps every
+source open for the whole render. ``LazySource`` clips carry size, fps and
+duration from the media index instead, and only ask the pool for a reader
+when the render reaches them. The pool keeps at most ``max_open`` readers,
+closing the least recently used one to make room. A source also gives its
+reader back as soon as its last frame has been rendered.
+"""
+from __future__ import annotations
+import logging
+from collections import OrderedDict
+from typing import Any, Dict
+import numpy as np
+from moviepy.editor import AudioClip, VideoClip, VideoFileClip
+from common.media import media_index
+
+log = logging.getLogger("reader_pool")
+
+DEFAULT_MAX_OPEN = 2
+AUDIO_FPS = 44100
+
+
+class ReaderPool:
+    def __init__(self, max_open: int = DEFAULT_MAX_OPEN):
+        self.max_open = max(1, max_open)
+        self._open: "OrderedDict[str, VideoFileClip]" = OrderedDict()
+        self.opened = 0
+        self.peak = 0
+
+    def get(self, path: str) -> VideoFileClip:
+        clip = self._open.get(path)
+        if clip is not None:
+            self._open.move_to_end(path)
+            return clip
+        while len(self._open) >= self.max_open:
+            old, oldest = self._open.popitem(last=False)
+            log.debug("Evicting reader for %s", old)
+            oldest.close()
+        clip = VideoFileClip(path, audio=media_index().get(path)["has_audio"], audio_fps=AUDIO_FPS)
+        self._open[path] = clip
+        self.opened += 1
+        self.peak = max(self.peak, len(self._open))
+        return clip
+
+    def release(self, path: str) -> None:
+        clip = self._open.pop(path, None)
+        if clip is not None:
+            clip.close()
+
+    def close(self) -> None:
+        while self._open:
+            self._open.popitem(last=False)[1].close()
+        log.debug("Reader pool: %d opens, peak %d open at once", self.opened, self.peak)
+
+    def __enter__(self) -> "ReaderPool":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+
+class LazySource(VideoClip):
+    """``path[start:end]`` as a clip that opens its reader only when a frame is requested."""
+
+    def __init__(self, pool: ReaderPool, path: str, start: float, end: float):
+        super().__init__(duration=end - start)
+        info: Dict[str, Any] = media_index().get(path)
+        self.pool, self.path, self.start_in_source = pool, path, start
+        self.size = (info["width"], info["height"])
+        self.fps = info["fps"] or 30
+        self.make_frame = self._frame
+        if info["has_audio"]:
+            audio = AudioClip(duration=self.duration, fps=AUDIO_FPS)
+            audio.nchannels = 2  # VideoFileClip always decodes audio as stereo
+            audio.make_frame = self._sound
+            self.audio = audio
+
+    def _frame(self, t: float) -> np.ndarray:
+        frame = self.pool.get(self.path).get_frame(self.start_in_source + t)
+        if t >= self.duration - 1.5 / self.fps:
+            self.pool.release(self.path)  # last frame of this segment
+        return frame
+
+    def _sound(self, t: Any) -> np.ndarray:
+        return self.pool.get(self.path).audio.get_frame(np.asarray(t) + self.start_in_source)
@@ -0,0 +1,35 @@
+"""Encoder settings for final and draft renders.
+
+A draft uses the same edit plan as the final render, so cuts, durations and
+ordering match exactly. Only the picture is cheaper: lower resolution,
+lower fps and the fastest x264 preset.
+"""
+from __future__ import annotations
+from dataclasses import dataclass
+from typing import List, Tuple
+
+
+@dataclass(frozen=True)
+class RenderProfile:
+    name: str
+    scale: float
+    fps: int
+    preset: str
+    crf: int
+
+    def size(self, width: int, height: int) -> Tuple[int, int]:
+        """Output size for a ``width`` x ``height`` timeline.
+
+        Both sides are scaled by the same factor and rounded to the nearest even number (for yuv420p), so the
+        aspect ratio is kept: 640x360 at 1/3 gives 214x120.
+        """
+        return (max(2, int(round(width * self.scale / 2)) * 2),
+                max(2, int(round(height * self.scale / 2)) * 2))
+
+    def x264_args(self) -> List[str]:
+        return ["-c:v", "libx264", "-preset", self.preset, "-crf", str(self.crf), "-pix_fmt", "yuv420p",
+                "-r", str(self.fps)]
+
+
+FINAL = RenderProfile("final", scale=1.0, fps=30, preset="medium", crf=20)
+DRAFT = RenderProfile("draft", scale=1 / 3, fps=15, preset="ultrafast", crf=30)
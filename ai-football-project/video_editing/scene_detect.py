@@ -0,0 +1,109 @@
+"""Shot-boundary detection on downscaled, frame-rate reduced video.
+
+``frame_sampler`` decodes (skipping non-reference frames and the deblocking
+filter) to 64x36 RGB at ``ANALYSIS_FPS`` and hands frames over in
+batches. Every batch is scored in NumPy: an L1 distance between 512-bin
+colour histograms of consecutive frames, plus their mean absolute pixel
+difference. A cut is declared where both jump past their thresholds and at
+least ``MIN_SHOT_SECONDS`` have passed since the previous cut.
+"""
+from __future__ import annotations
+import argparse, logging, os
+from typing import List, Optional, Tuple
+import numpy as np
+from common import setup_logging
+from common.media import media_index
+from video_editing import frame_sampler
+
+log = logging.getLogger("scene_detect")
+
+ANALYSIS_FPS = 10
+WIDTH, HEIGHT = 64, 36
+BATCH_FRAMES = 256
+HIST_THRESHOLD = 0.4     # half L1 distance of normalised histograms, 0..1
+PIXEL_THRESHOLD = 0.12   # mean |diff| / 255
+MIN_SHOT_SECONDS = 0.6
+
+
+def _histograms(frames: np.ndarray) -> np.ndarray:
+    """512-bin (8x8x8) normalised RGB histograms for a (N, H, W, 3) batch."""
+    q = (frames >> 5).astype(np.int32)
+    codes = (q[..., 0] << 6) | (q[..., 1] << 3) | q[..., 2]
+    n = len(frames)
+    offsets = (np.arange(n, dtype=np.int32) * 512)[:, None, None]
+    hist = np.bincount((codes + offsets).ravel(), minlength=n * 512).reshape(n, 512)
+    return hist / float(WIDTH * HEIGHT)
+
+
+def frame_scores(path: str) -> Tuple[np.ndarray, np.ndarray]:
+    """Histogram and pixel change between each analysed frame and the previous one."""
+    hist_d, pix_d = [], []
+    prev_frame: Optional[np.ndarray] = None
+    prev_hist: Optional[np.ndarray] = None
+    # Analysis tolerates a sloppy decode: skip non-reference frames and deblocking
+    for frames in frame_sampler.iter_batches(path, WIDTH, HEIGHT, fps=ANALYSIS_FPS, fast=True, batch=BATCH_FRAMES):
+        hists = _histograms(frames)
+        gray = frames.mean(axis=3, dtype=np.float32)
+        if prev_frame is not None:
+            hists_all = np.concatenate((prev_hist[None], hists))
+            gray_all = np.concatenate((prev_frame[None], gray))
+        else:
+            hists_all, gray_all = hists, gray
+        hist_d.append(0.5 * np.abs(np.diff(hists_all, axis=0)).sum(axis=1))
+        pix_d.append(np.abs(np.diff(gray_all, axis=0)).mean(axis=(1, 2)) / 255.0)
+        prev_frame, prev_hist = gray[-1], hists[-1]
+    if not hist_d:
+        return np.zeros(0), np.zeros(0)
+    # Index i scores the change into frame i+1
+    return np.concatenate(hist_d), np.concatenate(pix_d)
+
+
+def detect_cuts(path: str) -> List[float]:
+    """Timestamps (seconds) of shot boundaries in ``path``."""
+    hist_d, pix_d = frame_scores(path)
+    candidates = np.flatnonzero((hist_d > HIST_THRESHOLD) & (pix_d > PIXEL_THRESHOLD)) + 1
+    cuts: List[float] = []
+    for i in candidates:
+        t = round(float(i) / ANALYSIS_FPS, 2)
+        if not cuts or t - cuts[-1] >= MIN_SHOT_SECONDS:
+            cuts.append(t)
+    return cuts
+
+
+def scene_cuts(path: str) -> List[float]:
+    """Cached ``detect_cuts``: results live on the file's media index entry."""
+    index = media_index()
+    cuts = index.extra(path, "scene_cuts")
+    if cuts is None:
+        cuts = detect_cuts(path)
+        index.annotate(path, "scene_cuts", cuts)
+    return cuts
+
+
+def snap_to_cuts(start: float, end: float, cuts: List[float], duration: float,
+                 tolerance: float = 3.0, min_length: float = 4.0) -> Tuple[float, float]:
+    """Move a [start, end) span onto nearby shot boundaries, keeping its length where possible."""
+    length = end - start
+    near = [c for c in cuts if abs(c - start) <= tolerance]
+    if near:
+        start = min(near, key=lambda c: abs(c - start))
+    end = min(start + length, duration)
+    # End on the last cut inside the span rather than mid-shot, unless that makes it too short
+    inside = [c for c in cuts if start + min_length <= c < end and end - c <= tolerance]
+    if inside:
+        end = inside[-1]
+    return round(start, 2), round(end, 2)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("path")
+    parser.add_argument("--log-level", default=None)
+    args = parser.parse_args()
+    setup_logging(args.log_level)
+    cuts = scene_cuts(args.path)
+    log.info("%d cuts in %s: %s", len(cuts), os.path.basename(args.path), cuts)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""Action-tracking crop paths for narrow (9:16, 1:1) crops of wide broadcast footage.
+
+The clip is sampled by ``frame_sampler`` at 1/8 resolution and ``ANALYSIS_FPS`` (from the 135p proxy
+when one exists) in batches. Each batch is scored in NumPy:
+
+* motion energy: absolute luma difference to the previous analysed frame;
+* saliency: non-grass pixels that lie on the pitch (mostly grass around them), i.e. players and
+  the ball rather than crowd, hoardings or scoreboard, with extra weight for bright ball-like pixels.
+
+Per frame the crop window (its width set by the target aspect ratio) goes where the column-summed
+score is largest. The raw centres are then smoothed with a critically damped spring, run forwards
+and backwards so the camera does not lag the play. The spring is restarted at every shot boundary.
+Paths are cached on the media index entry. They are applied by ffmpeg during the render via
+``sendcmd`` updates to a ``crop`` filter's x offset. The editor scripts in football-video-editor
+import this module rather than planning crops themselves.
+"""
+from __future__ import annotations
+import argparse, logging, os
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from common import setup_logging
+from common.media import media_index
+from video_editing import frame_sampler
+from video_editing.proxies import find_proxy
+from video_editing.scene_detect import scene_cuts
+
+log = logging.getLogger("smart_crop")
+
+ANALYSIS_FPS = 10
+DOWNSCALE = 8
+BATCH_FRAMES = 256
+PITCH_RADIUS = 3        # box half-size (analysis pixels) for "surrounded by grass"
+SPRING_HZ = 0.6         # natural frequency of the smoothing spring; lower = calmer camera
+MIN_ENERGY = 1e-3       # frames scoring less than this keep the previous centre
+
+
+def _box_mean(mask: np.ndarray, r: int) -> np.ndarray:
+    """Mean of a (N, H, W) array over a (2r+1)^2 box, via 2-D cumulative sums."""
+    padded = np.pad(mask.astype(np.float32), ((0, 0), (r + 1, r), (r + 1, r)), mode="edge")
+    c = padded.cumsum(axis=1).cumsum(axis=2)
+    k = 2 * r + 1
+    total = c[:, k:, k:] - c[:, :-k, k:] - c[:, k:, :-k] + c[:, :-k, :-k]
+    return total / float(k * k)
+
+
+def column_scores(frames: np.ndarray, prev_gray: Optional[np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+    """Per-column action score for a (N, H, W, 3) uint8 batch; returns (scores (N, W), last gray frame)."""
+    f = frames.astype(np.float32)
+    r, g, b = f[..., 0], f[..., 1], f[..., 2]
+    gray = 0.299 * r + 0.587 * g + 0.114 * b
+    grass = (g > 1.08 * r) & (g > 1.08 * b) & (g > 40)
+    on_pitch = _box_mean(grass, PITCH_RADIUS) > 0.45
+    salient = on_pitch & ~grass
+    ball = on_pitch & (gray > 200)
+    before = np.concatenate((gray[:1] if prev_gray is None else prev_gray[None], gray[:-1]))
+    motion = np.abs(gray - before) / 255.0
+    score = motion * (0.2 + salient) + 0.05 * salient + 0.1 * ball
+    return score.sum(axis=1), gray[-1]
+
+
+def raw_centres(path: str, aspect: float) -> Tuple[np.ndarray, int]:
+    """Best crop-window centre (0..1 of frame width) per analysed frame, NaN where nothing happens."""
+    info = media_index().get(path)
+    width = max(16, info["width"] // DOWNSCALE // 2 * 2)
+    height = max(16, info["height"] // DOWNSCALE // 2 * 2)
+    window = max(1, min(width, int(round(height * aspect))))
+    source = find_proxy(path, height) or path
+    centres: List[np.ndarray] = []
+    prev_gray = None
+    for frames in frame_sampler.iter_batches(source, width, height, fps=ANALYSIS_FPS, fast=True, batch=BATCH_FRAMES):
+        cols, prev_gray = column_scores(frames, prev_gray)
+        c = np.concatenate((np.zeros((len(frames), 1), np.float32), cols.cumsum(axis=1)), axis=1)
+        sums = c[:, window:] - c[:, :-window]
+        best = sums.argmax(axis=1)
+        centre = (best + window / 2.0) / width
+        centres.append(np.where(sums.max(axis=1) > MIN_ENERGY, centre, np.nan))
+    return (np.concatenate(centres) if centres else np.zeros(0)), window
+
+
+def smooth(centres: np.ndarray, half_window: float, cuts: List[float]) -> np.ndarray:
+    """Fill gaps, then apply a forward-backward critically damped spring, restarting at shot cuts."""
+    x = centres.copy()
+    if len(x) == 0:
+        return x
+    valid = ~np.isnan(x)
+    if not valid.any():
+        return np.full_like(x, 0.5)
+    idx = np.arange(len(x))
+    x = np.interp(idx, idx[valid], x[valid])
+    bounds = [0] + sorted({int(round(c * ANALYSIS_FPS)) for c in cuts if 0 < c * ANALYSIS_FPS < len(x)}) + [len(x)]
+    w = 2 * np.pi * SPRING_HZ
+    dt = 1.0 / ANALYSIS_FPS
+    out = np.empty_like(x)
+    for a, b in zip(bounds, bounds[1:]):
+        seg = x[a:b]
+        for _ in range(2):  # forward, then backward over the forward result: zero lag
+            pos, vel = seg[0], 0.0
+            res = np.empty_like(seg)
+            for i, target in enumerate(seg):
+                vel += (w * w * (target - pos) - 2 * w * vel) * dt
+                pos += vel * dt
+                res[i] = pos
+            seg = res[::-1]
+        out[a:b] = seg
+    return np.clip(out, half_window, 1 - half_window)
+
+
+def crop_path(path: str, aspect: float) -> Dict[str, object]:
+    """Smoothed crop centres for ``aspect`` (width/height), cached on the media index entry."""
+    key = "crop_path_%.4f" % aspect
+    index = media_index()
+    cached = index.extra(path, key)
+    if cached is None:
+        centres, window = raw_centres(path, aspect)
+        width = max(16, index.get(path)["width"] // DOWNSCALE // 2 * 2)
+        cached = {"fps": ANALYSIS_FPS,
+                  "x": [round(float(v), 4) for v in smooth(centres, window / width / 2.0, scene_cuts(path))]}
+        index.annotate(path, key, cached)
+    return cached
+
+
+def span_path(path: str, start: float, end: float, aspect: float) -> List[List[float]]:
+    """Crop centres for ``path[start:end]`` as ``[[t, x], ...]`` with ``t`` relative to ``start``."""
+    cp = crop_path(path, aspect)
+    x = np.asarray(cp["x"], dtype=np.float64)
+    if len(x) == 0:
+        return [[0.0, 0.5]]
+    t = np.arange(len(x)) / float(cp["fps"])
+    sel = (t >= start - 1.0 / cp["fps"]) & (t <= end + 1.0 / cp["fps"])
+    return [[round(float(a - start), 3), float(v)] for a, v in zip(t[sel], x[sel])] or [[0.0, float(x[-1])]]
+
+
+def track_filter(points: List[List[float]], width: int, height: int, fps: float, cmd_path: str) -> str:
+    """Crop-then-scale filter whose x offset follows ``points``; per-frame offsets go to ``cmd_path``."""
+    t = np.asarray([p[0] for p in points])
+    x = np.asarray([p[1] for p in points])
+    frames = np.arange(0, max(t[-1], 0) + 1.0 / fps, 1.0 / fps)
+    centres = np.interp(frames, t, x)
+    with open(cmd_path, "w") as f:
+        for ft, c in zip(frames, centres):
+            # iw/ow are not visible to commands, so send the centre and let the x expression place it
+            f.write(f"{ft:.3f} crop@track x '(iw*{c:.4f})-ow/2';\n")
+    cw, ch = f"min(iw,ih*{width}/{height})", f"min(ih,iw*{height}/{width})"
+    x0 = f"(iw*{centres[0]:.4f})-ow/2"
+    return (f"sendcmd=f='{cmd_path}',crop@track=w='{cw}':h='{ch}':x='max(0,min(iw-ow,{x0}))',"
+            f"scale={width}:{height},setsar=1")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("path")
+    parser.add_argument("--aspect", default="9:16", help="Crop aspect ratio, W:H")
+    parser.add_argument("--log-level", default=None)
+    args = parser.parse_args()
+    setup_logging(args.log_level)
+    w, h = (float(v) for v in args.aspect.split(":"))
+    cp = crop_path(args.path, w / h)
+    log.info("%d crop centres for %s: min %.3f, max %.3f", len(cp["x"]), os.path.basename(args.path),
+             min(cp["x"], default=0.5), max(cp["x"], default=0.5))
+
+
+if __name__ == "__main__":
+    main()
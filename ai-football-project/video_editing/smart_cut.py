@@ -0,0 +1,159 @@
+"""Frame-accurate cuts that re-encode only the partial GOPs at either end.
+
+For a span [start, end), only [start, first keyframe) and [last keyframe,
+end) are decoded and encoded (with codec parameters matched to the source);
+the whole GOPs between are stream-copied. Keyframe positions come from the
+media index.
+
+Every piece is a video-only file of its own, cut by frame count: the copy
+stops right before the packet of the closing keyframe, which with closed
+GOPs is exactly the frames in between. Encoded pieces reproduce the source's
+B-frame reorder delay. Each piece therefore ends one frame of DTS before the
+next one starts, and the concat demuxer's join is monotonic. Audio is
+rendered once for the whole timeline and muxed in (``parallel_render``).
+"""
+from __future__ import annotations
+import argparse, bisect, logging, os, shutil, subprocess, tempfile
+from typing import List, Tuple
+from common import setup_logging
+from common.media import ffmpeg_exe, media_index
+
+log = logging.getLogger("smart_cut")
+
+# Reorder delays (frames) libx264 can reproduce: no B-frames, B-frames, B-pyramid
+X264_DELAY_ARGS = {0: ["-bf", "0"], 1: ["-bf", "3", "-b-pyramid", "none"], 2: ["-bf", "3", "-b-pyramid", "normal"]}
+
+
+def frame_index(t: float, fps: float) -> int:
+    """Index of the frame nearest ``t``."""
+    return int(round(t * fps))
+
+
+def next_keyframe(path: str, t: float) -> Tuple[float, bool]:
+    """First keyframe at or after ``t`` and whether ``t`` already sits on it (within half a frame)."""
+    index = media_index()
+    fps = index.get(path)["fps"] or 30
+    tolerance = 0.5 / fps
+    kfs = index.keyframes(path)
+    i = bisect.bisect_left(kfs, t - tolerance)
+    if i == len(kfs):
+        return float("inf"), False
+    return kfs[i], abs(kfs[i] - t) <= tolerance or t <= tolerance
+
+
+def prev_keyframe(path: str, t: float) -> float:
+    """Last keyframe at or before ``t`` (within half a frame), or -inf."""
+    index = media_index()
+    kfs = index.keyframes(path)
+    i = bisect.bisect_right(kfs, t + 0.5 / (index.get(path)["fps"] or 30))
+    return kfs[i - 1] if i else float("-inf")
+
+
+def reorder_delay(path: str) -> int:
+    """Frames between the first video packet's DTS and PTS (the B-frame delay), read once and cached."""
+    index = media_index()
+    delay = index.extra(path, "reorder_delay")
+    if delay is None:
+        cmd = [ffmpeg_exe(), "-v", "error", "-i", path, "-map", "0:v:0", "-c", "copy", "-frames:v", "1",
+               "-f", "framecrc", "-"]
+        out = subprocess.run(cmd, capture_output=True, text=True).stdout
+        packets = [line.split(",") for line in out.splitlines() if line and line[0] != "#"]
+        delay = 0
+        if packets:
+            dts, pts, duration = (int(v) for v in packets[0][1:4])
+            delay = round((pts - dts) / max(1, duration))
+        index.annotate(path, "reorder_delay", delay)
+    return delay
+
+
+def encode_frames(path: str, first: int, count: int, out_path: str, delay: int = 2) -> str:
+    """Re-encode ``count`` frames of ``path`` from frame ``first`` (video only) with the source's resolution
+    and pixel format and a reorder delay of ``delay`` frames.
+
+    The seek lands half a frame before ``first``; passthrough timing keeps that offset from being filled
+    with a duplicate frame."""
+    info = media_index().get(path)
+    fps = info["fps"] or 30
+    cmd = [ffmpeg_exe(), "-v", "error", "-y", "-ss", f"{(first - 0.5) / fps:.6f}", "-i", path,
+           "-map", "0:v:0", "-frames:v", str(count), "-c:v", "libx264", "-preset", "veryfast", "-crf", "18",
+           "-pix_fmt", info["pix_fmt"] or "yuv420p", "-fps_mode", "passthrough", "-s", f"{info['width']}x{info['height']}"]
+    subprocess.run(cmd + X264_DELAY_ARGS[min(delay, max(X264_DELAY_ARGS))] + ["-an", out_path], check=True)
+    return out_path
+
+
+def copy_frames(path: str, keyframe: float, count: int, out_path: str) -> str:
+    """Stream-copy ``count`` video packets of ``path`` starting with the keyframe at ``keyframe``.
+
+    ``-copyts`` keeps the keyframe's own timestamp; shifting by the seek point (half a frame past it) would
+    flag it as before the start and the muxer's edit list would drop it."""
+    fps = media_index().get(path)["fps"] or 30
+    cmd = [ffmpeg_exe(), "-v", "error", "-y", "-copyts", "-ss", f"{keyframe + 0.5 / fps:.6f}", "-i", path,
+           "-map", "0:v:0", "-c", "copy", "-frames:v", str(count), out_path]
+    subprocess.run(cmd, check=True)
+    return out_path
+
+
+def plan_pieces(path: str, start: float, end: float, work_dir: str) -> List[str]:
+    """Video-only files joining into exactly the frames of [start, end) of ``path``, encoding as few as possible."""
+    fps = media_index().get(path)["fps"] or 30
+    first, last = frame_index(start, fps), frame_index(end, fps)
+    stem = os.path.join(work_dir, f"{os.path.splitext(os.path.basename(path))[0]}_{start:.2f}")
+    delay = reorder_delay(path)
+    head_kf, tail_kf = next_keyframe(path, start)[0], prev_keyframe(path, end)
+    if delay > max(X264_DELAY_ARGS) or head_kf >= tail_kf:
+        # No whole GOP inside the span (or a delay x264 cannot match): encoding all of it is the only option
+        return [encode_frames(path, first, last - first, stem + "_all.mp4", delay)]
+    k1, k2 = frame_index(head_kf, fps), frame_index(tail_kf, fps)
+    log.debug("Smart cut %s: encode frames %d-%d and %d-%d, copy %d-%d", path, first, k1, k2, last, k1, k2)
+    pieces = []
+    if k1 > first:
+        pieces.append(encode_frames(path, first, k1 - first, stem + "_head.mp4", delay))
+    pieces.append(copy_frames(path, head_kf, k2 - k1, stem + "_copy.mp4"))
+    if last > k2:
+        pieces.append(encode_frames(path, k2, last - k2, stem + "_tail.mp4", delay))
+    return pieces
+
+
+def write_concat_list(pieces: List[str], list_path: str) -> str:
+    with open(list_path, "w") as f:
+        for piece in pieces:
+            f.write(f"file '{os.path.abspath(piece)}'\n")
+    return list_path
+
+
+def concat_copy(pieces: List[str], out_path: str, work_dir: str) -> str:
+    """Join whole files losslessly with the concat demuxer."""
+    list_path = write_concat_list(pieces, os.path.join(work_dir, "concat.txt"))
+    cmd = [ffmpeg_exe(), "-v", "error", "-y", "-f", "concat", "-safe", "0", "-i", list_path,
+           "-c", "copy", "-movflags", "+faststart", out_path]
+    subprocess.run(cmd, check=True)
+    return out_path
+
+
+def smart_cut(path: str, start: float, end: float, out_path: str) -> str:
+    """Write [start, end) of ``path`` to ``out_path`` frame-accurately."""
+    from video_editing.parallel_render import join_segments, render_audio
+    work = tempfile.mkdtemp(prefix="smartcut_", dir=os.path.dirname(os.path.abspath(out_path)))
+    try:
+        pieces = plan_pieces(path, start, end, work)
+        audio = render_audio([(path, start, end)], os.path.join(work, "audio.m4a"))
+        return join_segments(pieces, audio, out_path, work)
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("path")
+    parser.add_argument("start", type=float)
+    parser.add_argument("end", type=float)
+    parser.add_argument("out")
+    parser.add_argument("--log-level", default=None)
+    args = parser.parse_args()
+    setup_logging(args.log_level)
+    smart_cut(args.path, args.start, args.end, args.out)
+    log.info("Wrote %s", args.out)
+
+
+if __name__ == "__main__":
+    main()
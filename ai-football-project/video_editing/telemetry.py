@@ -0,0 +1,39 @@
+"""Append-only render telemetry, used to compare render paths and estimate savings."""
+from __future__ import annotations
+import json, os, time
+from typing import Any, Dict, List, Optional
+from common import config
+
+TELEMETRY_FILE = "render_telemetry.jsonl"
+
+
+def _path() -> str:
+    return os.path.join(config.CACHE_DIR, TELEMETRY_FILE)
+
+
+def record(path_taken: str, output_seconds: float, elapsed: float, **fields: Any) -> None:
+    """Log one render: which path produced it, how long the output is, how long it took."""
+    os.makedirs(config.CACHE_DIR, exist_ok=True)
+    row = dict(fields, path=path_taken, output_seconds=round(output_seconds, 3),
+               elapsed=round(elapsed, 3), ts=time.time())
+    with open(_path(), "a") as f:
+        f.write(json.dumps(row) + "\n")
+
+
+def load(path_taken: str = None) -> List[Dict[str, Any]]:
+    if not os.path.exists(_path()):
+        return []
+    with open(_path()) as f:
+        rows = [json.loads(line) for line in f if line.strip()]
+    return [r for r in rows if path_taken is None or r.get("path") == path_taken]
+
+
+def seconds_per_output_second(path_taken: str) -> Optional[float]:
+    """Median render cost of ``path_taken`` per second of output, if it has been seen before.
+
+    Only cold renders count: rows that reused cached segments (logged as ``full_render`` before those were
+    recorded as ``cached_render``) are left out.
+    """
+    rates = sorted(r["elapsed"] / r["output_seconds"] for r in load(path_taken)
+                   if r.get("output_seconds") and not r.get("reused"))
+    return rates[len(rates) // 2] if rates else None
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Football AI Video Editor - Audio Mix
+Keeps the original (crowd/commentary) track and ducks it under the voiceover.
+Both tracks are decoded by ffmpeg to float PCM and streamed through NumPy in
+fixed-size blocks, so memory stays bounded whatever the length:
+  - voiceover envelope: RMS per 10 ms hop, vectorized over the block
+  - gain curve: fast attack / slow release on the hop envelope, ramped
+    linearly per sample
+  - mix: original * gain + voiceover, written straight to a 16-bit WAV
+The voiceover is looped or trimmed to the video length while decoding.
+For batches, SharedVoice decodes the voiceover once into shared memory and
+every worker process mixes from that buffer instead of re-decoding the file.
+"""
+
+import os
+import sys
+import time
+import wave
+import subprocess
+from multiprocessing import shared_memory
+
+import numpy as np
+
+import pipeline_path  # noqa: F401  (puts ai-football-project on sys.path)
+from common import media
+from common.media import ffmpeg_exe
+
+SAMPLE_RATE = 44100
+CHANNELS = 2
+HOP = 441                   # 10 ms envelope hop
+BLOCK_HOPS = 500            # 5 s of audio per block
+DUCK_GAIN = 0.25            # original track level under the voiceover (about -12 dB)
+VOICE_THRESHOLD = 0.02      # voiceover RMS treated as fully "speaking"
+ATTACK_SECONDS = 0.02
+RELEASE_SECONDS = 0.4
+
+
+def decode_pcm(path):
+    """Whole file as (n, CHANNELS) float32 at SAMPLE_RATE"""
+    cmd = [ffmpeg_exe(), "-v", "error", "-i", path, "-vn", "-f", "f32le", "-ac", str(CHANNELS),
+           "-ar", str(SAMPLE_RATE), "-"]
+    raw = subprocess.run(cmd, stdout=subprocess.PIPE, check=True).stdout
+    usable = len(raw) // (CHANNELS * 4) * CHANNELS * 4
+    return np.frombuffer(raw[:usable], dtype=np.float32).reshape(-1, CHANNELS)
+
+
+class SharedVoice:
+    """A voiceover decoded once into a named shared-memory block that other processes can map"""
+    
+    def __init__(self, shm, frames, owner):
+        self.shm = shm
+        self.frames = frames
+        self.owner = owner
+        self.pcm = np.ndarray((frames, CHANNELS), dtype=np.float32, buffer=shm.buf)
+    
+    @classmethod
+    def create(cls, path):
+        pcm = decode_pcm(path)
+        if not len(pcm):
+            raise RuntimeError(f"No audio decoded from {path}")
+        shm = shared_memory.SharedMemory(create=True, size=pcm.nbytes)
+        voice = cls(shm, len(pcm), owner=True)
+        voice.pcm[:] = pcm
+        return voice
+    
+    @classmethod
+    def attach(cls, name, frames):
+        # Pool workers share the creating process's resource tracker, so the block is unlinked
+        # once, by the owner's close() (or the tracker if the owner dies)
+        shm = shared_memory.SharedMemory(name=name)
+        return cls(shm, frames, owner=False)
+    
+    @property
+    def handle(self):
+        """Picklable (name, frames) pair for attach() in another process"""
+        return self.shm.name, self.frames
+    
+    def close(self):
+        self.pcm = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+class AudioMixer:
+    def __init__(self, media_index=None, duck_gain=DUCK_GAIN, voice_gain=1.0, voice_pcm=None):
+        self.media_index = media_index or media.media_index()
+        self.duck_gain = duck_gain
+        self.voice_gain = voice_gain
+        # Pre-decoded voiceover (e.g. SharedVoice.pcm); used instead of decoding voice_path
+        self.voice_pcm = voice_pcm
+    
+    def _decoder(self, path, duration, loop=False):
+        cmd = [ffmpeg_exe(), "-v", "error"]
+        if loop:
+            cmd += ["-stream_loop", "-1"]
+        cmd += ["-i", path, "-t", f"{duration:.3f}", "-vn", "-f", "f32le", "-ac", str(CHANNELS),
+                "-ar", str(SAMPLE_RATE), "-"]
+        return subprocess.Popen(cmd, stdout=subprocess.PIPE)
+    
+    @staticmethod
+    def _read(proc, n_samples):
+        """Up to n_samples frames of (n, CHANNELS) float32 from a decoder, or an empty array"""
+        if proc is None:
+            return np.zeros((0, CHANNELS), np.float32)
+        buf = proc.stdout.read(n_samples * CHANNELS * 4)
+        usable = len(buf) // (CHANNELS * 4) * CHANNELS * 4
+        return np.frombuffer(buf[:usable], dtype=np.float32).reshape(-1, CHANNELS)
+    
+    def _voice_block(self, start, n):
+        """n frames of the pre-decoded voiceover from `start`, looped"""
+        idx = np.arange(start, start + n) % len(self.voice_pcm)
+        return self.voice_pcm[idx]
+    
+    def gain_curve(self, voice, state):
+        """Per-sample gain for the original track under a block of voiceover"""
+        hops = len(voice) // HOP
+        env = np.sqrt((voice[:hops * HOP].reshape(hops, HOP * CHANNELS) ** 2).mean(axis=1))
+        target = 1.0 - (1.0 - self.duck_gain) * np.clip(env / VOICE_THRESHOLD, 0.0, 1.0)
+        attack = 1.0 - np.exp(-HOP / (ATTACK_SECONDS * SAMPLE_RATE))
+        release = 1.0 - np.exp(-HOP / (RELEASE_SECONDS * SAMPLE_RATE))
+        hop_gain = np.empty(hops)
+        g = state["gain"]
+        for i, t in enumerate(target):  # one step per 10 ms hop, not per sample
+            g += (t - g) * (attack if t < g else release)
+            hop_gain[i] = g
+        start = np.concatenate(([state["gain"]], hop_gain[:-1]))
+        ramp = start[:, None] + (hop_gain - start)[:, None] * (np.arange(HOP) / HOP)[None, :]
+        state["gain"] = g
+        gains = ramp.ravel()
+        if len(gains) < len(voice):  # partial last hop keeps the last gain
+            gains = np.concatenate((gains, np.full(len(voice) - len(gains), g)))
+        return gains.astype(np.float32)
+    
+    def mix(self, video_path, voice_path, output_path, duration=None):
+        """Write original-ducked-under-voiceover audio for the video's length to a WAV file"""
+        info = self.media_index.get(video_path)
+        duration = duration or info["duration"]
+        total = int(round(duration * SAMPLE_RATE))
+        voice_proc = None if self.voice_pcm is not None else self._decoder(voice_path, duration, loop=True)
+        orig_proc = self._decoder(video_path, duration) if info["has_audio"] else None
+        block = HOP * BLOCK_HOPS
+        state = {"gain": 1.0}
+        written = 0
+        try:
+            with wave.open(output_path, "wb") as out:
+                out.setnchannels(CHANNELS)
+                out.setsampwidth(2)
+                out.setframerate(SAMPLE_RATE)
+                while written < total:
+                    n = min(block, total - written)
+                    if voice_proc is None:
+                        voice = self._voice_block(written, n)
+                    else:
+                        voice = self._read(voice_proc, n)
+                    orig = self._read(orig_proc, n)
+                    # Decoders can end a few samples early; pad with silence to the exact length
+                    if len(voice) < n:
+                        voice = np.vstack((voice, np.zeros((n - len(voice), CHANNELS), np.float32)))
+                    if len(orig) < n:
+                        orig = np.vstack((orig, np.zeros((n - len(orig), CHANNELS), np.float32)))
+                    mixed = orig * self.gain_curve(voice, state)[:, None] + voice * self.voice_gain
+                    out.writeframes((np.clip(mixed, -1.0, 1.0) * 32767).astype("<i2").tobytes())
+                    written += n
+        finally:
+            for proc in (voice_proc, orig_proc):
+                if proc is not None:
+                    proc.stdout.close()
+                    proc.wait()
+        return output_path
+
+
+def main():
+    if len(sys.argv) != 4:
+        print("Usage: python audio_mix.py <video> <voiceover> <output.wav>")
+        return False
+    video, voice, output = sys.argv[1:4]
+    for path in (video, voice):
+        if not os.path.exists(path):
+            print(f"❌ File not found: {path}")
+            return False
+    mixer = AudioMixer()
+    duration = mixer.media_index.get(video)["duration"]
+    started = time.perf_counter()
+    mixer.mix(video, voice, output)
+    elapsed = time.perf_counter() - started
+    print(f"🎚️  Mixed {duration:.1f}s in {elapsed:.2f}s ({duration / elapsed:.0f}x real time): {output}")
+    return True
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
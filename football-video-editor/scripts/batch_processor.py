@@ -2,10 +2,20 @@
 """
 Football AI Video Editor - Batch Processing Script
 Process multiple video files with the same audio track.
+Videos are rendered by a pool of worker processes. With --duck the voiceover
+is decoded once into shared memory that every worker maps to mix it over the
+original audio. Each job works in its own
+temp directory, and a manifest in the output directory lets a rerun skip
+outputs that are already complete. Jobs are dispatched longest-first, using
+cost estimates calibrated on past runs, so one long source doesn't start last
+and decide the batch's wall time.
 """
 
 import os
 import sys
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
 
 # Check for dependencies before importing
@@ -20,11 +30,95 @@ except ImportError as e:
     print("3. Then run this script again")
     sys.exit(1)
 
-def batch_process_videos(video_directory, audio_file, output_directory="output"):
+from audio_mix import SAMPLE_RATE, SharedVoice
+import pipeline_path  # noqa: F401  (puts ai-football-project on sys.path)
+from common import media
+from render_stats import RenderStats, makespan
+from video_analyzer import VideoAnalyzer
+
+MANIFEST_NAME = "batch_manifest.json"
+
+# Per-worker state, set up once by init_worker
+_worker = {}
+
+
+def _signature(path):
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime": stat.st_mtime}
+
+
+def load_manifest(output_directory):
+    path = os.path.join(output_directory, MANIFEST_NAME)
+    if os.path.exists(path):
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            print(f"⚠️  Ignoring unreadable manifest: {path}")
+    return {}
+
+
+def save_manifest(output_directory, manifest):
+    """Write the manifest atomically so an interrupted batch never leaves it half-written"""
+    path = os.path.join(output_directory, MANIFEST_NAME)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def is_complete(entry, video_path, audio_file, output_path, duck=False):
+    """True if the manifest records this exact source + voiceover (and mix) as rendered and the output is still there"""
+    return (entry is not None and entry.get("status") == "done" and os.path.exists(output_path)
+            and entry.get("duck", False) == duck
+            and entry.get("source") == _signature(video_path) and entry.get("audio") == _signature(audio_file)
+            and entry.get("output_size") == os.path.getsize(output_path))
+
+
+def init_worker(voice_handle):
+    """Build the worker's editor; when ducking, map the shared voiceover once per worker process"""
+    if voice_handle is None:
+        _worker["editor"] = FootballVideoEditor()
+        return
+    voice = SharedVoice.attach(*voice_handle)
+    _worker["voice"] = voice
+    _worker["editor"] = FootballVideoEditor(duck_original=True, voice_pcm=voice.pcm)
+
+
+def process_job(job):
+    """Worker: render one video; returns (success, seconds, captured error)"""
+    started = time.perf_counter()
+    try:
+        success = _worker["editor"].process_video(job["video_path"], job["audio_file"], job["output_path"])
+        error = None if success else "processing failed"
+    except Exception as e:
+        success, error = False, str(e)
+    return success, time.perf_counter() - started, error
+
+
+def schedule_longest_first(jobs, media_index, workers):
+    """Attach a predicted time to every job (model fitted on past runs) and order them longest-first"""
+    editor = FootballVideoEditor(media_index=media_index)
+    analyzer = VideoAnalyzer(media_index)
+    for job in jobs:
+        remux = editor.video_needs_transform(job["video_path"]) is None
+        prediction = analyzer.predict(job["video_path"], remux, editor.preset, workers)
+        job["kind"] = prediction["kind"]
+        job["features"] = prediction["features"]
+        job["cost"] = analyzer.processing_cost(job["video_path"], remux)
+        job["estimate"] = prediction["seconds"]
+        job["estimated_mb"] = prediction["output_mb"]
+    in_order = makespan([job["estimate"] for job in jobs], workers)
+    jobs.sort(key=lambda job: job["estimate"], reverse=True)
+    print(f"📐 Estimated batch time: {makespan([job['estimate'] for job in jobs], workers):.0f}s longest-first "
+          f"(vs {in_order:.0f}s in directory order)")
+    return jobs
+
+
+def batch_process_videos(video_directory, audio_file, output_directory="output", workers=None, resume=True,
+                         duck=False):
     """Process multiple videos in a directory with the same audio"""
     
-    editor = FootballVideoEditor()
-    
     # Create output directory if it doesn't exist
     os.makedirs(output_directory, exist_ok=True)
     
@@ -43,46 +137,93 @@ def batch_process_videos(video_directory, audio_file, output_directory="output")
     
     print(f"🎬 Found {len(video_files)} video files to process")
     
-    successful_processes = 0
-    failed_processes = 0
-    
-    for i, video_path in enumerate(video_files, 1):
-        print(f"\n📹 Processing {i}/{len(video_files)}: {video_path.name}")
-        
+    manifest = load_manifest(output_directory) if resume else {}
+    jobs = []
+    skipped_processes = 0
+    for video_path in sorted(video_files):
         # Generate output filename
         output_filename = f"{video_path.stem}_vertical{video_path.suffix}"
         output_path = os.path.join(output_directory, output_filename)
+        if is_complete(manifest.get(output_filename), video_path, audio_file, output_path, duck):
+            skipped_processes += 1
+            print(f"⏭️  Already done: {output_filename}")
+            continue
+        jobs.append({"video_path": str(video_path), "audio_file": audio_file, "output_path": output_path,
+                     "output_filename": output_filename})
+    
+    successful_processes = 0
+    failed_processes = 0
+    
+    if jobs:
+        workers = max(1, min(workers or os.cpu_count() or 1, len(jobs)))
+        # Probe everything up front so workers start from a warm index instead of all probing at once
+        media_index = media.media_index()
+        media_index.add([job["video_path"] for job in jobs] + [audio_file])
+        jobs = schedule_longest_first(jobs, media_index, workers)
+        stats = RenderStats()
+        voice = SharedVoice.create(audio_file) if duck else None
+        if voice:
+            print(f"🎙️  Voiceover decoded once ({voice.frames / SAMPLE_RATE:.1f}s, "
+                  f"{voice.pcm.nbytes / 1e6:.1f} MB shared)")
+        print(f"⚙️  Rendering {len(jobs)} videos on {workers} worker processes")
         
+        started = time.perf_counter()
         try:
-            success = editor.process_video(str(video_path), audio_file, output_path)
-            if success:
-                successful_processes += 1
-                print(f"✅ Successfully processed: {output_filename}")
-            else:
-                failed_processes += 1
-                print(f"❌ Failed to process: {video_path.name}")
-        
-        except Exception as e:
-            failed_processes += 1
-            print(f"❌ Error processing {video_path.name}: {e}")
+            with ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                                     initargs=(voice.handle if voice else None,)) as pool:
+                futures = {pool.submit(process_job, job): job for job in jobs}
+                for done, future in enumerate(as_completed(futures), 1):
+                    job = futures[future]
+                    name = Path(job["video_path"]).name
+                    try:
+                        success, seconds, error = future.result()
+                    except Exception as e:  # the worker process itself died
+                        success, seconds, error = False, 0.0, str(e)
+                    if success:
+                        successful_processes += 1
+                        output_bytes = os.path.getsize(job["output_path"])
+                        stats.record(job["kind"], job["cost"], seconds, workers, job["features"], output_bytes)
+                        manifest[job["output_filename"]] = {
+                            "status": "done", "seconds": round(seconds, 2), "estimated": round(job["estimate"], 2),
+                            "source": _signature(job["video_path"]), "audio": _signature(audio_file),
+                            "output_size": output_bytes, "duck": duck,
+                        }
+                        # Record every completion as it happens so an interrupted batch resumes from here
+                        save_manifest(output_directory, manifest)
+                        print(f"✅ [{done}/{len(jobs)}] Successfully processed: {job['output_filename']} "
+                              f"({seconds:.1f}s, estimated {job['estimate']:.1f}s; "
+                              f"{output_bytes / 1048576:.1f} MB, estimated {job['estimated_mb']:.1f} MB)")
+                    else:
+                        failed_processes += 1
+                        print(f"❌ [{done}/{len(jobs)}] Failed to process {name}: {error}")
+        finally:
+            if voice:
+                voice.close()
+        print(f"⏱️  Batch wall time: {time.perf_counter() - started:.1f}s")
     
     print(f"\n📊 BATCH PROCESSING RESULTS")
     print(f"✅ Successful: {successful_processes}")
+    print(f"⏭️  Skipped (already done): {skipped_processes}")
     print(f"❌ Failed: {failed_processes}")
     print(f"📁 Output directory: {output_directory}")
     
-    return successful_processes > 0
+    return successful_processes + skipped_processes > 0
 
 def main():
     """Main function for batch processing"""
-    if len(sys.argv) < 3:
-        print("Usage: python batch_processor.py <video_directory> <audio_file> [output_directory]")
-        print("Example: python batch_processor.py ./videos isak_voice.mp3 ./output")
+    resume = "--no-resume" not in sys.argv
+    duck = "--duck" in sys.argv
+    args = [arg for arg in sys.argv[1:] if arg not in ("--no-resume", "--duck")]
+    if len(args) < 2:
+        print("Usage: python batch_processor.py <video_directory> <audio_file> [output_directory] [workers] "
+              "[--no-resume] [--duck]")
+        print("Example: python batch_processor.py ./videos isak_voice.mp3 ./output 4")
         return False
     
-    video_directory = sys.argv[1]
-    audio_file = sys.argv[2]
-    output_directory = sys.argv[3] if len(sys.argv) > 3 else "output"
+    video_directory = args[0]
+    audio_file = args[1]
+    output_directory = args[2] if len(args) > 2 else "output"
+    workers = int(args[3]) if len(args) > 3 else None
     
     if not os.path.exists(video_directory):
         print(f"❌ Video directory not found: {video_directory}")
@@ -92,7 +233,7 @@ def main():
         print(f"❌ Audio file not found: {audio_file}")
         return False
     
-    return batch_process_videos(video_directory, audio_file, output_directory)
+    return batch_process_videos(video_directory, audio_file, output_directory, workers, resume, duck)
 
 if __name__ == "__main__":
     success = main()
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Football AI Video Editor - FFmpeg Backend
+Compiles load -> sync -> crop -> scale -> audio merge into one native ffmpeg
+filtergraph. The crop (centre or action-tracking) runs on the source frame
+before scaling, so only the pixels that end up in the output are resized, and
+no frame ever passes through Python.
+"""
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+import subprocess
+
+import pipeline_path  # noqa: F401  (puts ai-football-project on sys.path)
+from common import media
+from common.media import ffmpeg_exe
+from video_editing.smart_crop import crop_path, span_path, track_filter
+
+
+class FFmpegRenderer:
+    def __init__(self, media_index=None, width=608, height=1080, codec="libx264", audio_codec="aac",
+                 preset="medium", fps=None, smart_crop=True):
+        self.media_index = media_index or media.media_index()
+        self.width = width
+        self.height = height
+        self.codec = codec
+        self.audio_codec = audio_codec
+        self.preset = preset
+        self.fps = fps
+        self.smart_crop = smart_crop
+    
+    def video_filter(self, video_path, work_dir):
+        """Crop to the target aspect ratio on the source frame, then scale once"""
+        info = self.media_index.get(video_path)
+        w, h = self.width, self.height
+        wide = info["width"] * h > info["height"] * w
+        if self.smart_crop and wide and info["duration"] > 0:
+            points = span_path(video_path, 0.0, info["duration"], w / h)
+            return track_filter(points, w, h, info["fps"] or 30, os.path.join(work_dir, "crop.cmd"))
+        return f"crop='min(iw,ih*{w}/{h})':'min(ih,iw*{h}/{w})',scale={w}:{h},setsar=1"
+    
+    def render(self, video_path, audio_path, output_path):
+        """Render the vertical edit of video_path with audio_path in a single ffmpeg process"""
+        duration = self.media_index.get(video_path)["duration"]
+        work_dir = tempfile.mkdtemp(prefix="ffmpeg_backend_")
+        try:
+            # -stream_loop repeats short audio; -t trims long audio to the video length
+            cmd = [ffmpeg_exe(), "-v", "error", "-y", "-i", video_path,
+                   "-stream_loop", "-1", "-i", audio_path,
+                   "-filter_complex", f"[0:v]{self.video_filter(video_path, work_dir)}[v]",
+                   "-map", "[v]", "-map", "1:a:0", "-t", f"{duration:.3f}",
+                   "-c:v", self.codec, "-preset", self.preset, "-pix_fmt", "yuv420p",
+                   "-c:a", self.audio_codec]
+            if self.fps:
+                cmd += ["-r", str(self.fps)]
+            subprocess.run(cmd + ["-movflags", "+faststart", output_path], check=True)
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+        return output_path
+
+
+def remux_with_audio(video_path, audio_path, output_path, duration, audio_codec="aac"):
+    """Stream-copy the video and encode only the synchronized (looped/trimmed) audio track"""
+    cmd = [ffmpeg_exe(), "-v", "error", "-y", "-i", video_path, "-stream_loop", "-1", "-i", audio_path,
+           "-map", "0:v:0", "-map", "1:a:0", "-t", f"{duration:.3f}", "-c:v", "copy", "-c:a", audio_codec,
+           "-movflags", "+faststart", output_path]
+    subprocess.run(cmd, check=True)
+    return output_path
+
+
+def benchmark(video_path, audio_path):
+    """Time the render step of the moviepy, pipeline and ffmpeg backends on the same edit and print frames
+    per second. The crop path is planned (and cached) first, the original audio is not ducked, and the
+    stream-copy fast path is bypassed, so every backend re-encodes the same frames."""
+    from football_video_editor import FootballVideoEditor
+    
+    media_index = media.media_index()
+    info = media_index.get(video_path)
+    frames = info["duration"] * (info["fps"] or 30)
+    work_dir = tempfile.mkdtemp(prefix="backend_bench_")
+    results = {}
+    try:
+        for backend in ("moviepy", "pipeline", "ffmpeg"):
+            editor = FootballVideoEditor(media_index=media_index, backend=backend, duck_original=False)
+            crop_path(video_path, editor.target_width / editor.target_height)
+            output_path = os.path.join(work_dir, f"{backend}.mp4")
+            if backend == "moviepy":
+                video, audio = editor.load_media(video_path, audio_path)
+                final = editor.merge_video_audio(editor.format_for_vertical(video),
+                                                 editor.synchronize_audio(video, audio))
+                started = time.perf_counter()
+                editor.export_video(final, output_path, work_dir=work_dir)
+                results[backend] = time.perf_counter() - started
+                video.close()
+                audio.close()
+            else:
+                render = editor.render_with_ffmpeg if backend == "ffmpeg" else editor.render_with_pipeline
+                started = time.perf_counter()
+                render(video_path, audio_path, output_path)
+                results[backend] = time.perf_counter() - started
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    
+    print("\n📊 Backend benchmark")
+    for backend, seconds in results.items():
+        print(f"   {backend:>8}: {seconds:7.1f}s  {frames / seconds:6.1f} fps")
+    print(f"   pipeline backend is x{results['moviepy'] / results['pipeline']:.1f} faster than moviepy")
+    print(f"   ffmpeg backend is x{results['moviepy'] / results['ffmpeg']:.1f} faster than moviepy")
+    return results
+
+
+def main():
+    if len(sys.argv) != 3:
+        print("Usage: python ffmpeg_backend.py <video> <audio>   (benchmarks moviepy vs pipeline vs ffmpeg)")
+        return False
+    video, audio = sys.argv[1], sys.argv[2]
+    for path in (video, audio):
+        if not os.path.exists(path):
+            print(f"❌ File not found: {path}")
+            return False
+    benchmark(video, audio)
+    return True
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
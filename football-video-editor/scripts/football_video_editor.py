@@ -6,6 +6,8 @@ Merges football highlight videos with voiceovers and formats for social media.
 
 import os
 import sys
+import shutil
+import tempfile
 from pathlib import Path
 
 # Dependency check with helpful error message
@@ -39,13 +41,45 @@ if not check_dependencies():
     sys.exit(1)
 
 from moviepy.editor import VideoFileClip, AudioFileClip
+from moviepy.audio.fx.all import audio_loop
+import pipeline_path  # noqa: F401  (puts ai-football-project on sys.path)
+from common import media
+from video_editing.render_profile import DRAFT
+from video_editing.smart_cut import smart_cut
+from parallel_export import ParallelExporter
+from smart_crop import CropPlanner
+from ffmpeg_backend import FFmpegRenderer, remux_with_audio
+from frame_pipeline import FramePipelineRenderer
+from audio_mix import AudioMixer
 
 class FootballVideoEditor:
-    def __init__(self):
+    def __init__(self, media_index=None, workers=1, draft=False, smart_crop=True, backend="moviepy",
+                 duck_original=False, voice_pcm=None):
         self.target_width = 608
         self.target_height = 1080
         self.output_codec = 'libx264'
         self.audio_codec = 'aac'
+        self.preset = 'medium'
+        self.fps = None  # keep the source frame rate
+        self.draft = draft
+        # Follow the action when cropping wide footage instead of taking the centre
+        self.smart_crop = smart_crop
+        # "moviepy" processes frames in Python; "ffmpeg" compiles the whole edit into one filtergraph;
+        # "pipeline" streams raw frames through reused buffers on decode/crop/encode threads
+        self.backend = backend
+        # Opt-in: keep the original crowd audio, ducked under the voiceover, instead of replacing it
+        self.duck_original = duck_original
+        # Voiceover already decoded to float PCM (a batch shares one copy across processes)
+        self.voice_pcm = voice_pcm
+        if draft:
+            # Same timeline with the pipeline's draft profile: a third of the resolution (same rounding, so the
+            # aspect ratio is kept), half the frame rate and the fastest preset
+            self.target_width, self.target_height = DRAFT.size(self.target_width, self.target_height)
+            self.preset = DRAFT.preset
+            self.fps = DRAFT.fps
+        self.media_index = media_index or media.media_index()
+        # >1 splits the export into keyframe-aligned segments encoded in parallel
+        self.workers = workers
     
     def validate_files(self, video_path, audio_path):
         """Validate that input files exist and are accessible"""
@@ -57,6 +91,9 @@ class FootballVideoEditor:
         if not os.path.exists(audio_path):
             raise FileNotFoundError(f"Audio file not found: {audio_path}")
         
+        # Probe headers once; later steps read metadata from the index
+        self.media_index.add([video_path, audio_path])
+        
         print(f"✅ Video file: {video_path}")
         print(f"✅ Audio file: {audio_path}")
     
@@ -65,10 +102,11 @@ class FootballVideoEditor:
         print("🎬 Loading media files...")
         
         try:
+            video_info = self.media_index.get(video_path)
+            print(f"📹 Video duration: {video_info['duration']:.2f}s, Size: [{video_info['width']}, {video_info['height']}]")
+            
             video = VideoFileClip(video_path)
             audio = AudioFileClip(audio_path)
-            
-            print(f"📹 Video duration: {video.duration:.2f}s, Size: {video.size}")
             print(f"🎵 Audio duration: {audio.duration:.2f}s")
             
             return video, audio
@@ -76,6 +114,20 @@ class FootballVideoEditor:
         except Exception as e:
             raise RuntimeError(f"Failed to load media files: {e}")
     
+    def cut_clip(self, video_path, start, end, output_path):
+        """Trim a source frame-accurately, re-encoding only the partial GOPs at either end"""
+        print(f"✂️  Cutting {video_path} from {start:.2f}s to {end:.2f}s...")
+        smart_cut(video_path, start, end, output_path)
+        self.media_index.add([output_path])
+        return output_path
+    
+    def mix_audio(self, video_path, audio_path, work_dir):
+        """Duck the video's own audio under the voiceover; returns the mixed track's path"""
+        print("🎚️  Mixing voiceover over the original audio (ducking)...")
+        mixed_path = os.path.join(work_dir, "mixed_audio.wav")
+        AudioMixer(self.media_index, voice_pcm=self.voice_pcm).mix(video_path, audio_path, mixed_path)
+        return mixed_path
+    
     def synchronize_audio(self, video, audio):
         """Synchronize audio duration to match video"""
         print("🔄 Synchronizing audio with video...")
@@ -94,13 +146,15 @@ class FootballVideoEditor:
         else:
             # Loop audio to match video duration
             print(f"🔁 Looping audio from {audio_duration:.2f}s to {video_duration:.2f}s")
-            loops_needed = int(video_duration / audio_duration) + 1
-            audio = audio.loop(n=loops_needed).subclip(0, video_duration)
+            audio = audio_loop(audio, duration=video_duration)
         
         return audio
     
-    def format_for_vertical(self, video):
-        """Resize video to vertical format (608x1080)"""
+    def format_for_vertical(self, video, time_offset=0.0):
+        """Resize video to vertical format (608x1080)
+
+        time_offset is where `video` starts in its source file (for subclips).
+        """
         print(f"📱 Formatting video for vertical display ({self.target_width}x{self.target_height})...")
         
         original_width, original_height = video.size
@@ -115,12 +169,18 @@ class FootballVideoEditor:
             new_height = self.target_height
             new_width = int(original_width * (self.target_height / original_height))
             
-            # Resize and center crop
             resized_video = video.resize(height=new_height)
-            x_center = new_width // 2
-            x_start = x_center - (self.target_width // 2)
-            
-            formatted_video = resized_video.crop(x1=x_start, x2=x_start + self.target_width)
+            source_path = getattr(video, "filename", None)
+            if self.smart_crop and source_path:
+                # Crop window follows the play (motion + players/ball on the pitch)
+                print("🎯 Planning action-tracking crop...")
+                planner = CropPlanner()
+                formatted_video = planner.crop_clip(resized_video, source_path, self.target_width, time_offset)
+            else:
+                # Resize and center crop
+                x_center = new_width // 2
+                x_start = x_center - (self.target_width // 2)
+                formatted_video = resized_video.crop(x1=x_start, x2=x_start + self.target_width)
             
         else:
             # Video is taller than target - fit by width and crop top/bottom
@@ -147,20 +207,29 @@ class FootballVideoEditor:
         print("✅ Video and audio merged successfully")
         return final_video
     
-    def export_video(self, video, output_path):
+    def export_video(self, video, output_path, source_path=None, work_dir=None):
         """Export the final video with specified codecs"""
         print(f"💾 Exporting video to {output_path}...")
         
         try:
-            video.write_videofile(
-                output_path,
-                codec=self.output_codec,
-                audio_codec=self.audio_codec,
-                temp_audiofile='temp-audio.m4a',
-                remove_temp=True,
-                verbose=False,
-                logger=None
-            )
+            if self.workers > 1 and source_path:
+                exporter = ParallelExporter(self.media_index, self.workers, self.output_codec, self.draft,
+                                            self.smart_crop)
+                exporter.export(source_path, video.audio, video.duration, output_path, self.audio_codec)
+            else:
+                video.write_videofile(
+                    output_path,
+                    codec=self.output_codec,
+                    audio_codec=self.audio_codec,
+                    preset=self.preset,
+                    fps=self.fps,
+                    # Inside the job's own directory so concurrent exports don't share one temp file
+                    temp_audiofile=os.path.join(work_dir or os.path.dirname(os.path.abspath(output_path)),
+                                                f"{Path(output_path).stem}_temp-audio.m4a"),
+                    remove_temp=True,
+                    verbose=False,
+                    logger=None
+                )
             
             print(f"🎉 Video exported successfully: {output_path}")
             
@@ -172,18 +241,88 @@ class FootballVideoEditor:
         except Exception as e:
             raise RuntimeError(f"Failed to export video: {e}")
     
-    def process_video(self, video_path, audio_path, output_path="final_output.mp4"):
-        """Main processing pipeline"""
+    def video_needs_transform(self, video_path):
+        """Return why the video must be re-encoded, or None if it can be copied as-is"""
+        info = self.media_index.get(video_path)
+        if (info["width"], info["height"]) != (self.target_width, self.target_height):
+            return f"size {info['width']}x{info['height']} != {self.target_width}x{self.target_height}"
+        if info["video_codec"] != "h264":
+            return f"codec {info['video_codec']} is not H.264"
+        if info["pix_fmt"] not in (None, "yuv420p", "yuvj420p"):
+            return f"pixel format {info['pix_fmt']}"
+        if self.fps and abs((info["fps"] or 0) - self.fps) > 0.01:
+            return f"frame rate {info['fps']} != {self.fps}"
+        return None
+    
+    def remux_audio_only(self, video_path, audio_path, output_path):
+        """Copy the video stream untouched and encode only the synchronized voiceover"""
+        print("⚡ Video is already in the target format - remuxing with the new audio only...")
+        duration = self.media_index.get(video_path)["duration"]
+        remux_with_audio(video_path, audio_path, output_path, duration, self.audio_codec)
+        print(f"🎉 Video exported successfully: {output_path}")
+        file_size = os.path.getsize(output_path) / (1024 * 1024)  # MB
+        print(f"📊 File size: {file_size:.2f} MB")
+    
+    def render_with_ffmpeg(self, video_path, audio_path, output_path):
+        """Sync, crop, scale and merge in a single native ffmpeg pass"""
+        print(f"⚡ Rendering with the ffmpeg backend ({self.target_width}x{self.target_height})...")
+        renderer = FFmpegRenderer(self.media_index, self.target_width, self.target_height, self.output_codec,
+                                  self.audio_codec, self.preset, self.fps, self.smart_crop)
+        renderer.render(video_path, audio_path, output_path)
+        print(f"🎉 Video exported successfully: {output_path}")
+        file_size = os.path.getsize(output_path) / (1024 * 1024)  # MB
+        print(f"📊 File size: {file_size:.2f} MB")
+    
+    def render_with_pipeline(self, video_path, audio_path, output_path):
+        """Decode, crop and encode on separate threads through preallocated frame buffers"""
+        print(f"⚡ Rendering with the frame pipeline ({self.target_width}x{self.target_height})...")
+        renderer = FramePipelineRenderer(self.media_index, self.target_width, self.target_height,
+                                         self.audio_codec, self.preset, self.fps, self.smart_crop)
+        renderer.render(video_path, audio_path, output_path)
+        print(f"🎉 Video exported successfully: {output_path}")
+        file_size = os.path.getsize(output_path) / (1024 * 1024)  # MB
+        print(f"📊 File size: {file_size:.2f} MB")
+    
+    def process_video(self, video_path, audio_path, output_path="final_output.mp4", start=None, end=None):
+        """Main processing pipeline; start/end (seconds) trim the video first"""
         print("🏈 Starting Football AI Video Editor")
         print("=" * 50)
         
         video = None
         audio = None
+        work_dir = tempfile.mkdtemp(prefix="football_edit_")
         
         try:
             # Step 1: Validate files
             self.validate_files(video_path, audio_path)
             
+            # Trim before anything else so every later step only sees the kept frames
+            if start is not None or end is not None:
+                if end is None:
+                    end = self.media_index.get(video_path)["duration"]
+                video_path = self.cut_clip(video_path, start or 0.0, end, os.path.join(work_dir, "trimmed.mp4"))
+            
+            # The mix is already synchronized to the video length
+            if self.duck_original:
+                audio_path = self.mix_audio(video_path, audio_path, work_dir)
+            
+            # Fast path: nothing to do to the picture, so only the audio track is encoded
+            reason = self.video_needs_transform(video_path)
+            if reason is None:
+                self.remux_audio_only(video_path, audio_path, output_path)
+                print("\n🎊 Processing completed successfully!")
+                return True
+            print(f"🎞️  Re-encoding video: {reason}")
+            
+            if self.backend == "ffmpeg":
+                self.render_with_ffmpeg(video_path, audio_path, output_path)
+                print("\n🎊 Processing completed successfully!")
+                return True
+            if self.backend == "pipeline":
+                self.render_with_pipeline(video_path, audio_path, output_path)
+                print("\n🎊 Processing completed successfully!")
+                return True
+            
             # Step 2: Load media
             video, audio = self.load_media(video_path, audio_path)
             
@@ -197,7 +336,7 @@ class FootballVideoEditor:
             final_video = self.merge_video_audio(vertical_video, synchronized_audio)
             
             # Step 6: Export
-            self.export_video(final_video, output_path)
+            self.export_video(final_video, output_path, source_path=video_path, work_dir=work_dir)
             
             print("\n🎊 Processing completed successfully!")
             
@@ -211,6 +350,7 @@ class FootballVideoEditor:
                 video.close()
             if audio:
                 audio.close()
+            shutil.rmtree(work_dir, ignore_errors=True)
         
         return True
 
@@ -234,7 +374,8 @@ def main():
         for video_file in video_files:
             print(f"   - {video_file}")
         print("\n💡 You can also specify custom files:")
-        print("   python scripts/football_video_editor.py <video_file> <audio_file>")
+        print("   python scripts/football_video_editor.py <video_file> <audio_file> [workers] [--draft] "
+              "[--ffmpeg | --pipeline] [--duck] [--start=SECONDS] [--end=SECONDS]")
         return False
     
     if not os.path.exists(audio_file):
@@ -255,13 +396,24 @@ def main():
 
 if __name__ == "__main__":
     # Allow custom video and audio files as command line arguments
-    if len(sys.argv) == 3:
-        video_file = sys.argv[1]
-        audio_file = sys.argv[2]
+    draft = "--draft" in sys.argv
+    duck = "--duck" in sys.argv
+    backend = "ffmpeg" if "--ffmpeg" in sys.argv else "pipeline" if "--pipeline" in sys.argv else "moviepy"
+    # --start=/--end= trim the video (frame-accurately) before it is edited
+    trim = {arg.split("=", 1)[0]: float(arg.split("=", 1)[1]) for arg in sys.argv[1:]
+            if arg.startswith(("--start=", "--end="))}
+    args = [arg for arg in sys.argv[1:] if arg not in ("--draft", "--ffmpeg", "--pipeline", "--duck")
+            and not arg.startswith(("--start=", "--end="))]
+    if len(args) in (2, 3):
+        video_file = args[0]
+        audio_file = args[1]
+        workers = int(args[2]) if len(args) == 3 else 1
         
         if os.path.exists(video_file) and os.path.exists(audio_file):
-            editor = FootballVideoEditor()
-            success = editor.process_video(video_file, audio_file)
+            editor = FootballVideoEditor(workers=workers, draft=draft, backend=backend, duck_original=duck)
+            output_path = "final_output_draft.mp4" if draft else "final_output.mp4"
+            success = editor.process_video(video_file, audio_file, output_path, trim.get("--start"),
+                                           trim.get("--end"))
             sys.exit(0 if success else 1)
         else:
             print("❌ One or both files not found")
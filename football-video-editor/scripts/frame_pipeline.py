@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Football AI Video Editor - Streaming Frame Pipeline
+A third render backend between MoviePy and the pure ffmpeg filtergraph:
+frames still pass through Python, but without MoviePy's per-frame arrays.
+The clip is rendered as a one-entry edit decision list by the pipeline's
+streaming renderer (ai-football-project/video_editing/frame_pipeline.py):
+  - decode: ffmpeg scales the source to cover 608x1080 and writes raw RGB
+    straight into a fixed pool of preallocated buffers (readinto)
+  - crop: the action-tracking (or centre) window is copied into a second
+    preallocated pool, no new arrays
+  - encode: the same buffer is written to the encoder's stdin
+Each stage runs on its own thread, linked by bounded queues, so memory stays
+fixed and a slow stage holds the others back instead of piling up frames.
+The voiceover is looped/trimmed to the video once and muxed in as is.
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+import subprocess
+
+import pipeline_path  # noqa: F401  (puts ai-football-project on sys.path)
+from common import media
+from common.media import ffmpeg_exe
+from video_editing.edl import EDL_VERSION
+from video_editing.frame_pipeline import QUEUE_DEPTH, render_edl
+from video_editing.render_profile import RenderProfile
+from video_editing.smart_crop import span_path
+
+CRF = 23  # x264's default quality
+
+
+class FramePipelineRenderer:
+    def __init__(self, media_index=None, width=608, height=1080, audio_codec="aac", preset="medium", fps=None,
+                 smart_crop=True, queue_depth=QUEUE_DEPTH):
+        self.media_index = media_index or media.media_index()
+        self.width = width
+        self.height = height
+        self.audio_codec = audio_codec
+        self.preset = preset
+        self.fps = fps
+        self.smart_crop = smart_crop
+        self.queue_depth = queue_depth
+    
+    def edl(self, video_path):
+        """The whole clip as one entry cropped to the output aspect ratio, following the action if wide"""
+        info = self.media_index.get(video_path)
+        duration = info["duration"]
+        transforms = {"fit": "crop"}
+        if self.smart_crop and info["width"] * self.height > info["height"] * self.width:
+            transforms = {"fit": "track", "crop_x": span_path(video_path, 0.0, duration, self.width / self.height)}
+        entry = {"source": os.path.abspath(video_path), "in": 0.0, "out": duration, "transforms": transforms,
+                 "overlays": []}
+        return {"version": EDL_VERSION, "width": self.width, "height": self.height, "entries": [entry]}
+    
+    def sync_audio(self, audio_path, duration, output_path):
+        """Loop or trim the voiceover to duration and encode it once"""
+        # -stream_loop repeats short audio; -t trims long audio to the video length
+        cmd = [ffmpeg_exe(), "-v", "error", "-y", "-stream_loop", "-1", "-i", audio_path, "-map", "0:a:0",
+               "-t", f"{duration:.3f}", "-c:a", self.audio_codec, output_path]
+        subprocess.run(cmd, check=True)
+        return output_path
+    
+    def render(self, video_path, audio_path, output_path):
+        """Render the vertical edit of video_path with audio_path through decode/crop/encode threads"""
+        info = self.media_index.get(video_path)
+        profile = RenderProfile("pipeline", scale=1.0, fps=self.fps or info["fps"] or 30, preset=self.preset,
+                                crf=CRF)
+        work_dir = tempfile.mkdtemp(prefix="frame_pipeline_")
+        try:
+            audio = self.sync_audio(audio_path, info["duration"], os.path.join(work_dir, "audio.m4a"))
+            render_edl(self.edl(video_path), output_path, profile, self.queue_depth, audio)
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+        return output_path
+
+
+def main():
+    if len(sys.argv) != 4:
+        print("Usage: python frame_pipeline.py <video> <audio> <output.mp4>")
+        return False
+    video, audio, output = sys.argv[1:4]
+    for path in (video, audio):
+        if not os.path.exists(path):
+            print(f"❌ File not found: {path}")
+            return False
+    FramePipelineRenderer().render(video, audio, output)
+    print(f"🎉 Rendered {output}")
+    return True
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
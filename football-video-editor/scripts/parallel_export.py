@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Football AI Video Editor - Parallel Export
+Splits the timeline at source keyframes, renders each range in its own
+process with closed GOPs and identical encoder settings, then joins the
+pieces losslessly and muxes in the audio track rendered once.
+"""
+
+import io
+import os
+import sys
+import time
+import bisect
+import shutil
+import subprocess
+import tempfile
+import contextlib
+from concurrent.futures import ProcessPoolExecutor
+
+import pipeline_path  # noqa: F401  (puts ai-football-project on sys.path)
+from common import media
+from common.media import ffmpeg_exe
+
+
+def render_segment(job):
+    """Worker: rebuild the vertical pipeline for one time range and encode it video-only"""
+    from moviepy.editor import VideoFileClip
+    from football_video_editor import FootballVideoEditor
+    
+    started = time.perf_counter()
+    clip = VideoFileClip(job["video_path"], audio=False).subclip(job["start"], job["end"])
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            editor = FootballVideoEditor(draft=job["draft"], smart_crop=job["smart_crop"])
+            vertical = editor.format_for_vertical(clip, time_offset=job["start"])
+        vertical.write_videofile(
+            job["output_path"],
+            codec=job["codec"],
+            audio=False,
+            preset=editor.preset,
+            fps=editor.fps,
+            threads=job["threads"],
+            ffmpeg_params=["-flags", "+cgop", "-pix_fmt", "yuv420p"],
+            verbose=False,
+            logger=None
+        )
+    finally:
+        clip.close()
+    return job["output_path"], time.perf_counter() - started
+
+
+class ParallelExporter:
+    def __init__(self, media_index=None, workers=None, codec="libx264", draft=False, smart_crop=True):
+        self.media_index = media_index or media.media_index()
+        self.workers = workers or os.cpu_count() or 1
+        self.codec = codec
+        self.draft = draft
+        self.smart_crop = smart_crop
+    
+    def split_points(self, video_path, duration):
+        """Cut the timeline into one range per worker, moving each cut onto the nearest keyframe"""
+        keyframes = [k for k in self.media_index.keyframes(video_path) if 0 < k < duration]
+        points = [0.0]
+        for n in range(1, self.workers):
+            target = duration * n / self.workers
+            if keyframes:
+                i = bisect.bisect_left(keyframes, target)
+                candidates = keyframes[max(0, i - 1):i + 1]
+                target = min(candidates, key=lambda k: abs(k - target))
+            if target - points[-1] >= 1.0:
+                points.append(target)
+        return list(zip(points, points[1:] + [duration]))
+    
+    def export(self, video_path, audio, duration, output_path, audio_codec="aac"):
+        """Render video_path's vertical edit over [0, duration) with audio clip `audio`"""
+        ranges = self.split_points(video_path, duration)
+        threads = max(1, (os.cpu_count() or 1) // self.workers)
+        work_dir = tempfile.mkdtemp(prefix="parallel_export_")
+        try:
+            jobs = [{
+                "video_path": video_path, "start": start, "end": end, "codec": self.codec, "draft": self.draft,
+                "smart_crop": self.smart_crop,
+                "threads": threads,
+                "output_path": os.path.join(work_dir, f"segment_{i:03d}.mp4")
+            } for i, (start, end) in enumerate(ranges)]
+            
+            started = time.perf_counter()
+            with ProcessPoolExecutor(max_workers=self.workers) as pool:
+                results = list(pool.map(render_segment, jobs))
+            print(f"⚡ Rendered {len(jobs)} segments on {self.workers} workers in "
+                  f"{time.perf_counter() - started:.1f}s")
+            
+            list_path = os.path.join(work_dir, "concat.txt")
+            with open(list_path, "w") as f:
+                for segment, _ in results:
+                    f.write(f"file '{os.path.abspath(segment)}'\n")
+            joined = os.path.join(work_dir, "video.mp4")
+            subprocess.run([ffmpeg_exe(), "-v", "error", "-y", "-f", "concat", "-safe", "0", "-i", list_path,
+                            "-c", "copy", joined], check=True)
+            
+            cmd = [ffmpeg_exe(), "-v", "error", "-y", "-i", joined]
+            if audio is not None:
+                audio_path = os.path.join(work_dir, "audio.m4a")
+                audio.write_audiofile(audio_path, codec=audio_codec, verbose=False, logger=None)
+                cmd += ["-i", audio_path, "-map", "0:v", "-map", "1:a", "-shortest"]
+            subprocess.run(cmd + ["-c", "copy", "-movflags", "+faststart", output_path], check=True)
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+        return output_path
+
+
+def benchmark(video_path, max_workers=None):
+    """Export the same video with 1, 2, 4 ... max_workers workers and print the scaling"""
+    max_workers = max_workers or os.cpu_count() or 1
+    counts = [1]
+    while counts[-1] * 2 < max_workers:
+        counts.append(counts[-1] * 2)
+    if counts[-1] != max_workers:
+        counts.append(max_workers)
+    
+    media_index = media.media_index()
+    duration = media_index.get(video_path)["duration"]
+    work_dir = tempfile.mkdtemp(prefix="parallel_bench_")
+    timings = {}
+    try:
+        for workers in counts:
+            started = time.perf_counter()
+            ParallelExporter(media_index, workers).export(
+                video_path, None, duration, os.path.join(work_dir, f"bench_{workers}.mp4"))
+            timings[workers] = time.perf_counter() - started
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    
+    print("\n📊 Parallel export scaling")
+    for workers, seconds in timings.items():
+        print(f"   {workers:>3} workers: {seconds:7.1f}s  (x{timings[1] / seconds:.2f})")
+    return timings
+
+
+def main():
+    if len(sys.argv) not in (2, 3):
+        print("Usage: python parallel_export.py <video> [max_workers]")
+        return False
+    video = sys.argv[1]
+    if not os.path.exists(video):
+        print(f"❌ Video file not found: {video}")
+        return False
+    benchmark(video, int(sys.argv[2]) if len(sys.argv) == 3 else None)
+    return True
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,19 @@
+#!/usr/bin/env python3
+"""
+Football AI Video Editor - Pipeline Imports
+Puts the sibling ai-football-project on sys.path so the scripts import its
+media tooling (common.media, video_editing.smart_cut, ...) instead of keeping
+copies. Unless CACHE_DIR is set, the shared caches (media index, crop paths)
+live in football-video-editor/.cache whatever the working directory.
+Import this module before any of those packages.
+"""
+
+import os
+import sys
+
+EDITOR_ROOT = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+PIPELINE_ROOT = os.path.normpath(os.path.join(EDITOR_ROOT, "..", "ai-football-project"))
+
+os.environ.setdefault("CACHE_DIR", os.path.join(EDITOR_ROOT, ".cache"))
+if PIPELINE_ROOT not in sys.path:
+    sys.path.insert(0, PIPELINE_ROOT)
@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""
+Football AI Video Editor - Render Statistics & Prediction Model
+Telemetry of past jobs, kept in a small JSON file next to the media index,
+and a model fitted on it that predicts a job's wall time and output size:
+  - "render" jobs (crop/scale/re-encode) cost megapixel-frames decoded
+  - "remux" jobs (audio only, video stream copied) cost seconds of media
+Each prediction starts from a physical baseline (cost / throughput for time,
+output pixels x bits-per-pixel for size) and applies a correction learned by
+ridge regression on log features: input bits per pixel, sampled motion,
+output pixel-frames, x264 preset, duration and workers per core. The time
+baseline already slows each job down when more workers than cores share the
+machine, so runs recorded at different worker counts calibrate one model.
+With little history the correction shrinks to a plain scale factor, so a
+single run already calibrates.
+"""
+
+import os
+import sys
+import json
+import heapq
+import subprocess
+
+import numpy as np
+
+import pipeline_path  # noqa: F401  (puts ai-football-project on sys.path)
+from common import config
+from common.media import ffmpeg_exe
+
+STATS_PATH = os.path.join(config.CACHE_DIR, "render_stats.json")
+HISTORY = 200
+# Used until a kind has history; measured on a single core with the MoviePy backend
+DEFAULT_THROUGHPUT = {"render": 8.0, "remux": 10.0}
+BASE_BITS_PER_PIXEL = 0.05  # H.264 at CRF 23 on broadcast football, roughly
+AUDIO_BITRATE = 128000
+X264_PRESETS = ["ultrafast", "superfast", "veryfast", "faster", "fast", "medium", "slow", "slower", "veryslow"]
+RIDGE = 1.0
+MOTION_SAMPLES = 5
+FEATURES = ("bits_per_pixel", "motion", "output_pixel_frames", "preset", "duration", "load")
+
+
+def motion_complexity(path, duration, samples=MOTION_SAMPLES):
+    """Mean absolute difference between consecutive frames (0..1), from a few evenly spaced
+    pairs decoded at thumbnail size; the median keeps a scene cut from dominating"""
+    w, h = 64, 36
+    diffs = []
+    for i in range(samples):
+        t = duration * (i + 0.5) / samples
+        cmd = [ffmpeg_exe(), "-v", "error", "-ss", f"{t:.3f}", "-i", path, "-frames:v", "2",
+               "-vf", f"scale={w}:{h},format=gray", "-f", "rawvideo", "-"]
+        raw = subprocess.run(cmd, stdout=subprocess.PIPE).stdout
+        if len(raw) >= 2 * w * h:
+            frames = np.frombuffer(raw[:2 * w * h], np.uint8).reshape(2, h, w).astype(np.float32)
+            diffs.append(float(np.abs(frames[1] - frames[0]).mean() / 255.0))
+    return float(np.median(diffs)) if diffs else 0.0
+
+
+def contention(workers, cores=None):
+    """How much slower each job runs when `workers` jobs share `cores` cores"""
+    return max(1.0, workers / float(cores or os.cpu_count() or 1))
+
+
+def job_features(info, source_bytes, motion, out_width, out_height, preset, fps=None, workers=1):
+    """Model inputs for one job, from the source's probe info and the render settings.
+    motion may be None when it hasn't been sampled; the model then assumes a typical value."""
+    fps = fps or info["fps"] or 30
+    duration = info["duration"]
+    source_pixels = max(1, info["width"] * info["height"])
+    bitrate = info.get("video_bitrate") or info.get("bitrate") or 0
+    return {
+        "duration": duration,
+        "source_pixel_frames": source_pixels * (info["fps"] or 30) * duration / 1e6,
+        "output_pixel_frames": out_width * out_height * fps * duration / 1e6,
+        "bits_per_pixel": bitrate / (source_pixels * (info["fps"] or 30)) if bitrate else BASE_BITS_PER_PIXEL,
+        "motion": motion,
+        "preset": X264_PRESETS.index(preset) if preset in X264_PRESETS else X264_PRESETS.index("medium"),
+        "source_bytes": source_bytes,
+        "workers": workers,
+        "cores": os.cpu_count() or 1,
+    }
+
+
+def baseline(kind, features):
+    """Uncalibrated (seconds, bytes) from first principles"""
+    duration = features["duration"]
+    audio_bytes = AUDIO_BITRATE / 8 * duration
+    slowdown = contention(features.get("workers", 1), features.get("cores"))
+    if kind == "remux":
+        return duration / DEFAULT_THROUGHPUT["remux"] * slowdown, features["source_bytes"] + audio_bytes
+    seconds = features["source_pixel_frames"] / DEFAULT_THROUGHPUT["render"] * slowdown
+    video_bytes = features["output_pixel_frames"] * 1e6 * BASE_BITS_PER_PIXEL / 8
+    return seconds, video_bytes + audio_bytes
+
+
+def _design(features):
+    """Log-space feature row; the preset is already an ordinal and unknown values are NaN"""
+    row = []
+    for name in FEATURES:
+        if name == "load":
+            value = features["workers"] / float(features.get("cores") or os.cpu_count() or 1) if "workers" in features else None
+        else:
+            value = features.get(name)
+        if value is None:
+            row.append(np.nan)
+        else:
+            row.append(float(value) if name == "preset" else float(np.log(max(value, 1e-6))))
+    return row
+
+
+def makespan(estimates, workers):
+    """Wall time of running jobs in the given order on a pool that hands each job to the first free worker"""
+    free_at = [0.0] * max(1, workers)
+    for seconds in estimates:
+        heapq.heappush(free_at, heapq.heappop(free_at) + seconds)
+    return max(free_at)
+
+
+def _with_workers(run):
+    """Runs recorded before workers were a feature carry them only on the run itself"""
+    if "workers" in run["features"]:
+        return run
+    return dict(run, features=dict(run["features"], workers=run.get("workers", 1)))
+
+
+class RenderModel:
+    """Ridge-regularized log-linear correction of the baseline, one fit per (kind, target) over runs
+    at every worker count"""
+
+    def __init__(self, runs):
+        self.fits = {}
+        for kind in DEFAULT_THROUGHPUT:
+            for target in ("seconds", "output_bytes"):
+                samples = [_with_workers(run) for run in runs if run["kind"] == kind and run.get(target)
+                           and run.get("features")]
+                if samples:
+                    self.fits[(kind, target)] = self._fit(kind, target, samples)
+
+    @staticmethod
+    def _fit(kind, target, samples):
+        index = 0 if target == "seconds" else 1
+        X = np.array([_design(run["features"]) for run in samples])
+        y = np.array([np.log(run[target]) - np.log(max(baseline(kind, run["features"])[index], 1e-6))
+                      for run in samples])
+        known = ~np.isnan(X)
+        mean = np.where(known, X, 0.0).sum(axis=0) / np.maximum(known.sum(axis=0), 1)
+        Xc = np.where(known, X - mean, 0.0)  # an unknown feature sits at the mean: no effect
+        # Intercept is free (plain calibration); slopes are shrunk toward zero until the data supports them
+        weights = np.linalg.solve(Xc.T @ Xc + RIDGE * np.eye(X.shape[1]), Xc.T @ (y - y.mean()))
+        residual = y - y.mean() - Xc @ weights
+        return {"mean": mean, "weights": weights, "intercept": float(y.mean()), "samples": len(samples),
+                "log_error": float(np.sqrt((residual ** 2).mean()))}
+
+    def predict(self, kind, features):
+        """{"seconds", "output_bytes", "samples"}; samples is how many past runs calibrated the time"""
+        base = baseline(kind, features)
+        result = {"samples": 0}
+        for index, target in enumerate(("seconds", "output_bytes")):
+            fit = self.fits.get((kind, target))
+            value = base[index]
+            if fit:
+                centred = np.nan_to_num(np.array(_design(features)) - fit["mean"])
+                correction = fit["intercept"] + centred @ fit["weights"]
+                value *= float(np.exp(correction))
+                if target == "seconds":
+                    result["samples"] = fit["samples"]
+            result[target] = value
+        return result
+
+
+class RenderStats:
+    def __init__(self, path=STATS_PATH):
+        self.path = path
+        self.runs = []
+        self._model = None
+        if os.path.exists(path):
+            try:
+                with open(path) as f:
+                    self.runs = json.load(f).get("runs", [])
+            except (OSError, ValueError):
+                self.runs = []
+
+    def save(self):
+        """Write the stats atomically"""
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"runs": self.runs}, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def record(self, kind, cost, seconds, workers=1, features=None, output_bytes=None):
+        """Add one finished job; only the most recent HISTORY runs per kind are kept"""
+        run = {"kind": kind, "cost": round(cost, 3), "seconds": round(seconds, 3), "workers": workers}
+        if features is not None:
+            run["features"] = features
+            run["output_bytes"] = output_bytes
+        self.runs.append(run)
+        same = [run for run in self.runs if run["kind"] == kind]
+        if len(same) > HISTORY:
+            oldest = same[0]
+            self.runs.remove(oldest)
+        self._model = None
+        self.save()
+
+    def model(self):
+        """Prediction model fitted on all recorded runs"""
+        if self._model is None:
+            self._model = RenderModel(self.runs)
+        return self._model
+
+
+def main():
+    stats = RenderStats(sys.argv[1] if len(sys.argv) > 1 else STATS_PATH)
+    if not stats.runs:
+        print(f"📭 No render history in {stats.path} yet")
+        return True
+    for kind in DEFAULT_THROUGHPUT:
+        runs = [run for run in stats.runs if run["kind"] == kind]
+        if runs:
+            counts = sorted({run.get("workers", 1) for run in runs})
+            print(f"📈 {kind}: {len(runs)} runs at {', '.join(map(str, counts))} worker(s)")
+    for (kind, target), fit in stats.model().fits.items():
+        print(f"🧮 {kind} {target}: fitted on {fit['samples']} runs, typical error "
+              f"x{np.exp(fit['log_error']):.2f}")
+    return True
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
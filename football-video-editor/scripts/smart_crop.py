@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Football AI Video Editor - Smart Crop
+Crops a MoviePy clip with a window that follows the action instead of the
+frame centre. The path is planned and cached in the media index by the
+pipeline's tracker (ai-football-project/video_editing/smart_crop.py: motion
+plus players/ball on the pitch, smoothed by a spring restarted at shot cuts).
+"""
+
+import os
+import sys
+
+import numpy as np
+
+import pipeline_path  # noqa: F401  (puts ai-football-project on sys.path)
+from video_editing.smart_crop import crop_path
+
+
+class CropPlanner:
+    def plan(self, video_path, aspect):
+        """Smoothed crop centres (0..1 of the width) and the rate they are sampled at"""
+        path = crop_path(video_path, aspect)
+        return np.asarray(path["x"], dtype=np.float64), path["fps"]
+    
+    def crop_clip(self, clip, video_path, crop_width, time_offset=0.0):
+        """Crop an already resized clip to crop_width, following the planned path"""
+        centres, fps = self.plan(video_path, crop_width / clip.h)
+        if len(centres) == 0:
+            x_start = (clip.w - crop_width) // 2
+            return clip.crop(x1=x_start, x2=x_start + crop_width)
+        times = np.arange(len(centres)) / fps
+        
+        def follow(get_frame, t):
+            centre = np.interp(t + time_offset, times, centres)
+            x_start = int(round(min(max(centre * clip.w - crop_width / 2, 0), clip.w - crop_width)))
+            return get_frame(t)[:, x_start:x_start + crop_width]
+        
+        return clip.fl(follow, apply_to=["mask"])
+
+
+def main():
+    if len(sys.argv) != 2:
+        print("Usage: python smart_crop.py <video>")
+        return False
+    video = sys.argv[1]
+    if not os.path.exists(video):
+        print(f"❌ Video file not found: {video}")
+        return False
+    centres, _ = CropPlanner().plan(video, 608 / 1080)
+    print(f"🎯 {len(centres)} crop positions, centre range {centres.min():.2f}-{centres.max():.2f}")
+    return True
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
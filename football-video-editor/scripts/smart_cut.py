@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+"""
+Football AI Video Editor - Smart Cut
+Frame-accurate trimming from the command line. The cutter is the pipeline's
+(ai-football-project/video_editing/smart_cut.py): only the partial GOPs at
+either end of the span are re-encoded and the whole GOPs between are
+stream-copied.
+"""
+
+import os
+import sys
+
+import pipeline_path  # noqa: F401  (puts ai-football-project on sys.path)
+from video_editing.smart_cut import smart_cut
+
+
+def main():
+    if len(sys.argv) != 5:
+        print("Usage: python smart_cut.py <video> <start_seconds> <end_seconds> <output>")
+        return False
+    video, start, end, output = sys.argv[1], float(sys.argv[2]), float(sys.argv[3]), sys.argv[4]
+    if not os.path.exists(video):
+        print(f"❌ Video file not found: {video}")
+        return False
+    smart_cut(video, start, end, output)
+    print(f"✂️  Cut {start:.2f}-{end:.2f}s to {output}")
+    return True
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
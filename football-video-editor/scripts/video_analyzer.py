@@ -6,122 +6,213 @@ Analyze video properties and suggest optimal processing settings.
 
 import os
 import sys
+import csv
+import json
+import time
 from pathlib import Path
 
-# Dependency check
-def check_dependencies():
-    """Check if MoviePy is available"""
-    try:
-        import moviepy.editor
-        return True
-    except ImportError:
-        print("❌ MoviePy is not installed!")
-        print("\n🔧 To fix this:")
-        print("1. Run: python scripts/install_requirements.py")
-        print("2. Or manually: pip install moviepy imageio imageio-ffmpeg")
-        print("3. Then run this script again")
-        return False
-
-if not check_dependencies():
-    sys.exit(1)
+import pipeline_path  # noqa: F401  (puts ai-football-project on sys.path)
+from common import media
+from common.media import PROBE_WORKERS
+from render_stats import RenderStats, contention, job_features, makespan, motion_complexity
 
-from moviepy.editor import VideoFileClip
+CSV_FIELDS = ['path', 'width', 'height', 'duration', 'fps', 'video_codec', 'has_audio', 'audio_duration',
+              'aspect_ratio', 'strategy', 'crop_amount', 'file_size_mb', 'motion', 'estimated_output_mb',
+              'estimated_seconds', 'error']
 
 class VideoAnalyzer:
-    def __init__(self):
+    def __init__(self, media_index=None, render_stats=None):
         self.target_width = 608
         self.target_height = 1080
+        self.media_index = media_index or media.media_index()
+        self.render_stats = render_stats or RenderStats()
+    
+    def processing_cost(self, video_path, remux=False):
+        """Relative cost of a job: megapixel-frames to decode (duration x resolution x fps),
+        or just seconds of media when the video stream is copied and only audio is encoded"""
+        info = self.media_index.get(video_path)
+        if remux:
+            return info['duration']
+        return info['duration'] * (info['fps'] or 30) * info['width'] * info['height'] / 1e6
+    
+    def motion(self, video_path, sample=True):
+        """Motion complexity sampled from a few frame pairs and cached in the media index;
+        None if it has never been sampled and sample is False"""
+        value = self.media_index.extra(video_path, "motion")
+        if value is None and sample:
+            value = motion_complexity(video_path, self.media_index.get(video_path)['duration'])
+            self.media_index.annotate(video_path, "motion", value)
+        return value
     
-    def analyze_video(self, video_path):
+    def is_remux(self, info):
+        """Whether the editor would copy this video stream and encode only the audio"""
+        return ((info['width'], info['height']) == (self.target_width, self.target_height)
+                and info['video_codec'] == "h264" and info['pix_fmt'] in (None, "yuv420p", "yuvj420p"))
+    
+    def predict(self, video_path, remux=None, preset="medium", workers=1, sample_motion=True):
+        """Predicted processing seconds and output size from the model fitted on past render telemetry
+        (input bitrate, sampled motion, resolution, preset, duration)"""
+        info = self.media_index.get(video_path)
+        if remux is None:
+            remux = self.is_remux(info)
+        kind = "remux" if remux else "render"
+        features = job_features(info, os.path.getsize(video_path), self.motion(video_path, sample_motion),
+                                self.target_width, self.target_height, preset, workers=workers)
+        prediction = self.render_stats.model().predict(kind, features)
+        return {'kind': kind, 'features': features, 'seconds': prediction['seconds'],
+                'output_mb': prediction['output_bytes'] / (1024 * 1024), 'samples': prediction['samples']}
+    
+    def estimate_seconds(self, video_path, remux=None, workers=1):
+        """Expected processing time in seconds"""
+        return self.predict(video_path, remux, workers=workers)['seconds']
+    
+    def plan_capacity(self, analyses, workers=1, deadline=None):
+        """Predicted wall time of processing the analysed videos longest-first on `workers`, and,
+        given a deadline in seconds, the fewest workers that would meet it. Estimates are for one worker;
+        more workers than cores slow every job down"""
+        estimates = sorted((a['estimated_seconds'] for a in analyses), reverse=True)
+        
+        def batch_seconds(n):
+            return makespan([e * contention(n) for e in estimates], n)
+        
+        plan = {'workers': workers, 'batch_seconds': batch_seconds(workers), 'deadline': deadline,
+                'workers_needed': None}
+        if deadline:
+            for n in range(1, len(estimates) + 1):
+                if batch_seconds(n) <= deadline:
+                    plan['workers_needed'] = n
+                    break
+        return plan
+    
+    def summarize(self, video_path, sample_motion=True):
+        """Analysis record for one video, from the cached header probe; decodes only the few
+        frames of the motion sample, and none at all with sample_motion=False"""
+        info = self.media_index.get(video_path)
+        width, height = info['width'], info['height']
+        duration = info['duration']
+        fps = info['fps']
+        aspect_ratio = width / height
+        target_ratio = self.target_width / self.target_height
+        
+        # Determine processing strategy
+        if aspect_ratio > target_ratio:
+            strategy = "CROP_SIDES"
+            crop_amount = width - (height * target_ratio)
+        else:
+            strategy = "CROP_TOP_BOTTOM"
+            crop_amount = height - (width / target_ratio)
+        
+        file_size = os.path.getsize(video_path) / (1024 * 1024)  # MB
+        prediction = self.predict(video_path, sample_motion=sample_motion)
+        audio_duration = (info['audio_streams'][0]['duration'] or duration) if info['has_audio'] else 0.0
+        
+        return {
+            'path': str(video_path),
+            'width': width,
+            'height': height,
+            'duration': duration,
+            'fps': fps,
+            'video_codec': info['video_codec'],
+            'has_audio': info['has_audio'],
+            'audio_duration': audio_duration,
+            'aspect_ratio': aspect_ratio,
+            'strategy': strategy,
+            'crop_amount': crop_amount,
+            'file_size_mb': file_size,
+            'motion': prediction['features']['motion'],
+            'estimated_output_mb': prediction['output_mb'],
+            'estimated_seconds': prediction['seconds']
+        }
+    
+    def analyze_video(self, video_path, sample_motion=True):
         """Analyze video properties"""
         print(f"🔍 Analyzing video: {video_path}")
         print("-" * 50)
         
         try:
-            video = VideoFileClip(video_path)
-            
-            # Basic properties
-            width, height = video.size
-            duration = video.duration
-            fps = video.fps
-            
-            print(f"📐 Dimensions: {width} x {height}")
-            print(f"⏱️  Duration: {duration:.2f} seconds")
-            print(f"🎞️  Frame rate: {fps:.2f} fps")
-            print(f"📊 Total frames: {int(duration * fps)}")
-            
-            # Aspect ratio analysis
-            aspect_ratio = width / height
-            target_ratio = self.target_width / self.target_height
-            
-            print(f"📏 Current aspect ratio: {aspect_ratio:.3f} ({width}:{height})")
-            print(f"🎯 Target aspect ratio: {target_ratio:.3f} ({self.target_width}:{self.target_height})")
-            
-            # Determine processing strategy
-            if aspect_ratio > target_ratio:
-                strategy = "CROP_SIDES"
-                crop_amount = width - (height * target_ratio)
-                print(f"📱 Strategy: Crop sides (remove {crop_amount:.0f}px width)")
-            else:
-                strategy = "CROP_TOP_BOTTOM"
-                crop_amount = height - (width / target_ratio)
-                print(f"📱 Strategy: Crop top/bottom (remove {crop_amount:.0f}px height)")
-            
-            # Audio analysis
-            if video.audio:
-                print(f"🎵 Audio: Present")
-                print(f"🎵 Audio duration: {video.audio.duration:.2f} seconds")
-            else:
-                print(f"🔇 Audio: None")
-            
-            # File size
-            file_size = os.path.getsize(video_path) / (1024 * 1024)  # MB
-            print(f"💾 File size: {file_size:.2f} MB")
-            
-            # Estimated output size
-            pixel_reduction = (self.target_width * self.target_height) / (width * height)
-            estimated_size = file_size * pixel_reduction
-            print(f"📊 Estimated output size: {estimated_size:.2f} MB")
-            
-            video.close()
-            
-            return {
-                'width': width,
-                'height': height,
-                'duration': duration,
-                'fps': fps,
-                'aspect_ratio': aspect_ratio,
-                'strategy': strategy,
-                'file_size_mb': file_size,
-                'estimated_output_mb': estimated_size
-            }
-            
+            # Header-only probe, cached in the media index
+            analysis = self.summarize(video_path, sample_motion)
         except Exception as e:
             print(f"❌ Error analyzing video: {e}")
             return None
+        
+        width, height = analysis['width'], analysis['height']
+        duration, fps = analysis['duration'], analysis['fps']
+        print(f"📐 Dimensions: {width} x {height}")
+        print(f"⏱️  Duration: {duration:.2f} seconds")
+        print(f"🎞️  Frame rate: {fps:.2f} fps")
+        print(f"📊 Total frames: {int(duration * fps)}")
+        
+        # Aspect ratio analysis
+        target_ratio = self.target_width / self.target_height
+        print(f"📏 Current aspect ratio: {analysis['aspect_ratio']:.3f} ({width}:{height})")
+        print(f"🎯 Target aspect ratio: {target_ratio:.3f} ({self.target_width}:{self.target_height})")
+        if analysis['strategy'] == "CROP_SIDES":
+            print(f"📱 Strategy: Crop sides (remove {analysis['crop_amount']:.0f}px width)")
+        else:
+            print(f"📱 Strategy: Crop top/bottom (remove {analysis['crop_amount']:.0f}px height)")
+        
+        # Audio analysis
+        if analysis['has_audio']:
+            print(f"🎵 Audio: Present")
+            print(f"🎵 Audio duration: {analysis['audio_duration']:.2f} seconds")
+        else:
+            print(f"🔇 Audio: None")
+        
+        print(f"💾 File size: {analysis['file_size_mb']:.2f} MB")
+        if analysis['motion'] is not None:
+            print(f"🏃 Motion complexity: {analysis['motion']:.3f}")
+        print(f"📊 Estimated output size: {analysis['estimated_output_mb']:.2f} MB")
+        print(f"⏳ Estimated processing time: {analysis['estimated_seconds']:.1f} seconds")
+        return analysis
     
-    def analyze_directory(self, directory_path):
-        """Analyze all videos in a directory"""
-        print(f"📁 Analyzing videos in: {directory_path}")
-        print("=" * 60)
+    def analyze_directory(self, directory_path, workers=PROBE_WORKERS, output_format="text", output_path=None,
+                          sample_motion=False, render_workers=1, deadline=None):
+        """Analyze all videos in a directory. Headers are probed on a thread pool (cached by
+        path, size and mtime); "json" / "csv" write one record per file instead of the text report.
+        The summary includes the predicted batch time on render_workers and, given a deadline in
+        seconds, how many workers would meet it."""
+        if output_format == "text":
+            print(f"📁 Analyzing videos in: {directory_path}")
+            print("=" * 60)
         
         video_extensions = {'.mp4', '.avi', '.mov', '.mkv', '.wmv', '.flv'}
         video_files = []
         
-        for file_path in Path(directory_path).iterdir():
-            if file_path.suffix.lower() in video_extensions:
-                video_files.append(file_path)
+        with os.scandir(directory_path) as entries:
+            for entry in entries:
+                if entry.is_file() and Path(entry.name).suffix.lower() in video_extensions:
+                    video_files.append(entry.path)
+        video_files.sort()
         
         if not video_files:
             print("❌ No video files found")
-            return
+            return []
+        
+        started = time.perf_counter()
+        errors = self.media_index.add(video_files, workers)
+        
+        if output_format != "text":
+            records = []
+            for video_file in video_files:
+                try:
+                    records.append(self.summarize(video_file, sample_motion) if video_file not in errors else
+                                   {'path': video_file, 'error': errors[video_file]})
+                except Exception as e:
+                    records.append({'path': video_file, 'error': str(e)})
+            output_path = output_path or f"video_analysis.{output_format}"
+            write_records(records, output_format, output_path)
+            print(f"📄 Analyzed {len(records)} videos in {time.perf_counter() - started:.2f}s "
+                  f"({len(errors)} unreadable): {output_path}")
+            self.print_plan(self.plan_capacity([r for r in records if 'error' not in r], render_workers, deadline))
+            return records
         
         total_size = 0
         total_duration = 0
         analyses = []
         
         for video_file in video_files:
-            analysis = self.analyze_video(str(video_file))
+            analysis = self.analyze_video(video_file, sample_motion)
             if analysis:
                 analyses.append(analysis)
                 total_size += analysis['file_size_mb']
@@ -140,17 +231,59 @@ class VideoAnalyzer:
             estimated_output_size = sum(a['estimated_output_mb'] for a in analyses)
             print(f"📊 Average duration: {avg_duration:.2f} seconds")
             print(f"📊 Estimated total output size: {estimated_output_size:.2f} MB")
+            self.print_plan(self.plan_capacity(analyses, render_workers, deadline))
+        return analyses
+    
+    @staticmethod
+    def print_plan(plan):
+        print(f"⏳ Predicted processing time: {plan['batch_seconds'] / 60:.1f} minutes "
+              f"on {plan['workers']} worker(s), longest first")
+        if plan['deadline']:
+            if plan['workers_needed'] is None:
+                print(f"🚨 Deadline of {plan['deadline'] / 60:.1f} minutes can't be met: the longest video alone "
+                      f"takes longer")
+            else:
+                print(f"🗓️  Deadline of {plan['deadline'] / 60:.1f} minutes needs {plan['workers_needed']} worker(s)")
+
+
+def write_records(records, output_format, output_path):
+    """Write analysis records as a JSON list or as CSV with one row per file"""
+    if output_format == "json":
+        with open(output_path, "w") as f:
+            json.dump(records, f, indent=2)
+    elif output_format == "csv":
+        with open(output_path, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=CSV_FIELDS, extrasaction="ignore")
+            writer.writeheader()
+            writer.writerows(records)
+    else:
+        raise ValueError(f"Unknown output format: {output_format}")
 
 def main():
     """Main function"""
-    if len(sys.argv) < 2:
-        print("Usage: python video_analyzer.py <video_file_or_directory>")
+    args = sys.argv[1:]
+    sample_motion = "--motion" in args
+    args = [arg for arg in args if arg != "--motion"]
+    options = {"--format": "text", "--output": None, "--workers": str(PROBE_WORKERS), "--render-workers": "1",
+               "--deadline": None}
+    for flag in options:
+        if flag in args:
+            i = args.index(flag)
+            options[flag] = args[i + 1] if i + 1 < len(args) else None
+            del args[i:i + 2]
+    
+    if (len(args) < 1 or options["--format"] not in ("text", "json", "csv") or not options["--workers"]
+            or not options["--render-workers"]):
+        print("Usage: python video_analyzer.py <video_file_or_directory> [--format text|json|csv] "
+              "[--output file] [--workers N] [--motion] [--render-workers N] [--deadline MINUTES]")
         print("Examples:")
         print("  python scripts/video_analyzer.py video.mp4")
         print("  python scripts/video_analyzer.py ./videos/")
+        print("  python scripts/video_analyzer.py ./videos/ --format csv --output clips.csv --workers 16")
+        print("  python scripts/video_analyzer.py ./videos/ --motion --render-workers 4 --deadline 90")
         return False
     
-    path = sys.argv[1]
+    path = args[0]
     
     if not os.path.exists(path):
         print(f"❌ Path not found: {path}")
@@ -160,11 +293,23 @@ def main():
     
     if os.path.isfile(path):
         # Analyze single file
-        analysis = analyzer.analyze_video(path)
-        return analysis is not None
+        if options["--format"] == "text":
+            analysis = analyzer.analyze_video(path)
+            return analysis is not None
+        try:
+            record = analyzer.summarize(path)
+        except Exception as e:
+            print(f"❌ Error analyzing video: {e}")
+            return False
+        output_path = options["--output"] or f"video_analysis.{options['--format']}"
+        write_records([record], options["--format"], output_path)
+        print(f"📄 Analysis written to {output_path}")
+        return True
     elif os.path.isdir(path):
         # Analyze directory
-        analyzer.analyze_directory(path)
+        deadline = float(options["--deadline"]) * 60 if options["--deadline"] else None
+        analyzer.analyze_directory(path, int(options["--workers"]), options["--format"], options["--output"],
+                                   sample_motion, int(options["--render-workers"]), deadline)
         return True
     else:
         print(f"❌ Invalid path: {path}")
@@ -22,10 +22,19 @@ if not check_moviepy():
 # Now import moviepy
 from moviepy.editor import VideoFileClip, AudioFileClip
 
+# Action-tracking crop and the ffmpeg backend live with the full editor; fall back without them
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "scripts"))
+try:
+    from smart_crop import CropPlanner
+    from ffmpeg_backend import FFmpegRenderer
+except ImportError:
+    CropPlanner = FFmpegRenderer = None
+
 class SimpleVideoEditor:
-    def __init__(self):
+    def __init__(self, backend="moviepy"):
         self.width = 608
         self.height = 1080
+        self.backend = backend
     
     def process_video(self, video_file, audio_file, output_file="output.mp4"):
         """Process video with audio"""
@@ -40,6 +49,16 @@ class SimpleVideoEditor:
             print(f"❌ Audio file not found: {audio_file}")
             return False
         
+        if self.backend == "ffmpeg" and FFmpegRenderer is not None:
+            try:
+                print("⚡ Rendering with ffmpeg (sync, crop, scale and audio in one pass)...")
+                FFmpegRenderer(width=self.width, height=self.height).render(video_file, audio_file, output_file)
+                print(f"🎉 Success! Output saved as: {output_file}")
+                return True
+            except Exception as e:
+                print(f"❌ Error: {e}")
+                return False
+        
         try:
             print("📹 Loading video...")
             video = VideoFileClip(video_file)
@@ -59,9 +78,11 @@ class SimpleVideoEditor:
             # Simple resize to vertical
             video_resized = video.resize(height=self.height)
             
-            # Center crop to target width
+            # Crop to target width, following the action when possible
             w, h = video_resized.size
-            if w > self.width:
+            if w > self.width and CropPlanner is not None:
+                video_resized = CropPlanner().crop_clip(video_resized, video_file, self.width)
+            elif w > self.width:
                 x_center = w // 2
                 x_start = x_center - (self.width // 2)
                 video_resized = video_resized.crop(x1=x_start, x2=x_start + self.width)
@@ -111,7 +132,7 @@ def main():
         for vf in video_files:
             print(f"  - {vf}")
         print("\nOr run with custom files:")
-        print("  python simple_editor.py <video> <audio>")
+        print("  python simple_editor.py <video> <audio> [--ffmpeg]")
         return False
     
     if not os.path.exists(audio_file):
@@ -124,10 +145,12 @@ def main():
 
 if __name__ == "__main__":
     # Allow custom files as arguments
-    if len(sys.argv) == 3:
-        video_file = sys.argv[1]
-        audio_file = sys.argv[2]
-        editor = SimpleVideoEditor()
+    backend = "ffmpeg" if "--ffmpeg" in sys.argv else "moviepy"
+    args = [arg for arg in sys.argv[1:] if arg != "--ffmpeg"]
+    if len(args) == 2:
+        video_file = args[0]
+        audio_file = args[1]
+        editor = SimpleVideoEditor(backend=backend)
         success = editor.process_video(video_file, audio_file)
         sys.exit(0 if success else 1)
     else: